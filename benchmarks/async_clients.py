@@ -0,0 +1,129 @@
+#!/usr/bin/python3
+"""Drives AsyncFileStorage with many simulated clients on one event loop,
+against the same clients calling a plain FileStorage.save() inline.
+
+Every client runs a random mix of lookups and updates, each update
+followed by a save. Reported: throughput, latency percentiles of get and
+save, the number of disk writes the saves coalesced into, and the worst
+event-loop stall seen by a 1ms ticker. Both storages save once before
+the clients start, so the one-time encoding of every record on the
+first save is not counted.
+
+Usage: python3 -m benchmarks.async_clients [records] [clients] [ops]
+"""
+
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+from timeit import default_timer
+from benchmarks.common import make_records, report
+import models
+from models.engine.async_storage import AsyncFileStorage
+from models.engine.file_storage import FileStorage
+
+WRITES = 0.05
+
+
+class Inline:
+    """The AsyncFileStorage calls the harness uses, run synchronously on
+    the loop by a plain FileStorage."""
+
+    def __init__(self, storage):
+        """Wraps storage."""
+        self.storage = storage
+        self.writes = 0
+
+    async def get(self, cls, id):
+        """Returns the instance of cls with the given id, or None."""
+        return (self.storage.get(cls, id))
+
+    async def save(self):
+        """Saves on the loop thread."""
+        self.storage.save()
+        self.writes += 1
+
+
+async def client(storage, ids, ops, rand, gets, saves):
+    """Runs ops lookups or updates, recording their latencies."""
+    for _ in range(ops):
+        obj_id = rand.choice(ids)
+        start = default_timer()
+        place = await storage.get("Place", obj_id)
+        if rand.random() < WRITES:
+            place.number_rooms = rand.randint(1, 9)
+            await storage.save()
+            saves.append(default_timer() - start)
+        else:
+            gets.append(default_timer() - start)
+            await asyncio.sleep(0)
+
+
+async def ticker(stop, lags):
+    """Sleeps 1ms at a time and records how late each wake-up was."""
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        start = loop.time()
+        await asyncio.sleep(0.001)
+        lags.append(loop.time() - start - 0.001)
+
+
+async def drive(storage, ids, clients, ops):
+    """Returns (seconds, gets, saves, lags) for `clients` clients."""
+    rand = random.Random(42)
+    gets, saves, lags = [], [], []
+    stop = asyncio.Event()
+    tick = asyncio.ensure_future(ticker(stop, lags))
+    start = default_timer()
+    await asyncio.gather(*(client(storage, ids, ops,
+                                  random.Random(rand.random()), gets, saves)
+                           for _ in range(clients)))
+    seconds = default_timer() - start
+    stop.set()
+    await tick
+    return (seconds, gets, saves, lags)
+
+
+def percentile(values, fraction):
+    """Returns the value below which `fraction` of values lie, in ms."""
+    values = sorted(values)
+    return (values[min(len(values) - 1, int(len(values) * fraction))] * 1e3)
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    clients = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    ops = int(sys.argv[3]) if len(sys.argv) > 3 else 20
+    records = make_records(count)
+    ids = [key.partition(".")[2] for key in records]
+    rows = [("mode", "ops/s", "get p99", "save p50", "save p99", "writes",
+             "max stall")]
+    with tempfile.TemporaryDirectory() as tmp:
+        for mode in ("inline", "async", "inline, wal", "async, wal"):
+            path = os.path.join(tmp, f"{mode}.json")
+            with open(path, "w") as f:
+                json.dump(records, f)
+            options = {"file_path": path, "wal": mode.endswith("wal"),
+                       "fsync": False}
+            if mode.startswith("inline"):
+                models.storage = FileStorage(**options)
+                storage = Inline(models.storage)
+            else:
+                storage = AsyncFileStorage(max_staleness=0, **options)
+                models.storage = storage.storage
+            models.storage.reload()
+            models.storage.get("Place", ids[0]).number_rooms = 0
+            models.storage.save()
+            models.storage.sync()
+            seconds, gets, saves, lags = asyncio.run(
+                drive(storage, ids, clients, ops))
+            models.storage.sync()
+            rows.append((mode, f"{clients * ops / seconds:.0f}",
+                         f"{percentile(gets, 0.99):.2f}ms",
+                         f"{percentile(saves, 0.5):.2f}ms",
+                         f"{percentile(saves, 0.99):.2f}ms",
+                         f"{storage.writes}/{len(saves)}",
+                         f"{max(lags) * 1e3:.1f}ms"))
+    report(f"{count} records, {clients} clients x {ops} ops", rows)
@@ -0,0 +1,55 @@
+#!/usr/bin/python3
+"""Times repeated snapshot writes of a file.json of each size: the plain
+in-place write the storage used to do as a baseline, then every atomic
+write mode, and reports the overhead per save of each.
+
+Usage: python3 -m benchmarks.atomic_save [records ...]
+"""
+
+import json
+import os
+import sys
+import tempfile
+from benchmarks.common import make_records, report, timed
+from models.engine.atomic import AtomicWriter, DoubleBufferedWriter
+
+SAVES = 50
+MODES = (("atomic", AtomicWriter(fsync=False)),
+         ("atomic + fsync", AtomicWriter()),
+         ("double buffer + fsync", DoubleBufferedWriter()))
+
+
+class InPlaceWriter:
+    """The former write: truncates and rewrites the file in place."""
+
+    def write(self, path, data):
+        """Overwrites path with data."""
+        with open(path, 'wb') as file:
+            file.write(data)
+
+    def wait(self):
+        """Writes are synchronous."""
+
+
+def saves(writer, path, data):
+    """Writes data to path SAVES times and waits for the last write."""
+    for _ in range(SAVES):
+        writer.write(path, data)
+    writer.wait()
+
+
+if __name__ == "__main__":
+    sizes = [int(arg) for arg in sys.argv[1:]] or [1000, 10000, 100000]
+    for size in sizes:
+        data = json.dumps(make_records(size)).encode()
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "file.json")
+            baseline = timed(saves, InPlaceWriter(), path, data) / SAVES
+            rows = [("mode", "per save", "overhead"),
+                    ("in place", f"{baseline * 1e3:.2f}ms", "")]
+            for label, writer in MODES:
+                per_save = timed(saves, writer, path, data) / SAVES
+                rows.append((label, f"{per_save * 1e3:.2f}ms",
+                             f"{(per_save - baseline) * 1e3:+.2f}ms"))
+        report(f"{size} records, {len(data) / 1e6:.1f} MB, {SAVES} saves",
+               rows)
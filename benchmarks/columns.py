@@ -0,0 +1,59 @@
+#!/usr/bin/python3
+"""Times "average price_by_night per city_id" and a lat/long box filter
+over generated Places, as a loop over all(cls) and through the columnar
+aggregate() and select(). The first columnar call builds the columns;
+later calls reuse them.
+
+Usage: python3 -m benchmarks.columns [records]
+"""
+
+import sys
+from benchmarks.common import make_records, report, timed
+from models.engine import columns
+from models.engine.file_storage import FileStorage
+from models.place import Place
+
+BOX = {"latitude": (6.6, 6.9), "longitude": (3.4, 3.6)}
+
+
+def loop_mean_by_city(storage):
+    """Averages price_by_night per city_id with a Python loop."""
+    sums = {}
+    for obj in storage.all(Place).values():
+        total, count = sums.get(obj.city_id, (0, 0))
+        sums[obj.city_id] = (total + obj.price_by_night, count + 1)
+    return ({city: total / count for city, (total, count) in sums.items()})
+
+
+def loop_box(storage):
+    """Filters the Places in BOX with a Python loop."""
+    return ({key: obj for key, obj in storage.all(Place).items()
+             if all(low <= getattr(obj, attr) <= high
+                    for attr, (low, high) in BOX.items())})
+
+
+def columnar_mean_by_city(storage):
+    """Averages price_by_night per city_id through aggregate()."""
+    return (storage.aggregate(Place, "price_by_night", by="city_id"))
+
+
+def columnar_box(storage):
+    """Filters the Places in BOX through select()."""
+    return (storage.select(Place, **BOX))
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    FileStorage._FileStorage__objects = {}
+    storage = FileStorage()
+    for key, record in make_records(count).items():
+        storage.new(Place(**record))
+    backend = "numpy" if columns.numpy is not None else "pure Python"
+    report(f"{count} Places, columns in {backend}", [
+        ("query", "loop", "first call", "next calls"),
+        ("mean price by city", f"{timed(loop_mean_by_city, storage):.3f}s",
+         f"{timed(columnar_mean_by_city, storage):.3f}s",
+         f"{timed(columnar_mean_by_city, storage):.3f}s"),
+        ("lat/long box", f"{timed(loop_box, storage):.3f}s",
+         f"{timed(columnar_box, storage):.3f}s",
+         f"{timed(columnar_box, storage):.3f}s")])
@@ -0,0 +1,41 @@
+#!/usr/bin/python3
+"""Helpers shared by the benchmark scripts."""
+
+from datetime import datetime, timedelta
+from timeit import default_timer
+import uuid
+
+
+def make_records(count):
+    """Returns a file.json-style dictionary of `count` Place records."""
+    start = datetime(2017, 9, 28, 21, 3, 54, 52298)
+    records = {}
+    for i in range(count):
+        created_at = (start + timedelta(seconds=i)).isoformat()
+        obj_id = str(uuid.uuid4())
+        records[f"Place.{obj_id}"] = {
+            "id": obj_id,
+            "created_at": created_at,
+            "updated_at": created_at,
+            "name": f"Place {i}",
+            "city_id": str(i % 97),
+            "price_by_night": i % 500,
+            "latitude": 6.5 + (i % 1000) / 1000,
+            "longitude": 3.3 + (i % 777) / 1000,
+            "__class__": "Place"}
+    return (records)
+
+
+def timed(func, *args):
+    """Returns the wall-clock seconds taken by func(*args)."""
+    start = default_timer()
+    func(*args)
+    return (default_timer() - start)
+
+
+def report(title, rows):
+    """Prints rows of (label, value, ...) under title as a plain table."""
+    print(title)
+    for row in rows:
+        print("  " + "  ".join(f"{cell:>14}" if i else f"{cell:<24}"
+                               for i, cell in enumerate(row)))
@@ -0,0 +1,79 @@
+#!/usr/bin/python3
+"""Measures the memory taken by each loaded instance, with the regular
+model classes and with the compact variants of models/compact.py.
+
+The file holds Reviews of a thousand places written by a thousand users,
+with the fields `create`/`update` would set. The figures are the Python
+heap allocated by reload() and all(), divided by the record count, so
+they include the id, timestamp and attribute value objects; "used" is
+measured again once every instance went through to_dict() and str(), as
+a full save and the `all` command do.
+
+Usage: python3 -m benchmarks.compact_models [records]
+"""
+
+import gc
+import json
+import os
+import sys
+import tempfile
+import tracemalloc
+import uuid
+from datetime import datetime, timedelta
+from benchmarks.common import report
+from models.engine.file_storage import FileStorage
+
+
+def make_reviews(count):
+    """Returns a file.json-style dictionary of `count` Review records."""
+    places = [str(uuid.uuid4()) for _ in range(1000)]
+    users = [str(uuid.uuid4()) for _ in range(1000)]
+    start = datetime(2017, 9, 28, 21, 3, 54, 52298)
+    records = {}
+    for i in range(count):
+        created_at = (start + timedelta(seconds=i)).isoformat()
+        obj_id = str(uuid.uuid4())
+        records[f"Review.{obj_id}"] = {
+            "id": obj_id,
+            "created_at": created_at,
+            "updated_at": created_at,
+            "place_id": places[i % 1000],
+            "user_id": users[i * 7 % 1000],
+            "text": f"Review {i}",
+            "__class__": "Review"}
+    return (records)
+
+
+def loaded_bytes(path, compact_models):
+    """Returns the bytes allocated by loading every instance of path, then
+    by using each of them once."""
+    FileStorage._FileStorage__objects = {}
+    gc.collect()
+    tracemalloc.start()
+    storage = FileStorage(file_path=path, lazy=False,
+                          compact_models=compact_models)
+    storage.reload()
+    objects = storage.all()
+    loaded = tracemalloc.get_traced_memory()[0]
+    for obj in objects.values():
+        obj.to_dict()
+        str(obj)
+    used = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return (loaded, used)
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "file.json")
+        with open(path, "w") as f:
+            json.dump(make_reviews(count), f)
+        rows = [("models", "bytes/object", "total", "used bytes/object")]
+        for label, compact_models in (("regular", False),
+                                      ("compact", True)):
+            loaded, used = loaded_bytes(path, compact_models)
+            rows.append((label, f"{loaded / count:.0f}",
+                         f"{loaded / 2 ** 20:.1f}MB",
+                         f"{used / count:.0f}"))
+        report(f"{count} Reviews", rows)
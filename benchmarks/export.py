@@ -0,0 +1,73 @@
+#!/usr/bin/python3
+"""Exports a thread-safe FileStorage while writer threads update it.
+
+"locked" holds rwlock.reading() around export(), as a reader copying the
+records would have to; "view" lets export() read from a snapshot() view
+and hold no lock while it encodes. Reported: the export time, the updates
+the writers made meanwhile and the worst time one waited for the lock.
+
+Usage: python3 -m benchmarks.export [records] [writers]
+"""
+
+import os
+import random
+import sys
+import tempfile
+import threading
+from timeit import default_timer
+from benchmarks.common import make_records, report
+import models
+from models.engine.file_storage import FileStorage
+
+
+def write(storage, ids, stop, counts, waits):
+    """Increments number_rooms on random places until stop is set."""
+    rand = random.Random()
+    done = 0
+    worst = 0
+    while not stop.is_set():
+        start = default_timer()
+        with storage.rwlock.writing():
+            worst = max(worst, default_timer() - start)
+            place = storage.get("Place", rand.choice(ids))
+            place.number_rooms += 1
+        done += 1
+    counts.append(done)
+    waits.append(worst)
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    writers = int(sys.argv[2]) if len(sys.argv) > 2 else 2
+    records = make_records(count)
+    for record in records.values():
+        record["number_rooms"] = 0
+    ids = [key.partition(".")[2] for key in records]
+    rows = [("mode", "export", "writes", "max wait")]
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "file.json")
+        models.storage = storage = FileStorage(file_path=path,
+                                               threadsafe=True)
+        storage.reload()
+        for record in records.values():
+            storage.new(FileStorage.class_dict["Place"](**record))
+        for mode in ("locked", "view"):
+            stop = threading.Event()
+            writes, waits = [], []
+            threads = [threading.Thread(target=write, args=(
+                storage, ids, stop, writes, waits)) for _ in range(writers)]
+            for thread in threads:
+                thread.start()
+            start = default_timer()
+            if mode == "locked":
+                with storage.rwlock.reading():
+                    storage.export(os.path.join(tmp, "locked.snapshot"))
+            else:
+                storage.export(os.path.join(tmp, "view.snapshot"))
+            seconds = default_timer() - start
+            stop.set()
+            for thread in threads:
+                thread.join()
+            rows.append((mode, f"{seconds * 1e3:.0f}ms", sum(writes),
+                         f"{max(waits) * 1e3:.1f}ms"))
+    report(f"{count} records, {writers} writers", rows)
@@ -0,0 +1,81 @@
+#!/usr/bin/python3
+"""Times relationship traversals (place.reviews, amenity.places) through
+the reverse indexes behind FileStorage.related(), against the nested scan
+of every instance they replace.
+
+Each place gets a few reviews and amenities out of a fixed set. Traversal
+times are averaged over random places and amenities once the indexes are
+built.
+
+Usage: python3 -m benchmarks.relations [places]
+"""
+
+import os
+import random
+import sys
+import tempfile
+from benchmarks.common import report, timed
+import models
+from models.engine.file_storage import FileStorage
+
+QUERIES = 1000
+REVIEWS = 5
+AMENITIES = 50
+
+
+def populate(count, rand):
+    """Creates `count` places with their reviews and amenities, and
+    returns (places, amenities)."""
+    from models.amenity import Amenity
+    from models.place import Place
+    from models.review import Review
+    amenities = [Amenity() for _ in range(AMENITIES)]
+    places = []
+    for _ in range(count):
+        place = Place()
+        place.amenity_ids = [amenity.id for amenity in
+                             rand.sample(amenities, 4)]
+        for _ in range(rand.randint(0, 2 * REVIEWS)):
+            Review().place_id = place.id
+        places.append(place)
+    return (places, amenities)
+
+
+def traverse(places, amenities):
+    """Follows place.reviews and amenity.places through storage."""
+    for place in places:
+        place.reviews
+    for amenity in amenities:
+        amenity.places
+
+
+def scan(places, amenities):
+    """Finds the same instances by scanning every Review and Place."""
+    reviews = models.storage.all("Review").values()
+    everything = models.storage.all("Place").values()
+    for place in places:
+        [review for review in reviews if review.place_id == place.id]
+    for amenity in amenities:
+        [place for place in everything if amenity.id in place.amenity_ids]
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    rand = random.Random(42)
+    with tempfile.TemporaryDirectory() as tmp:
+        models.storage = FileStorage(
+            file_path=os.path.join(tmp, "file.json"))
+        models.storage.reload()
+        places, amenities = populate(count, rand)
+        sample = rand.sample(places, QUERIES)
+        few = rand.sample(amenities, 5)
+        build = timed(traverse, sample[:1], few[:1])
+        scan_time = timed(scan, sample[:10], few) / (len(few) + 10)
+        query = timed(traverse, sample, []) / QUERIES
+        many = timed(traverse, [], few) / len(few)
+        report(f"{count} places, {models.storage.count('Review')} reviews", [
+            ("operation", "time"),
+            ("first traversal (build)", f"{build:.2f}s"),
+            ("nested scan", f"{scan_time * 1e3:.1f}ms"),
+            ("place.reviews", f"{query * 1e6:.1f}us"),
+            ("amenity.places", f"{many * 1e3:.2f}ms")])
@@ -0,0 +1,36 @@
+#!/usr/bin/python3
+"""Times a full save and reload of FileStorage with every serializer
+backend and reports the size of the written file.
+
+Usage: python3 -m benchmarks.serializers [records ...]
+"""
+
+import json
+import os
+import sys
+import tempfile
+from benchmarks.common import make_records, report, timed
+from models.engine import serializers
+from models.engine.file_storage import FileStorage
+
+
+if __name__ == "__main__":
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10000, 100000]
+    names = [name for name in serializers.serializer_dict
+             if name != "orjson" or serializers.orjson is not None]
+    for size in sizes:
+        records = make_records(size)
+        rows = [("backend", "save", "reload", "file size")]
+        with tempfile.TemporaryDirectory() as tmp:
+            source = os.path.join(tmp, "source.json")
+            with open(source, "w") as f:
+                json.dump(records, f)
+            for name in names:
+                FileStorage(file_path=source, serializer="json").reload()
+                path = os.path.join(tmp, f"file.{name}")
+                storage = FileStorage(file_path=path, serializer=name)
+                save_time = timed(storage.compact)
+                reload_time = timed(storage.reload)
+                rows.append((name, f"{save_time:.3f}s", f"{reload_time:.3f}s",
+                             f"{os.path.getsize(path) / 1e6:.1f} MB"))
+        report(f"{size} records", rows)
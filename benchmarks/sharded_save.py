@@ -0,0 +1,44 @@
+#!/usr/bin/python3
+"""Times saving one edited State next to a large number of Reviews, with
+the single-file layout and with one shard file per class.
+
+Usage: python3 -m benchmarks.sharded_save [reviews ...]
+"""
+
+import os
+import sys
+import tempfile
+from benchmarks.common import report, timed
+from models.engine.file_storage import FileStorage
+from models.review import Review
+from models.state import State
+
+SAVES = 20
+
+
+def edits(storage, state):
+    """Renames state and saves, SAVES times."""
+    for i in range(SAVES):
+        state.name = f"State {i}"
+        storage.save()
+
+
+if __name__ == "__main__":
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10000, 100000]
+    for size in sizes:
+        rows = [("layout", "per save")]
+        with tempfile.TemporaryDirectory() as tmp:
+            for label, options in (
+                    ("single file", {}),
+                    ("shards", {"shard_dir": os.path.join(tmp, "shards")})):
+                storage = FileStorage(
+                    file_path=os.path.join(tmp, "file.json"),
+                    serializer="json", fsync=False, **options)
+                storage.reload()
+                for _ in range(size):
+                    Review()
+                state = State()
+                storage.save()
+                per_save = timed(edits, storage, state) / SAVES
+                rows.append((label, f"{per_save * 1e3:.2f}ms"))
+        report(f"{size} reviews, {SAVES} saves", rows)
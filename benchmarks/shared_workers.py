@@ -0,0 +1,74 @@
+#!/usr/bin/python3
+"""Times worker processes saving changes to one shared dataset, as
+parallel console sessions would, and checks that no write is lost.
+
+Every worker reloads the dataset, then creates and saves records one at
+a time. Each save takes the storage lock, merges what the other workers
+wrote since its last save, and writes. The same saves are also timed in
+one process for comparison.
+
+Usage: python3 -m benchmarks.shared_workers [records] [workers] [saves]
+"""
+
+import multiprocessing
+import os
+import sys
+import tempfile
+from timeit import default_timer
+from benchmarks.common import make_records, report
+import models
+from models.engine.file_storage import FileStorage
+
+
+def open_storage(path, wal):
+    """Returns a shared FileStorage on path, set as models.storage."""
+    models.storage = FileStorage(file_path=path, wal=wal, shared=True,
+                                 fsync=False, compact_every=10000)
+    models.storage.reload()
+    return (models.storage)
+
+
+def work(path, wal, saves):
+    """Creates and saves `saves` records, one save each."""
+    from models.state import State
+    open_storage(path, wal)
+    for i in range(saves):
+        State().name = f"State {i}"
+        models.storage.save()
+
+
+def run(path, wal, workers, saves):
+    """Returns the seconds taken by `workers` processes each running
+    work()."""
+    processes = [multiprocessing.Process(target=work,
+                                         args=(path, wal, saves))
+                 for _ in range(workers)]
+    start = default_timer()
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    return (default_timer() - start)
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    saves = int(sys.argv[3]) if len(sys.argv) > 3 else 100
+    rows = [("mode", "time", "saves/s", "lost")]
+    with tempfile.TemporaryDirectory() as tmp:
+        for wal in (False, True):
+            for parallel in (1, workers):
+                path = os.path.join(tmp, f"{wal}.{parallel}.json")
+                storage = open_storage(path, wal)
+                for record in make_records(count).values():
+                    storage.new(FileStorage.class_dict["Place"](**record))
+                storage.compact()
+                seconds = run(path, wal, parallel,
+                              saves * workers // parallel)
+                storage.reload()
+                lost = saves * workers - storage.count("State")
+                rows.append((f"{'wal' if wal else 'snapshot'}, "
+                             f"{parallel} process(es)", f"{seconds:.2f}s",
+                             f"{saves * workers / seconds:.0f}", lost))
+    report(f"{count} records, {saves * workers} saves", rows)
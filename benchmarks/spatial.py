@@ -0,0 +1,75 @@
+#!/usr/bin/python3
+"""Times nearest-neighbour and bounding-box queries of the GridIndex
+behind FileStorage.near() and within(), against a scan of every point.
+
+Listings are clustered around a few hundred city centres, as on a
+listings site. Query times are averaged over random points near those
+centres.
+
+Usage: python3 -m benchmarks.spatial [listings]
+"""
+
+import random
+import sys
+from types import SimpleNamespace
+from benchmarks.common import report, timed
+from models.engine.indexes import GridIndex, distance
+
+QUERIES = 1000
+
+
+def make_listings(count, rand):
+    """Returns {key: point} listings clustered around city centres."""
+    centres = [(rand.uniform(-50, 60), rand.uniform(-120, 140))
+               for _ in range(300)]
+    listings = {}
+    for i in range(count):
+        lat, lon = rand.choice(centres)
+        listings[f"Place.{i}"] = SimpleNamespace(
+            latitude=lat + rand.gauss(0, 0.2),
+            longitude=lon + rand.gauss(0, 0.2))
+    return (listings, centres)
+
+
+def build(index, listings):
+    """Adds every listing to index."""
+    for key, obj in listings.items():
+        index.add(key, obj)
+
+
+def near_queries(index, points):
+    """Runs a 10-nearest query at every point."""
+    for lat, lon in points:
+        index.nearest(lat, lon, 10)
+
+
+def box_queries(index, points):
+    """Runs a query for a 0.05 x 0.05 degree box at every point."""
+    for lat, lon in points:
+        index.within(lat, lon, lat + 0.05, lon + 0.05)
+
+
+def scan_near(listings, lat, lon):
+    """Finds the 10 nearest listings by scanning all of them."""
+    sorted(listings, key=lambda key: distance(
+        lat, lon, listings[key].latitude, listings[key].longitude))[:10]
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    rand = random.Random(42)
+    listings, centres = make_listings(count, rand)
+    points = [(lat + rand.gauss(0, 0.2), lon + rand.gauss(0, 0.2))
+              for lat, lon in (rand.choice(centres)
+                               for _ in range(QUERIES))]
+    index = GridIndex("latitude", "longitude")
+    build_time = timed(build, index, listings)
+    scan = timed(scan_near, listings, *points[0])
+    near = timed(near_queries, index, points) / QUERIES
+    box = timed(box_queries, index, points) / QUERIES
+    report(f"{count} listings", [
+        ("operation", "time"),
+        ("build index", f"{build_time:.2f}s"),
+        ("scan for 10 nearest", f"{scan * 1e3:.1f}ms"),
+        ("grid 10 nearest", f"{near * 1e3:.3f}ms"),
+        ("grid 0.05 deg box", f"{box * 1e3:.3f}ms")])
@@ -0,0 +1,84 @@
+#!/usr/bin/python3
+"""Compares a console command reading file.json itself with the same
+command served by a running storage server, and times single requests
+over the socket.
+
+A storage server process is started on the dataset first; its own
+startup (one reload) is reported separately since it is paid once.
+
+Usage: python3 -m benchmarks.storage_server [records]
+"""
+
+import json
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+from timeit import default_timer
+from benchmarks.common import make_records, report, timed
+import models
+from models.engine.socket_storage import SocketStorage
+
+REQUESTS = 1000
+
+
+def console(env, command):
+    """Returns the seconds taken by a console process running command."""
+    start = default_timer()
+    subprocess.run([sys.executable, "console.py"], input=command,
+                   text=True, env=env, stdout=subprocess.DEVNULL, check=True)
+    return (default_timer() - start)
+
+
+def start_server(env, socket_path):
+    """Starts a storage server and returns (process, startup seconds)."""
+    start = default_timer()
+    process = subprocess.Popen([sys.executable, "-m",
+                                "models.engine.storage_server", socket_path],
+                               env=env)
+    while not os.path.exists(socket_path):
+        time.sleep(0.001)
+    return (process, default_timer() - start)
+
+
+def requests(storage, keys):
+    """Runs a get and a save round trip per key."""
+    for key in keys:
+        obj = storage.get(*key.split("."))
+        obj.name = "renamed"
+        storage.save()
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    records = make_records(count)
+    key = next(iter(records))
+    command = f"show Place {key.split('.')[1]}\n"
+    with tempfile.TemporaryDirectory() as tmp:
+        file_path = os.path.join(tmp, "file.json")
+        socket_path = os.path.join(tmp, "hbnb.sock")
+        with open(file_path, "w") as f:
+            json.dump(records, f)
+        env = dict(os.environ, HBNB_FILE_PATH=file_path,
+                   HBNB_STORAGE_WAL="1")
+        env.pop("HBNB_TYPE_STORAGE", None)
+        direct = console(env, command)
+        process, startup = start_server(env, socket_path)
+        try:
+            served = console(dict(env, HBNB_TYPE_STORAGE="socket",
+                                  HBNB_SOCKET_PATH=socket_path), command)
+            models.storage = SocketStorage(socket_path=socket_path)
+            keys = list(records)[:REQUESTS]
+            round_trip = timed(requests, models.storage, keys) / REQUESTS
+            models.storage.close()
+        finally:
+            process.send_signal(signal.SIGTERM)
+            process.wait()
+    report(f"{count} records", [
+        ("operation", "time"),
+        ("console, file.json", f"{direct * 1e3:.0f}ms"),
+        ("server startup", f"{startup * 1e3:.0f}ms"),
+        ("console, server", f"{served * 1e3:.0f}ms"),
+        ("get + save", f"{round_trip * 1e3:.2f}ms")])
@@ -0,0 +1,58 @@
+#!/usr/bin/python3
+"""Compares the peak memory and time of reading a snapshot in one piece,
+as FileStorage.reload() used to, with the record-by-record reload, for
+every serializer backend.
+
+Usage: python3 -m benchmarks.streaming_reload [records ...]
+"""
+
+import json
+import os
+import sys
+import tempfile
+import tracemalloc
+from benchmarks.common import make_records, report, timed
+from models.engine import serializers
+from models.engine.file_storage import FileStorage
+
+
+def whole_file(storage):
+    """Reads and decodes the whole snapshot at once."""
+    with open(storage.file_path, 'rb') as file:
+        return (storage.serializer.load(file.read()))
+
+
+def peak(func, *args):
+    """Returns the peak traced memory in MB while running func(*args)."""
+    tracemalloc.start()
+    result = func(*args)
+    size = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    del result
+    return (size / 1e6)
+
+
+if __name__ == "__main__":
+    sizes = [int(arg) for arg in sys.argv[1:]] or [100000]
+    names = [name for name in serializers.serializer_dict
+             if name != "orjson" or serializers.orjson is not None]
+    for size in sizes:
+        records = make_records(size)
+        rows = [("backend / reader", "time", "peak memory")]
+        with tempfile.TemporaryDirectory() as tmp:
+            source = os.path.join(tmp, "source.json")
+            with open(source, "w") as f:
+                json.dump(records, f)
+            del records
+            for name in names:
+                FileStorage(file_path=source, serializer="json").reload()
+                path = os.path.join(tmp, f"file.{name}")
+                storage = FileStorage(file_path=path, serializer=name,
+                                      stream_threshold=0)
+                storage.compact()
+                for label, func in (("whole file", whole_file),
+                                    ("streaming", FileStorage.reload)):
+                    elapsed = timed(func, storage)
+                    rows.append((f"{name} {label}", f"{elapsed:.3f}s",
+                                 f"{peak(func, storage):.1f} MB"))
+        report(f"{size} records", rows)
@@ -0,0 +1,74 @@
+#!/usr/bin/python3
+"""Times building the TextIndex behind FileStorage.search(), saving and
+reading its cache file, and ranked queries, over generated Reviews.
+
+Review texts are drawn from a Zipf-distributed vocabulary, so common
+words match a large share of the reviews and rare words a handful.
+
+Usage: python3 -m benchmarks.text_search [reviews]
+"""
+
+import random
+import sys
+from timeit import default_timer
+from types import SimpleNamespace
+from benchmarks.common import report, timed
+from models.engine.indexes import TextIndex
+
+QUERIES = {"rare word": "word4000",
+           "common word": "word3",
+           "three words": "word12 word150 word2900"}
+REPEAT = 20
+
+
+def make_reviews(count, rand):
+    """Returns {key: review} with texts of 5 to 40 words."""
+    vocabulary = [f"word{i}" for i in range(5000)]
+    weights = [1 / (rank + 1) for rank in range(len(vocabulary))]
+    reviews = {}
+    for i in range(count):
+        words = rand.choices(vocabulary, weights, k=rand.randint(5, 40))
+        reviews[f"Review.{i}"] = SimpleNamespace(text=" ".join(words))
+    return (reviews)
+
+
+def build(reviews):
+    """Returns a TextIndex of every review."""
+    index = TextIndex(("text",))
+    for key, obj in reviews.items():
+        index.add(key, obj)
+    return (index)
+
+
+def query(index, text):
+    """Runs the top-10 query text REPEAT times."""
+    for _ in range(REPEAT):
+        index.search(text)
+
+
+def scan(reviews, word):
+    """Finds the reviews containing word by substring matching."""
+    return ([key for key, obj in reviews.items() if word in obj.text])
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    reviews = make_reviews(count, random.Random(42))
+    start = default_timer()
+    index = build(reviews)
+    rows = [("operation", "time"),
+            ("build index", f"{default_timer() - start:.2f}s"),
+            ("substring scan",
+             f"{timed(scan, reviews, 'word4000') * 1e3:.0f}ms")]
+    del reviews
+    start = default_timer()
+    data = index.dump()
+    rows.append(("write cache", f"{default_timer() - start:.2f}s"))
+    rows.append(("read cache", f"{timed(TextIndex.load, data):.2f}s"))
+    rows.append(("cache size", f"{len(data) / 2 ** 20:.0f}MB"))
+    del data
+    for label, text in QUERIES.items():
+        matches = len(index.search(text, None))
+        per_query = timed(query, index, text) / REPEAT
+        rows.append((f"{label} ({matches})", f"{per_query * 1e3:.2f}ms"))
+    report(f"{count} reviews", rows)
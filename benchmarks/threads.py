@@ -0,0 +1,97 @@
+#!/usr/bin/python3
+"""Drives a thread-safe FileStorage with reader and writer threads and
+checks that no update is lost.
+
+Readers look up random places; writers increment a counter on random
+places under rwlock.writing() and save every few updates. Reported: the
+throughput of each side, the worst time a writer waited for the lock,
+which stays short because saves release it before writing to disk, and
+the updates missing from the file afterwards.
+
+Usage: python3 -m benchmarks.threads [records] [readers] [writers]
+"""
+
+import os
+import random
+import sys
+import tempfile
+import threading
+from timeit import default_timer
+from benchmarks.common import make_records, report
+import models
+from models.engine.file_storage import FileStorage
+
+SECONDS = 3
+SAVE_EVERY = 20
+
+
+def read(storage, ids, stop, counts):
+    """Looks up random places until stop is set."""
+    rand = random.Random()
+    done = 0
+    while not stop.is_set():
+        storage.get("Place", rand.choice(ids))
+        done += 1
+    counts.append(done)
+
+
+def write(storage, ids, stop, counts, waits):
+    """Increments number_rooms on random places until stop is set."""
+    rand = random.Random()
+    done = 0
+    worst = 0
+    while not stop.is_set():
+        start = default_timer()
+        with storage.rwlock.writing():
+            worst = max(worst, default_timer() - start)
+            place = storage.get("Place", rand.choice(ids))
+            place.number_rooms += 1
+        done += 1
+        if done % SAVE_EVERY == 0:
+            storage.save()
+    counts.append(done)
+    waits.append(worst)
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    readers = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    writers = int(sys.argv[3]) if len(sys.argv) > 3 else 4
+    records = make_records(count)
+    for record in records.values():
+        record["number_rooms"] = 0
+    ids = [key.partition(".")[2] for key in records]
+    rows = [("mode", "reads/s", "writes/s", "max wait", "lost")]
+    with tempfile.TemporaryDirectory() as tmp:
+        for wal in (False, True):
+            path = os.path.join(tmp, f"{wal}.json")
+            options = {"file_path": path, "wal": wal, "fsync": False}
+            models.storage = storage = FileStorage(threadsafe=True,
+                                                   **options)
+            storage.reload()
+            for record in records.values():
+                storage.new(FileStorage.class_dict["Place"](**record))
+            storage.save()
+            stop = threading.Event()
+            reads, writes, waits = [], [], []
+            threads = [threading.Thread(target=read,
+                                        args=(storage, ids, stop, reads))
+                       for _ in range(readers)]
+            threads += [threading.Thread(target=write, args=(
+                storage, ids, stop, writes, waits)) for _ in range(writers)]
+            for thread in threads:
+                thread.start()
+            threading.Event().wait(SECONDS)
+            stop.set()
+            for thread in threads:
+                thread.join()
+            storage.save()
+            reloaded = FileStorage(**options)
+            reloaded.reload()
+            total = sum(place.number_rooms
+                        for place in reloaded.all("Place").values())
+            rows.append(("wal" if wal else "snapshot",
+                         f"{sum(reads) / SECONDS:.0f}",
+                         f"{sum(writes) / SECONDS:.0f}",
+                         f"{max(waits) * 1e3:.1f}ms", sum(writes) - total))
+    report(f"{count} records, {readers} readers, {writers} writers", rows)
@@ -0,0 +1,58 @@
+#!/usr/bin/python3
+"""Compares the strptime timestamp parsing BaseModel used to do with the
+current fromisoformat path, then times a full reload of a generated
+file.json.
+
+Usage: python3 -m benchmarks.timestamps [records]
+"""
+
+import json
+import os
+import sys
+import tempfile
+from datetime import datetime
+from benchmarks.common import make_records, report, timed
+from models.engine.file_storage import FileStorage
+from models.place import Place
+
+
+def strptime_path(records):
+    """Parses both timestamps of every record the old way."""
+    date_fmt = "%Y-%m-%dT%H:%M:%S.%f"
+    for record in records.values():
+        datetime.strptime(record["created_at"], date_fmt)
+        datetime.strptime(record["updated_at"], date_fmt)
+
+
+def fromisoformat_path(records):
+    """Parses both timestamps of every record with fromisoformat."""
+    for record in records.values():
+        datetime.fromisoformat(record["created_at"])
+        datetime.fromisoformat(record["updated_at"])
+
+
+def construct(records):
+    """Builds a Place from every record through BaseModel.__init__."""
+    for record in records.values():
+        Place(**record)
+
+
+def reload_all(path):
+    """Reloads path and materializes every instance."""
+    storage = FileStorage(file_path=path)
+    storage.reload()
+    storage.all()
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    records = make_records(count)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "file.json")
+        with open(path, "w") as f:
+            json.dump(records, f)
+        report(f"{count} records", [
+            ("strptime x2", f"{timed(strptime_path, records):.3f}s"),
+            ("fromisoformat x2", f"{timed(fromisoformat_path, records):.3f}s"),
+            ("BaseModel(**record)", f"{timed(construct, records):.3f}s"),
+            ("reload + all()", f"{timed(reload_all, path):.3f}s")])
@@ -11,6 +11,7 @@ from models.city import City
 from models.place import Place
 from models.amenity import Amenity
 from models.review import Review
+from models.engine.columns import OPERATIONS
 from datetime import datetime
 
 
@@ -52,6 +53,20 @@ class HBNBCommand(cmd.Cmd):
         "Review"
     }
 
+    def onecmd(self, line):
+        """Runs a command line, reporting writes refused by a read-only
+        storage instead of exiting."""
+        try:
+            return (super().onecmd(line))
+        except PermissionError as error:
+            print(f"** {error} **")
+            return (False)
+
+    def precmd(self, line):
+        """Merges the changes other processes saved before every command."""
+        storage.refresh()
+        return (line)
+
     def emptyline(self):
         """Empty line executes nothing."""
         pass
@@ -63,27 +78,38 @@ class HBNBCommand(cmd.Cmd):
             "destroy": self.do_destroy,
             "all": self.do_all,
             "update": self.do_update,
-            "count": self.do_count
+            "count": self.do_count,
+            "stats": self.do_stats,
+            "near": self.do_near,
+            "within": self.do_within,
+            "search": self.do_search
         }
 
-        parts = re.split(r'\.|\(', arg)
+        match = re.fullmatch(r"(\w*)\.(\w+)\((.*)\)", arg)
 
-        if len(parts) == 3 and parts[1] in arg_dict:
-            command, parameter = parts[1], parts[2][:-1]
-            call = f"{parts[0]} {parameter}"
-            return arg_dict[command](call)
+        if match and match.group(2) in arg_dict:
+            call = f"{match.group(1)} {match.group(3)}"
+            return arg_dict[match.group(2)](call)
         print("*** Unknown syntax: {}".format(arg))
         return False
 
     def do_quit(self, arg):
         """Quit command to exit the program"""
+        self.end_transaction()
         return True
 
     def do_EOF(self, arg):
         """EOF command to exit the program"""
         print("")
+        self.end_transaction()
         return True
 
+    def end_transaction(self):
+        """Rolls back, with a warning, a transaction left open on exit."""
+        if storage.in_transaction():
+            print("** uncommitted changes rolled back **")
+            storage.rollback()
+
     def do_create(self, arg):
         """Creates a new instance of BaseModel, saves it and prints the ID.
         Usage: create <class name>"""
@@ -119,24 +145,21 @@ class HBNBCommand(cmd.Cmd):
         """Prints string representation of an instance based on class name
         and ID. Usage: show <class name> <id> or <class name>.show(<id>)"""
         argl = parse(arg)
-        obj_stored = storage.all()
         if len(argl) == 0:
             print("** class name missing **")
         elif argl[0] not in HBNBCommand.__all_classes:
             print("** class doesn't exist **")
         elif len(argl) == 1:
             print("** instance id missing **")
-        elif f"{argl[0]}.{argl[1]}" not in obj_stored:
+        elif storage.get(argl[0], argl[1]) is None:
             print("** no instance found **")
         else:
-            key = f"{argl[0]}.{argl[1]}"
-            print(obj_stored[key])
+            print(storage.get(argl[0], argl[1]))
 
     def do_destroy(self, arg):
         """Deletes an instance based on the class name and id.
         Usage: destroy <class name> <id> or <class name>.destroy(<id>)"""
         argl = parse(arg)
-        obj_stored = storage.all()
 
         if len(argl) == 0:
             print("** class name missing **")
@@ -144,32 +167,27 @@ class HBNBCommand(cmd.Cmd):
             print("** class doesn't exist **")
         elif len(argl) == 1:
             print("** instance id missing **")
-        elif f"{argl[0]}.{argl[1]}" not in obj_stored.keys():
+        elif storage.get(argl[0], argl[1]) is None:
             print("** no instance found **")
         else:
-            key = f"{argl[0]}.{argl[1]}"
-            del obj_stored[key]
+            storage.delete(storage.get(argl[0], argl[1]))
             storage.save()
 
     def do_all(self, arg):
         """Retrieves all instances of a class. Usage: all or all <class name>
         or <class name>.all()."""
         argl = parse(arg)
-        stored_objects = storage.all()
         if len(argl) > 0 and argl[0] not in HBNBCommand.__all_classes:
             print("** class doesn't exist **")
         else:
             if len(argl) > 0:
-                class_name = argl[0]
-                class_instances = {key: value for key, value in
-                                   stored_objects.items() if
-                                   key.startswith(class_name)}
+                class_instances = storage.all(argl[0])
                 if not class_instances:
                     print("** no instances found **")
                 else:
                     print(class_instances)
             else:
-                print(stored_objects)
+                print(storage.all())
 
     def do_update(self, arg):
         """Updates an instance based on the class name and ID by adding or
@@ -177,7 +195,6 @@ class HBNBCommand(cmd.Cmd):
         <attribute_value> or <class>.update(<id>, <attribute_name>,
         <attribute_value>) or <class>.update(<id>, <dictionary>)"""
         argl = parse(arg)
-        obj_stored = storage.all()
 
         if len(argl) == 0:
             print("** class name missing **")
@@ -188,7 +205,7 @@ class HBNBCommand(cmd.Cmd):
         if len(argl) == 1:
             print("** instance id missing **")
             return False
-        if f"{argl[0]}.{argl[1]}" not in obj_stored.keys():
+        if storage.get(argl[0], argl[1]) is None:
             print("** no instance found **")
             return False
         if len(argl) == 2:
@@ -199,12 +216,13 @@ class HBNBCommand(cmd.Cmd):
             return False
 
         if len(argl) == 4:
-            obj_key = f"{argl[0]}.{argl[1]}"
-            obj_dict = obj_stored[obj_key]
+            obj_dict = storage.get(argl[0], argl[1])
             attr_name = argl[2]
             attr_val = argl[3]
 
-            if attr_name in ["id", "created_at", "updated_at"]:
+            if attr_name in ["id", "created_at", "updated_at"] or \
+                    isinstance(getattr(type(obj_dict), attr_name, None),
+                               property):
                 return
 
             if hasattr(obj_dict, attr_name):
@@ -220,12 +238,13 @@ class HBNBCommand(cmd.Cmd):
             obj_dict.updated_at = datetime.now().isoformat()
 
         if len(argl) == 3 and type(argl[2]) == dict:
-            obj_key = f"{argl[0]}.{argl[1]}"
             attribute_dict = argl[2]
-            obj_dict = obj_stored[obj_key]
+            obj_dict = storage.get(argl[0], argl[1])
 
             for attr_name, attr_val in attribute_dict.items():
-                if attr_name in ["id", "created_at", "updated_at"]:
+                if attr_name in ["id", "created_at", "updated_at"] or \
+                        isinstance(getattr(type(obj_dict), attr_name, None),
+                                   property):
                     return
                 if hasattr(obj_dict, attr_name):
                     attr_present = getattr(obj_dict, attr_name)
@@ -241,6 +260,28 @@ class HBNBCommand(cmd.Cmd):
 
         storage.save()
 
+    def do_begin(self, arg):
+        """Starts a transaction: changes are saved once on commit.
+        Usage: begin"""
+        if storage.in_transaction():
+            print("** transaction already in progress **")
+            return
+        storage.begin()
+
+    def do_commit(self, arg):
+        """Saves every change made since begin. Usage: commit"""
+        if not storage.in_transaction():
+            print("** no transaction in progress **")
+            return
+        storage.commit()
+
+    def do_rollback(self, arg):
+        """Discards every change made since begin. Usage: rollback"""
+        if not storage.in_transaction():
+            print("** no transaction in progress **")
+            return
+        storage.rollback()
+
     def do_count(self, arg):
         """Retrieves the number of instances of a class.
         Usage: count <class name> or <class name>.count()"""
@@ -252,12 +293,93 @@ class HBNBCommand(cmd.Cmd):
             print("** class doesn't exist **")
             return
         else:
-            count = 0
-            class_instances = {key: value for key, value in
-                               storage.all().items()
-                               if key.startswith(argl[0])}
-            count = len(class_instances)
-            print(count)
+            print(storage.count(argl[0]))
+
+    def do_stats(self, arg):
+        """Prints the count, sum, mean (default), min or max of a numeric
+        attribute of a class, optionally per value of another attribute.
+        Usage: stats <class name> <attribute> [<operation>] [<group by>]
+        or <class name>.stats(<attribute>, [<operation>], [<group by>])"""
+        argl = parse(arg)
+        if not argl:
+            print("** class name missing **")
+        elif argl[0] not in HBNBCommand.__all_classes:
+            print("** class doesn't exist **")
+        elif len(argl) == 1:
+            print("** attribute name missing **")
+        elif len(argl) > 2 and argl[2] not in OPERATIONS:
+            print("** unknown operation **")
+        else:
+            op = argl[2] if len(argl) > 2 else "mean"
+            by = argl[3] if len(argl) > 3 else None
+            print(storage.aggregate(argl[0], argl[1], op, by))
+
+    def do_near(self, arg):
+        """Prints the k (default 1) instances of a class nearest to a point.
+        Usage: near <class name> <latitude> <longitude> [<k>] or
+        <class name>.near(<latitude>, <longitude>, [<k>])"""
+        argl = parse(arg)
+        if not argl:
+            print("** class name missing **")
+        elif argl[0] not in HBNBCommand.__all_classes:
+            print("** class doesn't exist **")
+        elif len(argl) < 3:
+            print("** coordinates missing **")
+        else:
+            try:
+                lat, lon = float(argl[1]), float(argl[2])
+                k = int(argl[3]) if len(argl) > 3 else 1
+            except ValueError:
+                print("** invalid coordinates **")
+                return
+            try:
+                print(storage.near(argl[0], lat, lon, k))
+            except ValueError as error:
+                print(f"** {error} **")
+
+    def do_search(self, arg):
+        """Prints the ids of the instances of a class whose text best
+        matches some words, best first.
+        Usage: search <class name> <words> or <class name>.search(<words>)"""
+        argl = parse(arg)
+        if not argl:
+            print("** class name missing **")
+        elif argl[0] not in HBNBCommand.__all_classes:
+            print("** class doesn't exist **")
+        elif len(argl) == 1:
+            print("** search text missing **")
+        else:
+            try:
+                found = storage.search(argl[0], " ".join(argl[1:]))
+            except ValueError as error:
+                print(f"** {error} **")
+                return
+            if not found:
+                print("** no instances found **")
+            for obj in found.values():
+                print(obj.id)
+
+    def do_within(self, arg):
+        """Prints the instances of a class located in a bounding box.
+        Usage: within <class name> <south> <west> <north> <east> or
+        <class name>.within(<south>, <west>, <north>, <east>)"""
+        argl = parse(arg)
+        if not argl:
+            print("** class name missing **")
+        elif argl[0] not in HBNBCommand.__all_classes:
+            print("** class doesn't exist **")
+        elif len(argl) < 5:
+            print("** coordinates missing **")
+        else:
+            try:
+                bounds = [float(value) for value in argl[1:5]]
+            except ValueError:
+                print("** invalid coordinates **")
+                return
+            try:
+                print(storage.within(argl[0], *bounds))
+            except ValueError as error:
+                print(f"** {error} **")
 
 
 if __name__ == "__main__":
@@ -1,7 +1,40 @@
 #!/usr/bin/python3
 """Package initialization for the models directory."""
 
-from models.engine.file_storage import FileStorage
+from os import getenv
 
-storage = FileStorage()
-storage.reload()
+if getenv("HBNB_TYPE_STORAGE") == "db":
+    from models.engine.db_storage import DBStorage
+    storage = DBStorage(db_path=getenv("HBNB_DB_PATH", "hbnb.db"))
+    storage.reload()
+elif getenv("HBNB_TYPE_STORAGE") == "snapshot":
+    from models.engine.snapshot_storage import SnapshotStorage
+    storage = SnapshotStorage(
+        file_path=getenv("HBNB_SNAPSHOT_PATH", "file.snapshot"))
+    storage.reload()
+elif getenv("HBNB_TYPE_STORAGE") == "socket":
+    from models.engine.socket_storage import SocketStorage
+    storage = SocketStorage(
+        socket_path=getenv("HBNB_SOCKET_PATH", "hbnb.sock"))
+    storage.reload()
+else:
+    from models.engine.file_storage import FileStorage
+    storage = FileStorage(
+        file_path=getenv("HBNB_FILE_PATH"),
+        wal=getenv("HBNB_STORAGE_WAL") == "1",
+        serializer=getenv("HBNB_STORAGE_SERIALIZER"),
+        write_behind=getenv("HBNB_STORAGE_WRITE_BEHIND") == "1",
+        max_staleness=float(getenv("HBNB_STORAGE_MAX_STALENESS", "1")),
+        shard_dir=getenv("HBNB_SHARD_DIR"),
+        shard_prefix=int(getenv("HBNB_SHARD_PREFIX", "0")),
+        compact_models=getenv("HBNB_COMPACT_MODELS") == "1",
+        shared=getenv("HBNB_STORAGE_SHARED") == "1",
+        threadsafe=getenv("HBNB_STORAGE_THREADSAFE") == "1")
+    progress = None
+    if getenv("HBNB_RELOAD_PROGRESS") == "1":
+        from models.engine.progress import ReloadProgress
+        progress = ReloadProgress()
+    classes = getenv("HBNB_RELOAD_CLASSES")
+    if classes:
+        classes = [name.strip() for name in classes.split(",")]
+    storage.reload(progress=progress, classes=classes or None)
@@ -1,9 +1,17 @@
 #!/usr/bin/python3
 """Defines Amenities and inherits from the BaseModel class"""
 
+import models
 from models.base_model import BaseModel
 
 
 class Amenity(BaseModel):
     """Amenity class - subclass of the BaseModel"""
     name = ""
+
+    @property
+    def places(self):
+        """Returns the list of the Place instances offering this
+        Amenity."""
+        return (list(models.storage.related("Place", "amenity_ids",
+                                            self.id).values()))
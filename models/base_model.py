@@ -25,17 +25,32 @@ class BaseModel:
             # Remove __class__ from kwargs
             kwargs.pop('__class__', None)
 
-            date_fmt = "%Y-%m-%dT%H:%M:%S.%f"
-
-            # Convert created_at and updated_at to datetime objects
-            kwargs['created_at'] = datetime.strptime(
-                kwargs['created_at'], date_fmt)
-
-            kwargs['updated_at'] = datetime.strptime(
-                kwargs['updated_at'], date_fmt)
-
-            for key, value in kwargs.items():
-                setattr(self, key, value)
+            # Convert created_at and updated_at to datetime objects,
+            # parsing once when both hold the same timestamp
+            created_at = kwargs['created_at']
+            kwargs['created_at'] = datetime.fromisoformat(created_at)
+            if kwargs['updated_at'] == created_at:
+                kwargs['updated_at'] = kwargs['created_at']
+            else:
+                kwargs['updated_at'] = datetime.fromisoformat(
+                    kwargs['updated_at'])
+
+            # Not stored yet, so there is nothing to flag in storage
+            self.__dict__.update(kwargs)
+
+    def __setattr__(self, name, value):
+        """Flags the instance as dirty in storage, then sets the attribute.
+        A thread-safe storage's write lock is held over both, so no save
+        from another thread runs between them and clears the flag before
+        the value it covers is set."""
+        lock = getattr(models.storage, "rwlock", None)
+        if lock is None:
+            models.storage.touch(self, name)
+            super().__setattr__(name, value)
+            return
+        with lock.writing():
+            models.storage.touch(self, name)
+            super().__setattr__(name, value)
 
     def __str__(self):
         """Returns a string representation of the instance."""
@@ -1,6 +1,7 @@
 #!/usr/bin/python3
 """Defines Cities and inherits from the BaseModel class"""
 
+import models
 from models.base_model import BaseModel
 
 
@@ -8,3 +9,14 @@ class City(BaseModel):
     """City class  - subclass of the BaseModel"""
     state_id = ""
     name = ""
+
+    @property
+    def state(self):
+        """Returns the State of this City, or None."""
+        return (models.storage.get("State", self.state_id))
+
+    @property
+    def places(self):
+        """Returns the list of the Place instances in this City."""
+        return (list(models.storage.related("Place", "city_id",
+                                            self.id).values()))
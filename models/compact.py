@@ -0,0 +1,165 @@
+#!/usr/bin/python3
+"""Compact, slotted variants of the model classes.
+
+compact(Place) returns a subclass of Place named Place whose id,
+timestamps and class-level attributes live in __slots__, so a loaded
+instance needs no per-instance __dict__. Attributes without a slot, such
+as the ones `update` adds, go to a dictionary in the `_extra` slot,
+created on first use. The __dict__ the variants inherit from BaseModel
+is never read, so it is never created either. Foreign-key strings are
+interned, so every Review of a place shares one place_id string.
+"""
+
+from datetime import datetime
+import models
+import sys
+
+_compact = {}
+
+
+def compact(cls):
+    """Returns the compact variant of model class cls, built once."""
+    variant = _compact.get(cls)
+    if variant is None:
+        fields = ["id", "created_at", "updated_at"]
+        for base in reversed(cls.__mro__):
+            fields += [name for name, value in vars(base).items()
+                       if not name.startswith("_") and name not in fields
+                       and not callable(value)
+                       and not isinstance(value, property)]
+        variant = type(cls.__name__, (CompactModel, cls),
+                       {"__slots__": tuple(fields) + ("_extra",),
+                        "_fields": tuple(fields),
+                        "__module__": __name__,
+                        "__doc__": f"Compact variant of {cls.__name__}."})
+        _compact[cls] = variant
+    return (variant)
+
+
+def get_state(obj):
+    """Returns a new dictionary of the attributes set on obj, whether they
+    live in its slots, its _extra slot or, for a regular model, its
+    __dict__."""
+    fields = getattr(type(obj), "_fields", None)
+    if fields is None:
+        return (dict(obj.__dict__))
+    state = {}
+    for name in fields:
+        try:
+            state[name] = object.__getattribute__(obj, name)
+        except AttributeError:
+            pass
+    state.update(_extra(obj))
+    return (state)
+
+
+def set_state(obj, state):
+    """Replaces every attribute of obj with the ones of state, a
+    dictionary returned by get_state(). Storage is not notified."""
+    fields = getattr(type(obj), "_fields", None)
+    if fields is None:
+        obj.__dict__.clear()
+        obj.__dict__.update(state)
+        return
+    for name in fields:
+        try:
+            object.__delattr__(obj, name)
+        except AttributeError:
+            pass
+    try:
+        object.__delattr__(obj, "_extra")
+    except AttributeError:
+        pass
+    for name, value in state.items():
+        _set(obj, name, value)
+
+
+def _extra(obj):
+    """Returns the dictionary of the attributes of a compact obj without a
+    slot, empty when it has none."""
+    try:
+        return (object.__getattribute__(obj, "_extra"))
+    except AttributeError:
+        return ({})
+
+
+def _set(obj, name, value):
+    """Sets attribute name of a compact obj, in its slot or in _extra."""
+    if name in type(obj)._fields:
+        object.__setattr__(obj, name, value)
+        return
+    try:
+        object.__getattribute__(obj, "_extra")[name] = value
+    except AttributeError:
+        object.__setattr__(obj, "_extra", {name: value})
+
+
+class CompactModel:
+    """Methods shared by the compact model variants."""
+    __slots__ = ()
+
+    def __init__(self, *args, **kwargs):
+        """Initializes the instance like BaseModel, storing attributes in
+        slots and interning foreign-key strings."""
+        if not kwargs:
+            super().__init__()
+            return
+        kwargs.pop('__class__', None)
+        created_at = kwargs['created_at']
+        kwargs['created_at'] = datetime.fromisoformat(created_at)
+        if kwargs['updated_at'] == created_at:
+            kwargs['updated_at'] = kwargs['created_at']
+        else:
+            kwargs['updated_at'] = datetime.fromisoformat(
+                kwargs['updated_at'])
+        # Not stored yet, so there is nothing to flag in storage
+        for name, value in kwargs.items():
+            if type(value) is str and name.endswith("_id"):
+                value = sys.intern(value)
+            _set(self, name, value)
+
+    def __setattr__(self, name, value):
+        """Flags the instance as dirty in storage, then sets the attribute
+        in its slot, or in _extra, under the write lock of a thread-safe
+        storage as BaseModel does."""
+        lock = getattr(models.storage, "rwlock", None)
+        if lock is None:
+            models.storage.touch(self, name)
+            _set(self, name, value)
+            return
+        with lock.writing():
+            models.storage.touch(self, name)
+            _set(self, name, value)
+
+    def __delattr__(self, name):
+        """Deletes an attribute from its slot, or from _extra."""
+        extra = _extra(self)
+        if name in type(self)._fields or name not in extra:
+            object.__delattr__(self, name)
+            return
+        del extra[name]
+
+    def __getattr__(self, name):
+        """Returns an attribute without a slot from _extra, or the
+        class-level default of an attribute whose slot was never set."""
+        extra = _extra(self)
+        if name in extra:
+            return (extra[name])
+        for base in type(self).__mro__[1:]:
+            if name in vars(base):
+                return (vars(base)[name])
+        raise AttributeError(f"'{type(self).__name__}' object has no "
+                             f"attribute '{name}'")
+
+    def __str__(self):
+        """Returns a string representation of the instance."""
+        return (f"[{type(self).__name__}] ({self.id}) {get_state(self)}")
+
+    def to_dict(self):
+        """Returns a dictionary representation of the instance."""
+        obj_dict = get_state(self)
+        obj_dict['__class__'] = type(self).__name__
+        for name in ('created_at', 'updated_at'):
+            if isinstance(obj_dict.get(name), datetime):
+                obj_dict[name] = obj_dict[name].isoformat()
+        return (obj_dict)
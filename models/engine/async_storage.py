@@ -0,0 +1,152 @@
+#!/usr/bin/python3
+"""Module defining AsyncFileStorage, an asyncio facade over FileStorage."""
+
+import asyncio
+from models.engine.file_storage import FileStorage
+
+
+class AsyncFileStorage:
+    """Awaitable access to a write-behind FileStorage from an event loop.
+
+    Lookups (get, all, count, find) are dictionary reads that never block,
+    so they run inline on the loop: any number of concurrent readers
+    interleave without a lock. The records a reload leaves undecoded, or
+    unread when given classes, are read and turned into instances in the
+    executor first, by a full reload() or else by the first call, so no
+    lookup reads or decodes them on the loop. save() only copies the
+    dirty records on the loop, as the write-behind mode does, then waits
+    in an executor for the background writer to encode them and write
+    them to disk.
+    Concurrent saves coalesce: while one write is running, every save that
+    arrives waits for the single write that follows it. reload() parses
+    the files in the executor; other calls wait until it is done.
+
+    Model instances register with models.storage, so set it to the
+    wrapped storage before using the facade.
+    """
+
+    def __init__(self, storage=None, *, executor=None, **options):
+        """Wraps storage, or a new FileStorage built from options with
+        write_behind enabled. executor runs the blocking work, the loop's
+        default executor when None."""
+        if storage is None:
+            storage = FileStorage(write_behind=True, **options)
+        elif options:
+            raise ValueError("options only apply to a new storage")
+        if not storage.write_behind:
+            raise ValueError("AsyncFileStorage needs a write-behind storage")
+        self.storage = storage
+        self.executor = executor
+        self.writes = 0
+        self.__requested = 0
+        self.__written = 0
+        self.__writing = None
+        self.__reloading = None
+        self.__warm = False
+        self.__warming = None
+
+    async def get(self, cls, id):
+        """Returns the instance of cls with the given id, or None."""
+        await self.__ready()
+        return (self.storage.get(cls, id))
+
+    async def all(self, cls=None):
+        """Returns the stored instances, optionally of cls only."""
+        await self.__ready()
+        return (self.storage.all(cls))
+
+    async def count(self, cls=None):
+        """Returns the number of stored instances, optionally of cls only."""
+        await self.__ready()
+        return (self.storage.count(cls))
+
+    async def find(self, cls, **filters):
+        """Returns the instances of cls whose attributes equal every given
+        filter."""
+        await self.__ready()
+        return (self.storage.find(cls, **filters))
+
+    async def new(self, obj):
+        """Adds obj to the storage."""
+        await self.__ready()
+        self.storage.new(obj)
+
+    async def delete(self, obj=None):
+        """Removes obj from the storage if it is stored."""
+        await self.__ready()
+        self.storage.delete(obj)
+
+    async def save(self):
+        """Returns once every change made so far is on disk."""
+        await self.__ready()
+        self.storage.save()
+        self.__requested += 1
+        ticket = self.__requested
+        while self.__written < ticket:
+            if self.__writing is None:
+                self.__writing = asyncio.ensure_future(self.__write())
+            await asyncio.shield(self.__writing)
+
+    async def sync(self):
+        """Waits until every saved change is on disk."""
+        await self.__ready()
+        await self.__run(self.storage.sync)
+
+    async def reload(self, **kwargs):
+        """Reloads the storage from disk, as FileStorage.reload(**kwargs),
+        without blocking the loop."""
+        await self.__ready(warm=False)
+        while self.__writing is not None:
+            await asyncio.wait({self.__writing})
+        if self.__warming is not None:
+            await asyncio.wait({self.__warming})
+        self.__warm = False
+
+        def reload():
+            self.storage.reload(**kwargs)
+            if kwargs.get("classes") is None:
+                self.storage.all()
+                self.__warm = True
+
+        self.__reloading = asyncio.ensure_future(self.__run(reload))
+        try:
+            await asyncio.shield(self.__reloading)
+        finally:
+            self.__reloading = None
+
+    async def __write(self):
+        """Waits for the background writer to persist every collected
+        change, on behalf of every save requested so far."""
+        covered = self.__requested
+        try:
+            await self.__run(self.storage.sync)
+            self.__written = covered
+            self.writes += 1
+        finally:
+            self.__writing = None
+
+    async def __ready(self, warm=True):
+        """Waits for a running reload to finish; its error, if any, is
+        raised by reload() only. Then, when warm is True, turns the
+        records still undecoded into instances in the executor."""
+        reloading = self.__reloading
+        if reloading is not None and not reloading.done():
+            await asyncio.wait({reloading})
+        if warm and not self.__warm:
+            if self.__warming is None:
+                self.__warming = asyncio.ensure_future(self.__warm_up())
+            await asyncio.shield(self.__warming)
+
+    async def __warm_up(self):
+        """Turns every undecoded record into an instance in the executor,
+        on behalf of every call waiting for it."""
+        try:
+            await self.__run(self.storage.all)
+            self.__warm = True
+        finally:
+            self.__warming = None
+
+    def __run(self, func):
+        """Returns a future of func() run in the executor."""
+        return (asyncio.get_running_loop().run_in_executor(self.executor,
+                                                           func))
@@ -0,0 +1,121 @@
+#!/usr/bin/python3
+"""Crash-safe file writers used by FileStorage.
+
+Data is written to a temporary file next to the target, fsync'd, then
+renamed over the target, so readers and a restart after a crash always
+see either the previous or the new content, never a truncated file. Each
+write gets a temporary file of its own, so concurrent writers of one
+path, in this process or another, never write into each other's file.
+"""
+
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+_umask = os.umask(0)
+os.umask(_umask)
+
+
+def fsync_dir(path):
+    """Flushes the directory entry of path, making a rename durable."""
+    try:
+        fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def _remove(path):
+    """Removes the file at path if it still exists."""
+    try:
+        os.unlink(path)
+    except OSError:
+        pass
+
+
+class AtomicWriter:
+    """Replaces files atomically through a temporary file and a rename."""
+
+    def __init__(self, fsync=True):
+        """Initializes the writer; fsync=False skips the disk flushes."""
+        self.fsync = fsync
+
+    def write(self, path, data):
+        """Atomically replaces the content of path with data."""
+        self._commit(self._write_tmp(path, data), path)
+
+    def wait(self):
+        """Returns once every write so far is durable. Writes are
+        synchronous, so there is nothing to wait for."""
+
+    def _write_tmp(self, path, data):
+        """Writes data to a new temporary file next to path, with the
+        permissions of path, or those open() gives a new file, and returns
+        the temporary file's path."""
+        fd, tmp_path = tempfile.mkstemp(
+            prefix=f"{os.path.basename(path)}.", suffix=".tmp",
+            dir=os.path.dirname(os.path.abspath(path)))
+        try:
+            with os.fdopen(fd, 'wb') as file:
+                file.write(data)
+            try:
+                mode = os.stat(path).st_mode & 0o7777
+            except FileNotFoundError:
+                mode = 0o666 & ~_umask
+            os.chmod(tmp_path, mode)
+        except BaseException:
+            _remove(tmp_path)
+            raise
+        return (tmp_path)
+
+    def _commit(self, tmp_path, path):
+        """Flushes tmp_path to disk and renames it over path; removes it
+        if that fails."""
+        try:
+            if self.fsync:
+                with open(tmp_path, 'rb+') as file:
+                    os.fsync(file.fileno())
+            os.replace(tmp_path, path)
+        except BaseException:
+            _remove(tmp_path)
+            raise
+        if self.fsync:
+            fsync_dir(path)
+
+
+class DoubleBufferedWriter(AtomicWriter):
+    """AtomicWriter that fsyncs and renames on a background thread.
+
+    write() returns as soon as the data is in a temporary file, so the
+    caller can prepare the next save while the previous one is flushed.
+    At most one flush is in flight.
+    """
+
+    def __init__(self, fsync=True):
+        """Initializes the writer and its flushing thread."""
+        super().__init__(fsync)
+        self.__executor = ThreadPoolExecutor(max_workers=1)
+        self.__pending = None
+
+    def write(self, path, data):
+        """Writes data to a temporary file and queues its flush and rename
+        over path once the previous write is durable."""
+        tmp_path = self._write_tmp(path, data)
+        try:
+            self.wait()
+        except BaseException:
+            _remove(tmp_path)
+            raise
+        self.__pending = self.__executor.submit(self._commit, tmp_path, path)
+
+    def wait(self):
+        """Blocks until the last queued write is durable, re-raising any
+        error it hit."""
+        pending, self.__pending = self.__pending, None
+        if pending is not None:
+            pending.result()
@@ -0,0 +1,209 @@
+#!/usr/bin/python3
+"""Column-oriented copies of model attributes, for analytical queries.
+
+A ColumnTable keeps one array per attribute of the instances of a class,
+so aggregates and range filters run over flat arrays instead of calling
+getattr on every instance. They are vectorized with NumPy when it is
+installed, and computed in pure Python otherwise.
+"""
+
+from array import array
+import math
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+OPERATIONS = ("count", "sum", "mean", "min", "max")
+
+
+class ColumnTable:
+    """Columns of the attributes of the instances of one class.
+
+    Numeric columns are array('d'), holding NaN where the value is missing
+    or not a number; NaN values are left out of every aggregate. Columns
+    used for grouping are dictionary-encoded into array('q') codes. Rows
+    stay dense: removing a row moves the last row into its place.
+    """
+
+    def __init__(self):
+        """Initializes an empty table."""
+        self.__keys = []
+        self.__rows = {}
+        self.__numbers = {}
+        self.__codes = {}
+        self.__groups = {}
+
+    def __len__(self):
+        """Returns the number of rows."""
+        return (len(self.__keys))
+
+    def has(self, attr):
+        """Returns True when attr has a column."""
+        return (attr in self.__numbers or attr in self.__codes)
+
+    def add_columns(self, objects, numbers=(), groups=()):
+        """Adds the numeric columns `numbers` and the grouping columns
+        `groups` that are missing, filled from the {key: obj} objects of
+        the rows."""
+        keys = self.__keys
+        for attr in numbers:
+            if attr not in self.__numbers:
+                self.__numbers[attr] = array("d", (
+                    self.__number(objects[key], attr) for key in keys))
+        for attr in groups:
+            if attr not in self.__codes:
+                self.__groups[attr] = ([], {})
+                self.__codes[attr] = array("q", (
+                    self.__code(objects[key], attr) for key in keys))
+
+    def add(self, key, obj):
+        """Stores the attributes of obj in the row of key, adding the row
+        if needed."""
+        row = self.__rows.get(key)
+        if row is None:
+            self.__rows[key] = len(self.__keys)
+            self.__keys.append(key)
+            for attr, column in self.__numbers.items():
+                column.append(self.__number(obj, attr))
+            for attr, column in self.__codes.items():
+                column.append(self.__code(obj, attr))
+            return
+        for attr, column in self.__numbers.items():
+            column[row] = self.__number(obj, attr)
+        for attr, column in self.__codes.items():
+            column[row] = self.__code(obj, attr)
+
+    def remove(self, key):
+        """Drops the row of key."""
+        row = self.__rows.pop(key, None)
+        if row is None:
+            return
+        last = self.__keys.pop()
+        for column in (*self.__numbers.values(), *self.__codes.values()):
+            value = column.pop()
+            if row < len(column):
+                column[row] = value
+        if row < len(self.__keys):
+            self.__keys[row] = last
+            self.__rows[last] = row
+
+    def select(self, **ranges):
+        """Returns the keys of the rows whose numeric attributes lie between
+        the (low, high) bounds given for them (inclusive, None meaning
+        unbounded)."""
+        keys = self.__keys
+        if numpy is not None and keys:
+            return ([keys[row] for row in
+                     numpy.flatnonzero(self.__mask(ranges)).tolist()])
+        return ([keys[row] for row in self.__rows_within(ranges)])
+
+    def aggregate(self, attr, op="mean", by=None, **ranges):
+        """Returns the `op` (count, sum, mean, min or max) of the numeric
+        values of attr over the rows within ranges, or a {group value:
+        result} dictionary when grouped by the attribute `by`."""
+        if op not in OPERATIONS:
+            raise ValueError(f"unknown operation: {op}")
+        if numpy is not None and self.__keys:
+            return (self.__aggregate_numpy(attr, op, by, ranges))
+        values = self.__numbers[attr]
+        rows = [row for row in self.__rows_within(ranges)
+                if not math.isnan(values[row])]
+        if by is None:
+            return (self.__reduce(op, [values[row] for row in rows]))
+        codes = self.__codes[by]
+        grouped = {}
+        for row in rows:
+            grouped.setdefault(codes[row], []).append(values[row])
+        names = self.__groups[by][0]
+        return ({names[code]: self.__reduce(op, found)
+                 for code, found in grouped.items()})
+
+    def __aggregate_numpy(self, attr, op, by, ranges):
+        """aggregate() vectorized with NumPy."""
+        values = numpy.frombuffer(self.__numbers[attr])
+        mask = self.__mask(ranges) & ~numpy.isnan(values)
+        values = values[mask]
+        if by is None:
+            if op == "count":
+                return (int(values.size))
+            if op == "sum":
+                return (float(values.sum()))
+            if not values.size:
+                return (None)
+            return (float(getattr(values, op)()))
+        names = self.__groups[by][0]
+        codes = numpy.frombuffer(self.__codes[by], dtype=numpy.int64)[mask]
+        counts = numpy.bincount(codes, minlength=len(names))
+        if op in ("sum", "mean"):
+            result = numpy.bincount(codes, values, minlength=len(names))
+            if op == "mean":
+                result = result / numpy.maximum(counts, 1)
+        elif op == "min":
+            result = numpy.full(len(names), numpy.inf)
+            numpy.minimum.at(result, codes, values)
+        elif op == "max":
+            result = numpy.full(len(names), -numpy.inf)
+            numpy.maximum.at(result, codes, values)
+        else:
+            result = counts
+        return ({names[code]: result[code].item()
+                 for code in numpy.flatnonzero(counts).tolist()})
+
+    def __mask(self, ranges):
+        """Returns the NumPy boolean mask of the rows within ranges."""
+        mask = numpy.ones(len(self.__keys), dtype=bool)
+        for attr, (low, high) in ranges.items():
+            values = numpy.frombuffer(self.__numbers[attr])
+            if low is not None:
+                mask &= values >= low
+            if high is not None:
+                mask &= values <= high
+        return (mask)
+
+    def __rows_within(self, ranges):
+        """Returns the rows within ranges, in pure Python."""
+        rows = range(len(self.__keys))
+        for attr, (low, high) in ranges.items():
+            values = self.__numbers[attr]
+            rows = [row for row in rows
+                    if (low is None or values[row] >= low) and
+                    (high is None or values[row] <= high)]
+        return (rows)
+
+    @staticmethod
+    def __reduce(op, values):
+        """Returns the `op` of a list of floats, in pure Python."""
+        if op == "count":
+            return (len(values))
+        if op == "sum":
+            return (math.fsum(values))
+        if not values:
+            return (None)
+        if op == "mean":
+            return (math.fsum(values) / len(values))
+        return (min(values) if op == "min" else max(values))
+
+    @staticmethod
+    def __number(obj, attr):
+        """Returns the numeric attr of obj as a float, or NaN."""
+        value = getattr(obj, attr, None)
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            return (math.nan)
+        return (float(value))
+
+    def __code(self, obj, attr):
+        """Returns the dictionary code of the attr value of obj, None and
+        unhashable values sharing the code of None."""
+        names, codes = self.__groups[attr]
+        value = getattr(obj, attr, None)
+        try:
+            code = codes.get(value)
+        except TypeError:
+            value = None
+            code = codes.get(value)
+        if code is None:
+            code = codes[value] = len(names)
+            names.append(value)
+        return (code)
@@ -0,0 +1,336 @@
+#!/usr/bin/python3
+"""Module defining DBStorage, a SQLite-backed storage engine with the same
+interface as FileStorage."""
+
+import json
+import sqlite3
+from contextlib import contextmanager
+from models.engine.columns import ColumnTable
+from models.engine.file_storage import FileStorage
+from models.engine.indexes import GridIndex, ListIndex, TextIndex
+
+
+class DBStorage:
+    """Stores one row per instance in a SQLite database.
+
+    Rows are keyed by <class name>.<id> and indexed by class, so lookups by
+    key or class never scan the whole table, and the foreign-key fields of
+    FileStorage.index_dict get expression indexes for find(). Instances
+    are loaded on demand and kept in an identity map.
+
+    Changes are written to the connection before every query and committed
+    by save(), so queries always see them. The database runs in WAL mode:
+    readers in other processes are never blocked by a writer. Statements
+    are parameterized constants, so sqlite3 prepares each one once and
+    reuses it from its statement cache.
+    """
+    __schema = ("CREATE TABLE IF NOT EXISTS objects ("
+                "key TEXT PRIMARY KEY, cls TEXT NOT NULL, "
+                "data TEXT NOT NULL) WITHOUT ROWID",
+                "CREATE INDEX IF NOT EXISTS objects_cls ON objects (cls)")
+    __upsert = ("INSERT OR REPLACE INTO objects (key, cls, data) "
+                "VALUES (?, ?, ?)")
+    __remove = "DELETE FROM objects WHERE key = ?"
+
+    def __init__(self, *, db_path='hbnb.db'):
+        """Opens the database at db_path, creating the schema if needed."""
+        self.db_path = db_path
+        self.__conn = sqlite3.connect(db_path, timeout=30,
+                                      check_same_thread=False)
+        self.__conn.execute("PRAGMA journal_mode=WAL")
+        self.__conn.execute("PRAGMA synchronous=NORMAL")
+        for statement in self.__schema:
+            self.__conn.execute(statement)
+        for name, indexes in FileStorage.index_dict.items():
+            for attr, index_cls in indexes.items():
+                if index_cls is ListIndex:
+                    continue
+                self.__conn.execute(
+                    f"CREATE INDEX IF NOT EXISTS objects_{name}_{attr} ON "
+                    f"objects (cls, json_extract(data, '$.{attr}'))")
+        self.__conn.commit()
+        self.__objects = {}
+        self.__dirty = {}
+        self.__touched = None
+
+    def all(self, cls=None):
+        """Returns a dictionary of every stored instance, or only of the
+        instances of cls (a class or class name) when given."""
+        if cls is None:
+            rows = self.__query("SELECT key, data FROM objects")
+            self.__load(rows)
+            return (self.__objects)
+        rows = self.__query("SELECT key, data FROM objects WHERE cls = ?",
+                            (self.__class_name(cls),))
+        return (self.__load(rows))
+
+    def get(self, cls, id):
+        """Returns the instance of cls with the given id, or None."""
+        key = f"{self.__class_name(cls)}.{id}"
+        if key in self.__objects:
+            return (self.__objects[key])
+        rows = self.__query("SELECT key, data FROM objects WHERE key = ?",
+                            (key,))
+        return (self.__load(rows).get(key))
+
+    def count(self, cls=None):
+        """Returns the number of stored instances, optionally of cls only."""
+        if cls is None:
+            return (self.__query("SELECT COUNT(*) FROM objects")[0][0])
+        return (self.__query("SELECT COUNT(*) FROM objects WHERE cls = ?",
+                             (self.__class_name(cls),))[0][0])
+
+    def find(self, cls, **filters):
+        """Returns a dictionary of the instances of cls whose attributes
+        equal every given filter."""
+        name = self.__class_name(cls)
+        sql = "SELECT key, data FROM objects WHERE cls = ?"
+        params = [name]
+        for attr, value in filters.items():
+            if not attr.isidentifier():
+                raise ValueError(f"invalid attribute name: {attr}")
+            column = f"json_extract(data, '$.{attr}')"
+            model = FileStorage.class_dict.get(name)
+            if value == getattr(model, attr, None):
+                sql += f" AND ({column} = ? OR {column} IS NULL)"
+            else:
+                sql += f" AND {column} = ?"
+            params.append(value)
+        return (self.__load(self.__query(sql, params)))
+
+    def related(self, cls, attr, value):
+        """Returns a dictionary of the instances of cls whose attr equals
+        value, or holds it when attr has a ListIndex in
+        FileStorage.index_dict, as FileStorage.related()."""
+        name = self.__class_name(cls)
+        if FileStorage.index_dict.get(name, {}).get(attr) is not ListIndex:
+            return (self.find(name, **{attr: value}))
+        rows = self.__query(
+            "SELECT key, data FROM objects WHERE cls = ? AND EXISTS "
+            f"(SELECT 1 FROM json_each(data, '$.{attr}') WHERE value = ?)",
+            (name, value))
+        return (self.__load(rows))
+
+    def aggregate(self, cls, attr, op="mean", by=None, **ranges):
+        """Returns the `op` (count, sum, mean, min or max) of the numeric
+        values of attr over the instances of cls, optionally per value of
+        `by` and within (low, high) ranges, as FileStorage.aggregate()."""
+        table = self.__columns_for(cls, (attr, *ranges),
+                                   () if by is None else (by,))
+        return (table.aggregate(attr, op, by, **ranges))
+
+    def select(self, cls, **ranges):
+        """Returns a dictionary of the instances of cls whose numeric
+        attributes lie within the (low, high) pairs given for them."""
+        objects = self.all(cls)
+        table = self.__columns_for(cls, ranges, objects=objects)
+        return ({key: objects[key] for key in table.select(**ranges)})
+
+    def near(self, cls, lat, lon, k=1):
+        """Returns a dictionary of the k instances of cls nearest to the
+        point (lat, lon), nearest first."""
+        objects = self.all(cls)
+        keys = self.__spatial_for(cls, objects).nearest(lat, lon, k)
+        return ({key: objects[key] for key in keys})
+
+    def within(self, cls, south, west, north, east):
+        """Returns a dictionary of the instances of cls located in the
+        bounding box, as FileStorage.within()."""
+        objects = self.all(cls)
+        keys = self.__spatial_for(cls, objects).within(south, west, north,
+                                                       east)
+        return ({key: objects[key] for key in keys})
+
+    def search(self, cls, text, limit=10):
+        """Returns a dictionary of the `limit` instances of cls whose text
+        attributes best match the words of text, best first. The index is
+        built on every call, like the column tables."""
+        name = self.__class_name(cls)
+        if name not in FileStorage.text_dict:
+            raise ValueError(f"{name} has no text index")
+        objects = self.all(name)
+        index = TextIndex(FileStorage.text_dict[name])
+        for key, obj in objects.items():
+            index.add(key, obj)
+        return ({key: objects[key] for key, _ in index.search(text, limit)})
+
+    def new(self, obj):
+        """Adds obj to the storage."""
+        key = f"{obj.__class__.__name__}.{obj.id}"
+        self.__remember(key)
+        self.__objects[key] = obj
+        self.__dirty[key] = obj
+
+    def touch(self, obj, name=None):
+        """Flags a stored obj as modified. Called before every attribute
+        assignment on a BaseModel, with the attribute name."""
+        obj_id = getattr(obj, "id", None)
+        if obj_id is None:
+            return
+        key = f"{obj.__class__.__name__}.{obj_id}"
+        if self.__objects.get(key) is obj:
+            self.__remember(key)
+            self.__dirty[key] = obj
+
+    def delete(self, obj=None):
+        """Removes obj from the storage if it is stored."""
+        if obj is None:
+            return
+        key = f"{obj.__class__.__name__}.{obj.id}"
+        self.__remember(key)
+        self.__objects.pop(key, None)
+        self.__dirty[key] = None
+
+    def dirty_count(self):
+        """Returns the number of keys changed since the last save."""
+        return (len(self.__dirty))
+
+    def save(self):
+        """Commits every change, unless a transaction is open."""
+        if not self.in_transaction():
+            self.flush()
+
+    def flush(self):
+        """Writes the pending changes and commits them."""
+        self.__push()
+        self.__conn.commit()
+
+    def sync(self):
+        """Does nothing: flush() commits, so a saved change is already
+        durable when save() returns."""
+
+    def refresh(self):
+        """Does nothing: every query reads the database, which SQLite
+        shares between processes."""
+
+    def reload(self):
+        """Drops uncommitted changes and every loaded instance, so they are
+        read again from the database on next access."""
+        self.__conn.rollback()
+        self.__objects = {}
+        self.__dirty = {}
+        self.__touched = None
+
+    def close(self):
+        """Closes the database connection."""
+        self.__conn.close()
+
+    def in_transaction(self):
+        """Returns True between begin() and commit()/rollback()."""
+        return (self.__touched is not None)
+
+    def begin(self):
+        """Opens a transaction: saves are deferred until commit()."""
+        if self.__touched is None:
+            self.__touched = {}
+
+    def commit(self):
+        """Closes the transaction and commits its changes at once."""
+        self.__touched = None
+        self.flush()
+
+    def rollback(self):
+        """Closes the transaction, discards its changes and restores the
+        instances it changed to their committed state."""
+        touched = self.__touched
+        if touched is None:
+            return
+        self.__touched = None
+        self.__dirty = {}
+        self.__conn.rollback()
+        for key, obj in touched.items():
+            self.__objects.pop(key, None)
+            row = self.__conn.execute(
+                "SELECT data FROM objects WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                continue
+            if obj is None:
+                obj = self.__instantiate(row[0])
+            else:
+                obj.__dict__.clear()
+                obj.__dict__.update(self.__instantiate(row[0]).__dict__)
+            self.__objects[key] = obj
+
+    @contextmanager
+    def batch(self):
+        """Runs the with-block as one transaction: commits once on exit, or
+        rolls back if it raises. Nested batches join the outer one."""
+        if self.in_transaction():
+            yield self
+            return
+        self.begin()
+        try:
+            yield self
+        except BaseException:
+            self.rollback()
+            raise
+        self.commit()
+
+    transaction = batch
+
+    def __push(self):
+        """Writes the pending changes to the connection, uncommitted."""
+        if not self.__dirty:
+            return
+        dirty = self.__dirty
+        self.__dirty = {}
+        self.__conn.executemany(self.__upsert, [
+            (key, obj.__class__.__name__, json.dumps(obj.to_dict()))
+            for key, obj in dirty.items() if obj is not None])
+        self.__conn.executemany(self.__remove, [
+            (key,) for key, obj in dirty.items() if obj is None])
+
+    def __query(self, sql, params=()):
+        """Returns the rows of sql, run after pushing pending changes."""
+        self.__push()
+        return (self.__conn.execute(sql, params).fetchall())
+
+    def __load(self, rows):
+        """Returns a {key: instance} dictionary of (key, data) rows, reusing
+        instances already in the identity map."""
+        result = {}
+        for key, data in rows:
+            obj = self.__objects.get(key)
+            if obj is None:
+                obj = self.__objects[key] = self.__instantiate(data)
+            result[key] = obj
+        return (result)
+
+    def __remember(self, key):
+        """Records the instance stored under key the first time key is
+        changed inside the open transaction."""
+        if self.__touched is not None and key not in self.__touched:
+            self.__touched[key] = self.__objects.get(key)
+
+    def __columns_for(self, cls, numbers, groups=(), objects=None):
+        """Returns a column table of the instances of cls. Other processes
+        may change the database, so it is built again on every call."""
+        if objects is None:
+            objects = self.all(cls)
+        table = ColumnTable()
+        for key, obj in objects.items():
+            table.add(key, obj)
+        table.add_columns(objects, numbers, groups)
+        return (table)
+
+    def __spatial_for(self, cls, objects):
+        """Returns a GridIndex of the instances of cls in objects, built
+        on every call like the column tables."""
+        name = self.__class_name(cls)
+        if name not in FileStorage.spatial_dict:
+            raise ValueError(f"{name} has no location index")
+        grid = GridIndex(*FileStorage.spatial_dict[name])
+        for key, obj in objects.items():
+            grid.add(key, obj)
+        return (grid)
+
+    @staticmethod
+    def __instantiate(data):
+        """Builds a model instance from its JSON row data."""
+        record = json.loads(data)
+        return (FileStorage.class_dict[record["__class__"]](**record))
+
+    @staticmethod
+    def __class_name(cls):
+        """Returns the name of cls, which is either a class or a name."""
+        return (cls if isinstance(cls, str) else cls.__name__)
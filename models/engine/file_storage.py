@@ -2,8 +2,23 @@
 """Module to serialize instances to a JSON file
 and deserialize JSON file to instances"""
 
-import json
+import atexit
+from collections import deque
+from contextlib import ExitStack, contextmanager, nullcontext
+from functools import wraps
+import os
+import threading
+import time
+import weakref
+from models.engine.atomic import AtomicWriter, DoubleBufferedWriter
+from models.engine.columns import ColumnTable
+from models.engine.indexes import GridIndex, HashIndex, ListIndex, \
+    SortedIndex, TextIndex
+from models.engine.locks import FileLock, RWLock
+from models.engine.serializers import get_serializer
+from models.engine.views import StorageView
 from models.base_model import BaseModel
+from models.compact import compact, get_state, set_state
 from models.user import User
 from models.place import Place
 from models.city import City
@@ -14,9 +29,140 @@ from models.review import Review
 
 class FileStorage:
     """Serializes instances to a JSON file and deserializes JSON file to
-    instances."""
+    instances.
+
+    Records are encoded by a serializer backend (see serializers.py), picked
+    by name or from the extension of the file path.
+
+    Storage tracks which keys were created, modified or destroyed since the
+    last flush, and keeps the encoded bytes of every persisted object, so a
+    flush only re-encodes the dirty records.
+
+    reload() only decodes the file: records stay in __raw and become model
+    instances on first access through all(), get() or find().
+
+    Keys are also indexed by class name, so all(cls) and count(cls) only
+    touch the instances of that class. The attributes listed in index_dict
+    get a secondary index, built on the first find() on their class and
+    kept up to date afterwards.
+
+    related() follows the foreign keys of the models backwards through the
+    same indexes (a ListIndex for lists of ids such as Place.amenity_ids),
+    so `state.cities` or `place.reviews` cost O(related instances) once
+    the index of that attribute is built; no other index is built. Lists
+    must be assigned, not changed in place, for storage to see the change.
+
+    aggregate() and select() run over a columnar copy of the attributes of
+    a class (see columns.py), built on their first call on that class and
+    kept in sync like the attribute indexes.
+
+    near() and within() answer location queries on the classes listed in
+    spatial_dict from a GridIndex of their (latitude, longitude) points,
+    also built on first use and kept in sync.
+
+    search() ranks the instances of the classes listed in text_dict by the
+    words of their text attributes, from a TextIndex kept in sync the same
+    way. The index is cached in `<file_path>.<Class>.idx` (in `shard_dir`
+    when sharded) with a fingerprint of the files it was built from, and
+    is only reused while they are unchanged.
+
+    Inside a transaction (begin()/commit() or `with storage.batch():`) save()
+    is deferred until the commit, flush() and compact() do nothing, and
+    rollback() restores every object that was added, changed or deleted
+    since begin().
+
+    With `wal=True` every flush appends one put/delete record per dirty
+    object to `<file_path>.log` instead of rewriting the whole file; the log
+    is folded back into `file_path` every `compact_every` records.
+
+    Snapshots are written to a temporary file, fsync'd and renamed over
+    `file_path`, so a crash never leaves a truncated file behind. With
+    `double_buffer=True` the fsync and rename run in the background while
+    the next save is prepared; sync() waits for them. `fsync=False` trades
+    durability on power loss for speed.
+
+    With `write_behind=True` save() only copies the dirty records and
+    returns; a background thread encodes and writes them at most
+    `max_staleness` seconds later, so bursts of saves coalesce into one
+    write. sync() waits until everything saved so far is on disk, and runs
+    at exit.
+
+    With `shard_dir` set, records are stored in one file per class in that
+    directory (`<Class>.json`, or `<Class>.<id prefix>.json` with
+    `shard_prefix` characters of the id), and a flush only rewrites the
+    shards holding dirty records. reload(classes=[...]) then loads only the
+    shards of those classes. Sharding does not combine with the WAL or
+    write-behind modes.
+
+    reload(classes=[...]) only loads the records of the given classes; any
+    other class is loaded on its first access, and before its records are
+    written.
+
+    With `compact_models=True` loaded records become the slotted variants
+    of models/compact.py, which take far less memory per instance.
+
+    With `shared=True` several processes can work on the same files. Every
+    flush holds an exclusive advisory lock (see locks.py) on
+    `<file_path>.lock` (`shard_dir/.lock` when sharded), and reload() a
+    shared one. The lock file also holds a generation counter that every
+    write advances: before writing, a flush that finds it moved re-reads
+    only the files that changed since it last looked (only the new WAL
+    entries when the snapshot is unchanged) and merges their records, so
+    no process overwrites the records another one saved. Records changed
+    here since the last flush win over the ones on disk. refresh() merges
+    the same way without writing. Shared storage does not combine with the
+    write-behind mode.
+
+    With `threadsafe=True` the storage can be used from several threads.
+    Changes (new, touch, delete, transactions, reload) hold `rwlock`, a
+    reader-writer lock (see locks.py), exclusively. get(), count() and
+    all() hold it in shared mode and run concurrently; all() then returns
+    a copy of __objects. The queries served from indexes also hold it in
+    shared mode, but take its mutex too, as they update the indexes
+    lazily. save() copies the dirty records while holding the lock
+    exclusively, then encodes and writes them with the lock released, so
+    writers only wait for the copy; saves themselves run one at a time.
+    Sharded saves hold the lock for the whole write. A transaction holds
+    it exclusively from begin() to commit() or rollback(), which the same
+    thread calls: other threads wait to read or change anything, and their
+    saves are not deferred. A read-modify-write spanning several calls
+    holds `rwlock.writing()` around them.
+
+    snapshot() opens a read-only, point-in-time view of every record (see
+    views.py) without copying them: until the view is closed, storage
+    hands it the state of each key before its first change. export()
+    writes from such a view, so in thread-safe mode it holds no lock
+    while encoding and writers carry on meanwhile.
+    """
     __file_path = 'file.json'
     __objects = {}
+    __raw = {}
+    __raw_for = None
+    __dirty = {}
+    __encoded = {}
+    __encoded_for = None
+    __encoded_with = None
+    __by_class = {}
+    __indexed_for = None
+    __attr_indexes = {}
+    __stale = {}
+    __columns = {}
+    __column_stale = {}
+    __spatial = {}
+    __spatial_stale = {}
+    __text = {}
+    __text_stale = {}
+    __text_changed = set()
+    __text_writer = None
+    __undo = None
+    __dirty_before = None
+    __complete_for = None
+    __loaded = None
+    __deferred = {}
+    __shards = {}
+    __shards_for = None
+    __views = weakref.WeakSet()
+    __version = 0
     class_dict = {"BaseModel": BaseModel,
                   "User": User,
                   "Place": Place,
@@ -24,26 +170,1479 @@ class FileStorage:
                   "State": State,
                   "Amenity": Amenity,
                   "Review": Review}
+    index_dict = {"City": {"state_id": HashIndex},
+                  "Place": {"city_id": HashIndex,
+                            "user_id": HashIndex,
+                            "amenity_ids": ListIndex,
+                            "price_by_night": SortedIndex,
+                            "max_guest": SortedIndex,
+                            "latitude": SortedIndex,
+                            "longitude": SortedIndex},
+                  "Review": {"place_id": HashIndex,
+                             "user_id": HashIndex}}
+    spatial_dict = {"Place": ("latitude", "longitude")}
+    text_dict = {"Place": ("name", "description"),
+                 "Review": ("text",)}
+    __shared_methods = ("all", "get", "count", "dirty_count")
+    __query_methods = ("find", "find_range", "related", "aggregate",
+                       "select", "near", "within", "search", "index_sizes",
+                       "snapshot")
+    __exclusive_methods = ("new", "touch", "delete", "begin", "rollback")
+
+    def __init__(self, *, file_path=None, wal=False, compact_every=1000,
+                 lazy=True, serializer=None, fsync=True,
+                 double_buffer=False, write_behind=False,
+                 max_staleness=1.0, stream_threshold=32 << 20,
+                 shard_dir=None, shard_prefix=0, compact_models=False,
+                 shared=False, threadsafe=False):
+        """Initializes the storage engine options."""
+        if shard_dir is not None and (wal or write_behind):
+            raise ValueError("sharded storage does not support the WAL or "
+                             "write-behind modes")
+        if shared and write_behind:
+            raise ValueError("shared storage does not support the "
+                             "write-behind mode")
+        self.file_path = file_path or FileStorage.__file_path
+        self.serializer = get_serializer(serializer, self.file_path)
+        self.lazy = lazy
+        self.log_path = f"{self.file_path}.log"
+        self.wal = wal
+        self.compact_every = compact_every
+        self.__log_records = 0
+        self.__log_offset = 0
+        self.fsync = fsync
+        writer = DoubleBufferedWriter if double_buffer else AtomicWriter
+        self.__writer = writer(fsync)
+        self.__lock = threading.RLock()
+        self.rwlock = None
+        self.__held = None
+        self.__owner = None
+        self.__batches = deque()
+        if threadsafe:
+            self.rwlock = RWLock()
+            self.__lock_methods()
+        self.write_behind = write_behind
+        self.max_staleness = max_staleness
+        self.__cond = threading.Condition()
+        self.__thread = None
+        self.__pending = None
+        self.__failed = None
+        self.__pending_since = 0
+        self.__busy = False
+        self.__syncing = 0
+        self.__error = None
+        self.stream_threshold = stream_threshold
+        self.shard_dir = shard_dir
+        self.shard_prefix = shard_prefix
+        self.__extension = ".bin" if self.serializer.name == "binary" \
+            else ".json"
+        self.compact_models = compact_models
+        self.shared = shared
+        self.__file_lock = None
+        if shared:
+            self.__file_lock = FileLock(
+                os.path.join(shard_dir, ".lock") if shard_dir is not None
+                else f"{self.file_path}.lock")
+        self.__generation = None
+        self.__stats = {}
+        self.__models = FileStorage.class_dict
+        if compact_models:
+            self.__models = {name: compact(cls) for name, cls
+                             in FileStorage.class_dict.items()}
 
-    def all(self):
-        """Returns the dictionary __objects."""
+    def all(self, cls=None):
+        """Returns the dictionary __objects (a copy when thread-safe), or a
+        new dictionary with only the instances of cls (a class or class
+        name) when given."""
+        with self.__mutex():
+            if cls is not None:
+                return (dict(self.__materialize_class(
+                    self.__class_name(cls))))
+            self.__load_classes()
+            self.__class_index()
+            for key in list(FileStorage.__raw):
+                self.__materialize(key)
+        if self.rwlock is not None:
+            return (dict(FileStorage.__objects))
         return (FileStorage.__objects)
 
+    def get(self, cls, id):
+        """Returns the instance of cls with the given id, or None."""
+        name = self.__class_name(cls)
+        key = f"{name}.{id}"
+        obj = FileStorage.__objects.get(key)
+        if obj is not None:
+            return (obj)
+        with self.__mutex():
+            self.__load_classes((name,))
+            self.__class_index()
+            obj = FileStorage.__objects.get(key)
+            if obj is None and key in FileStorage.__raw:
+                obj = self.__materialize(key)
+        return (obj)
+
+    def count(self, cls=None):
+        """Returns the number of stored instances, optionally of cls only."""
+        with self.__mutex():
+            if cls is None:
+                self.__load_classes()
+                self.__class_index()
+                return (len(FileStorage.__objects) + len(FileStorage.__raw))
+            name = self.__class_name(cls)
+            self.__load_classes((name,))
+            return (len(self.__class_index().get(name, {})))
+
     def new(self, obj):
         """Sets in __objects the obj with key <obj class name>.id."""
         key = f"{obj.__class__.__name__}.{obj.id}"
+        if key in FileStorage.__raw:
+            self.__materialize(key)
+        self.__remember(key)
+        dirty = FileStorage.__dirty
+        if key not in FileStorage.__objects and key not in dirty:
+            dirty[key] = "created"
+        elif dirty.get(key) != "created":
+            dirty[key] = "modified"
         FileStorage.__objects[key] = obj
+        by_class = FileStorage.__by_class
+        by_class.setdefault(obj.__class__.__name__, {})[key] = obj
+        for index in FileStorage.__attr_indexes.get(
+                obj.__class__.__name__, {}).values():
+            index.add(key, obj)
+        table = FileStorage.__columns.get(obj.__class__.__name__)
+        if table is not None:
+            table.add(key, obj)
+        grid = FileStorage.__spatial.get(obj.__class__.__name__)
+        if grid is not None:
+            grid.add(key, obj)
+        text = FileStorage.__text.get(obj.__class__.__name__)
+        if text is not None:
+            text.add(key, obj)
+            FileStorage.__text_changed.add(obj.__class__.__name__)
+
+    def touch(self, obj, name=None):
+        """Flags a stored obj as modified. Called before every attribute
+        assignment on a BaseModel, with the attribute name."""
+        obj_id = getattr(obj, "id", None)
+        if obj_id is None:
+            return
+        key = f"{obj.__class__.__name__}.{obj_id}"
+        if FileStorage.__objects.get(key) is not obj:
+            return
+        self.__remember(key)
+        if key not in FileStorage.__dirty:
+            FileStorage.__dirty[key] = "modified"
+        indexes = FileStorage.__attr_indexes.get(obj.__class__.__name__)
+        if indexes and (name is None or name in indexes):
+            FileStorage.__stale.setdefault(
+                obj.__class__.__name__, set()).add(key)
+        table = FileStorage.__columns.get(obj.__class__.__name__)
+        if table is not None and (name is None or table.has(name)):
+            FileStorage.__column_stale.setdefault(
+                obj.__class__.__name__, set()).add(key)
+        grid = FileStorage.__spatial.get(obj.__class__.__name__)
+        if grid is not None and \
+                name in (None, grid.lat_attr, grid.lon_attr):
+            FileStorage.__spatial_stale.setdefault(
+                obj.__class__.__name__, set()).add(key)
+        text = FileStorage.__text.get(obj.__class__.__name__)
+        if text is not None and (name is None or name in text.attrs):
+            FileStorage.__text_stale.setdefault(
+                obj.__class__.__name__, set()).add(key)
+
+    def delete(self, obj=None):
+        """Removes obj from __objects if it is stored."""
+        if obj is None:
+            return
+        key = f"{obj.__class__.__name__}.{obj.id}"
+        if key not in FileStorage.__objects:
+            return
+        self.__remember(key)
+        del FileStorage.__objects[key]
+        FileStorage.__by_class.get(obj.__class__.__name__, {}).pop(key, None)
+        for index in FileStorage.__attr_indexes.get(
+                obj.__class__.__name__, {}).values():
+            index.remove(key)
+        table = FileStorage.__columns.get(obj.__class__.__name__)
+        if table is not None:
+            table.remove(key)
+        grid = FileStorage.__spatial.get(obj.__class__.__name__)
+        if grid is not None:
+            grid.remove(key)
+        text = FileStorage.__text.get(obj.__class__.__name__)
+        if text is not None:
+            text.remove(key)
+            FileStorage.__text_changed.add(obj.__class__.__name__)
+        if FileStorage.__dirty.get(key) == "created":
+            del FileStorage.__dirty[key]
+        else:
+            FileStorage.__dirty[key] = "destroyed"
+
+    def find(self, cls, **filters):
+        """Returns a dictionary of the instances of cls whose attributes
+        equal every given filter, using attribute indexes when available."""
+        name = self.__class_name(cls)
+        bucket = self.__materialize_class(name)
+        indexes = self.__indexes_for(name)
+        keys = None
+        for attr, value in filters.items():
+            if attr in indexes and not isinstance(indexes[attr], ListIndex):
+                found = indexes[attr].lookup(value)
+                if keys is None or len(found) < len(keys):
+                    keys = found
+        result = {}
+        for key in bucket if keys is None else keys:
+            obj = bucket.get(key)
+            if obj is not None and all(getattr(obj, attr, None) == value
+                                       for attr, value in filters.items()):
+                result[key] = obj
+        return (result)
+
+    def find_range(self, cls, attr, low=None, high=None):
+        """Returns a dictionary of the instances of cls whose numeric attr
+        lies between low and high (inclusive, None meaning unbounded),
+        ordered by attr."""
+        name = self.__class_name(cls)
+        bucket = self.__materialize_class(name)
+        index = self.__indexes_for(name).get(attr)
+        if isinstance(index, SortedIndex):
+            return ({key: bucket[key] for key in index.range(low, high)})
+        index = SortedIndex(attr)
+        for key, obj in bucket.items():
+            index.add(key, obj)
+        return ({key: bucket[key] for key in index.range(low, high)})
+
+    def related(self, cls, attr, value):
+        """Returns a dictionary of the instances of cls whose attr equals
+        value, or holds it when attr has a ListIndex, such as the cities of
+        a state: related(City, "state_id", state.id)."""
+        name = self.__class_name(cls)
+        bucket = self.__materialize_class(name)
+        index = self.__indexes_for(name, (attr,)).get(attr)
+        if index is None:
+            return (self.find(name, **{attr: value}))
+        return ({key: bucket[key] for key in index.lookup(value)})
+
+    def aggregate(self, cls, attr, op="mean", by=None, **ranges):
+        """Returns the `op` (count, sum, mean, min or max) of the numeric
+        values of attr over the instances of cls, or a {value: result}
+        dictionary per value of the attribute `by`. Keyword arguments
+        restrict it to instances whose numeric attribute lies within the
+        (low, high) pair given for it, None meaning unbounded."""
+        table = self.__columns_for(self.__class_name(cls), (attr, *ranges),
+                                   () if by is None else (by,))
+        return (table.aggregate(attr, op, by, **ranges))
+
+    def select(self, cls, **ranges):
+        """Returns a dictionary of the instances of cls whose numeric
+        attributes lie within the (low, high) pairs given for them,
+        inclusive, None meaning unbounded."""
+        name = self.__class_name(cls)
+        table = self.__columns_for(name, ranges)
+        bucket = self.__class_index().get(name, {})
+        return ({key: bucket[key] for key in table.select(**ranges)})
+
+    def near(self, cls, lat, lon, k=1):
+        """Returns a dictionary of the k instances of cls nearest to the
+        point (lat, lon), nearest first."""
+        name = self.__class_name(cls)
+        keys = self.__spatial_for(name).nearest(lat, lon, k)
+        bucket = self.__class_index().get(name, {})
+        return ({key: bucket[key] for key in keys})
+
+    def within(self, cls, south, west, north, east):
+        """Returns a dictionary of the instances of cls located in the
+        bounding box, bounds included. A box with west > east crosses the
+        antimeridian."""
+        name = self.__class_name(cls)
+        keys = self.__spatial_for(name).within(south, west, north, east)
+        bucket = self.__class_index().get(name, {})
+        return ({key: bucket[key] for key in keys})
+
+    def search(self, cls, text, limit=10):
+        """Returns a dictionary of the `limit` instances of cls whose text
+        attributes best match the words of text, best first."""
+        name = self.__class_name(cls)
+        hits = self.__text_for(name).search(text, limit)
+        bucket = self.__class_index().get(name, {})
+        result = {}
+        for key, _ in hits:
+            obj = bucket[key]
+            result[key] = self.__materialize(key) if obj is None else obj
+        return (result)
+
+    def index_sizes(self):
+        """Returns the approximate memory in bytes of every built attribute
+        index, keyed by <class name>.<attribute>."""
+        return ({f"{name}.{attr}": index.nbytes()
+                 for name, indexes in FileStorage.__attr_indexes.items()
+                 for attr, index in indexes.items()})
+
+    def dirty_count(self):
+        """Returns the number of keys changed since the last flush."""
+        return (len(FileStorage.__dirty))
 
     def save(self):
-        """Serializes __objects to the JSON file `__file_path`."""
-        with open(FileStorage.__file_path, 'w') as file:
-            json.dump(FileStorage.__objects, file,
-                      default=lambda o: o.to_dict())
+        """Serializes __objects to the JSON file `__file_path`, unless a
+        transaction is open. In write-behind mode the dirty records are
+        handed to the background writer instead."""
+        if self.in_transaction():
+            return
+        if not self.write_behind:
+            self.flush()
+            return
+        self.__raise_error()
+        with self.__exclusive():
+            batch = self.__collect()
+        if batch is not None:
+            self.__enqueue(batch)
+
+    def in_transaction(self):
+        """Returns True between begin() and commit()/rollback(), in the
+        thread that called begin() when thread-safe."""
+        if self.rwlock is not None and \
+                self.__owner != threading.get_ident():
+            return (False)
+        return (FileStorage.__undo is not None)
+
+    def begin(self):
+        """Opens a transaction: saves are deferred until commit()."""
+        if self.in_transaction():
+            return
+        if self.rwlock is not None:
+            held = ExitStack()
+            held.enter_context(self.rwlock.writing())
+            self.__held = held
+            self.__owner = threading.get_ident()
+        FileStorage.__undo = {}
+        FileStorage.__dirty_before = FileStorage.__dirty.copy()
+
+    def commit(self):
+        """Closes the transaction and flushes its changes in one write."""
+        with self.__exclusive():
+            self.__end_transaction()
+        self.save()
+
+    def rollback(self):
+        """Closes the transaction and restores __objects and the stored
+        instances to their state at begin()."""
+        undo = FileStorage.__undo
+        if undo is None:
+            return
+        objects = FileStorage.__objects
+        for key, saved in undo.items():
+            self.__preserve(key)
+            if saved is None:
+                objects.pop(key, None)
+                continue
+            obj, state = saved
+            set_state(obj, state)
+            objects[key] = obj
+        FileStorage.__indexed_for = None
+        FileStorage.__dirty = FileStorage.__dirty_before
+        self.__end_transaction()
 
-    def reload(self):
-        """Deserializes the JSON file to __objects."""
+    def __end_transaction(self):
+        """Drops the transaction state and, when thread-safe, releases the
+        exclusive hold begin() took on `rwlock`."""
+        FileStorage.__undo = None
+        FileStorage.__dirty_before = None
+        held = self.__held
+        self.__held = None
+        self.__owner = None
+        if held is not None:
+            held.close()
+
+    @contextmanager
+    def batch(self):
+        """Runs the with-block as one transaction: commits once on exit, or
+        rolls back if it raises. Nested batches join the outer one."""
+        if self.in_transaction():
+            yield self
+            return
+        self.begin()
         try:
-            with open(FileStorage.__file_path) as file:
-                FileStorage.__objects = json.load(file)
-        except Exception:
+            yield self
+        except BaseException:
+            self.rollback()
+            raise
+        self.commit()
+
+    transaction = batch
+
+    def flush(self):
+        """Persists the dirty records: appends them to the log in WAL mode,
+        otherwise rewrites `file_path` re-encoding only the dirty objects.
+        Does nothing inside a transaction, which rollback() could not undo
+        on disk."""
+        if self.in_transaction():
+            return
+        self.sync()
+        if self.rwlock is None or self.shard_dir is not None or \
+                self.shared:
+            with self.__exclusive(), self.__lock, self.__writing():
+                self.__drain()
+                self.__flush()
+            return
+        with self.rwlock.writing():
+            batch = self.__collect()
+            if batch is not None:
+                self.__batches.append(batch)
+        with self.__lock:
+            self.__drain()
+
+    def refresh(self):
+        """Merges the records other processes saved since this one last
+        read or wrote the files, in shared mode; keys changed here since
+        the last flush keep their local state. Does nothing otherwise, or
+        inside a transaction."""
+        lock = self.__file_lock
+        if lock is None or self.in_transaction() or \
+                lock.generation() == self.__generation:
+            return
+        self.sync()
+        with self.__exclusive(), self.__lock, lock.shared():
+            self.__drain()
+            self.__catch_up()
+
+    def sync(self):
+        """Waits until every saved change is durable on disk, re-raising
+        any error the background writer hit."""
+        if self.__thread is not None:
+            with self.__cond:
+                self.__syncing += 1
+                self.__cond.notify_all()
+                while self.__pending is not None or self.__busy:
+                    self.__cond.wait()
+                self.__syncing -= 1
+            self.__raise_error()
+        self.__writer.wait()
+
+    def snapshot(self):
+        """Returns a StorageView of every record stored now, which later
+        changes do not affect. Close it, or use it in a with-block, once
+        done."""
+        self.__load_classes()
+        self.__class_index()
+        view = StorageView(FileStorage.__objects, FileStorage.__raw,
+                           FileStorage.__version)
+        FileStorage.__views.add(view)
+        return (view)
+
+    def export(self, path):
+        """Writes every stored record, grouped by class, to an indexed
+        snapshot at path for read-only SnapshotStorage readers. The records
+        are those stored when export() was called, even if they change
+        while it runs."""
+        from models.engine.snapshot_storage import SnapshotStorage
+        with self.snapshot() as view:
+            keys = sorted(view, key=lambda key: key.partition(".")[0])
+            data = SnapshotStorage.dump((key, view[key]) for key in keys)
+        with self.__lock:
+            self.__writer.write(path, data)
+            self.__writer.wait()
+
+    def compact(self):
+        """Folds the WAL into a fresh snapshot and truncates the log. Does
+        nothing inside a transaction, as flush()."""
+        if self.in_transaction():
+            return
+        self.sync()
+        with self.__exclusive(), self.__lock, self.__writing():
+            self.__drain()
+            with self.__keeping_dirty():
+                if self.shard_dir is not None:
+                    self.__flush_shards(everything=True)
+                    return
+                self.__load_classes()
+                self.__encode_dirty()
+                self.__write_snapshot()
+
+    def __flush(self):
+        """Writes the dirty records; the caller holds __lock."""
+        with self.__keeping_dirty():
+            if self.shard_dir is not None:
+                self.__flush_shards()
+                return
+            self.__load_classes()
+            changes = self.__encode_dirty()
+            if changes is None or not self.wal:
+                if changes is None or changes:
+                    self.__write_snapshot()
+                return
+            if changes:
+                self.__append_log(changes)
+
+    @contextmanager
+    def __keeping_dirty(self):
+        """Flags the keys a flush took off __dirty as dirty again if it
+        fails, so that the next flush writes them."""
+        dirty = FileStorage.__dirty
+        try:
+            yield
+        except BaseException:
+            if dirty is not FileStorage.__dirty:
+                dirty.update(FileStorage.__dirty)
+                FileStorage.__dirty = dirty
+            raise
+
+    def __drain(self):
+        """Writes the batches a thread-safe flush() collected as one; the
+        caller holds __lock. A batch that fails to write is kept, and
+        merged with the next ones on the next drain."""
+        if not self.__batches:
+            return
+        batch = self.__batches.popleft()
+        while self.__batches:
+            batch = self.__merge_batches(batch, self.__batches.popleft())
+        try:
+            self.__write_batch(*batch)
+        except BaseException:
+            self.__batches.appendleft(batch)
+            raise
+
+    @staticmethod
+    def __merge_batches(older, newer):
+        """Returns the (fill, changes, rewrite) batch writing both collected
+        batches, the records of `newer` winning. Updates `older`, which
+        nobody else holds, in place. A fill read from the files does not
+        replace one collected from storage, which the files lack."""
+        fill, changes, rewrite = older
+        changes.update(newer[1])
+        if newer[0] is not None and (fill is None or
+                                     not callable(newer[0])):
+            fill = newer[0]
+        return ([fill, changes, rewrite or newer[2]])
+
+    def __append_log(self, changes):
+        """Appends the (key, encoded bytes or None) changes to the WAL,
+        compacting it once it holds `compact_every` records."""
+        with open(self.log_path, 'ab') as log:
+            log.write(b"".join(self.serializer.log_entry(key, data)
+                               for key, data in changes))
+            if self.fsync:
+                log.flush()
+                os.fsync(log.fileno())
+        self.__log_records += len(changes)
+        if self.__log_records < self.compact_every:
+            return
+        if FileStorage.__complete_for is FileStorage.__objects:
+            self.__write_encoded()
+        else:
+            self.__write_snapshot()
+
+    def reload(self, *, progress=None, classes=None):
+        """Deserializes the JSON file to __objects, then replays the WAL.
+
+        Files larger than `stream_threshold` bytes are parsed one record at
+        a time, so peak memory stays close to the loaded records; smaller
+        ones are decoded in one go, which is faster. Records are only
+        decoded here; they are turned into instances on first access, or
+        right away, while the file is read, when the storage is not lazy.
+
+        progress, when given, is called as progress(bytes read, total size,
+        records read) every few thousand records and once at the end.
+
+        classes, a list of classes or class names, restricts the load to
+        the records of those classes; a sharded storage only reads their
+        shards and a binary snapshot skips the other records undecoded.
+        """
+        self.sync()
+        with self.__exclusive(), self.__lock, self.__reading():
+            self.__drain()
+            changes = self.__read_log() if self.wal else {}
+            deferred = {}
+            if classes is not None:
+                classes = {self.__class_name(cls) for cls in classes}
+                for key in [key for key in changes
+                            if key.partition(".")[0] not in classes]:
+                    deferred[key] = changes.pop(key)
+            objects = {}
+            raw = {}
+            self.__read_files(self.__snapshot_paths(classes), changes,
+                              objects, raw, progress, classes)
+            for key, record in changes.items():
+                if key not in objects and key not in raw:
+                    self.__load(key, record, objects, raw)
+            FileStorage.__objects = objects
+            FileStorage.__raw = raw
+            FileStorage.__raw_for = objects
+            FileStorage.__dirty = {}
+            FileStorage.__encoded = {}
+            FileStorage.__encoded_for = objects
+            FileStorage.__encoded_with = self.serializer.name
+            FileStorage.__complete_for = None
+            FileStorage.__indexed_for = None
+            self.__end_transaction()
+            FileStorage.__loaded = classes
+            FileStorage.__deferred = deferred
+
+    def __snapshot_paths(self, classes=None):
+        """Returns the paths of the snapshot files: `file_path`, or the
+        shard files of every class, or of `classes`, in `shard_dir`."""
+        if self.shard_dir is None:
+            return ([self.file_path])
+        try:
+            names = sorted(os.listdir(self.shard_dir))
+        except FileNotFoundError:
+            return ([])
+        paths = []
+        for name in names:
+            shard = name[:-len(self.__extension)]
+            cls = shard.partition(".")[0]
+            if name.endswith(self.__extension) and \
+                    cls in FileStorage.class_dict and \
+                    (classes is None or cls in classes):
+                paths.append(os.path.join(self.shard_dir, name))
+        return (paths)
+
+    def __read_files(self, paths, changes, objects, raw, progress=None,
+                     classes=None):
+        """Loads the records of the snapshot files at paths, or only those
+        of the class names in classes, into objects and raw, with the
+        records of `changes` taking precedence. A file that cannot be read
+        adds no record at all."""
+        total = 0
+        for path in paths:
+            try:
+                total += os.path.getsize(path)
+            except OSError:
+                pass
+        done = 0
+        count = 0
+        for path in paths:
+            keys = []
+            try:
+                with open(path, 'rb') as file:
+                    size = os.fstat(file.fileno()).st_size
+                    if size > self.stream_threshold:
+                        items = self.serializer.iter_load(file,
+                                                          classes=classes)
+                    else:
+                        items = self.serializer.load(file.read(),
+                                                     classes).items()
+                    for key, record in items:
+                        self.__load(key, changes.get(key, record), objects,
+                                    raw)
+                        keys.append(key)
+                        count += 1
+                        if progress is not None and not count % 4096:
+                            progress(done + file.tell(), total, count)
+                done += size
+            except Exception:
+                for key in keys:
+                    objects.pop(key, None)
+                    raw.pop(key, None)
+                count -= len(keys)
+        if progress is not None:
+            progress(total, total, count)
+
+    def __load_classes(self, names=None):
+        """Loads the classes in names, or every class, that reload() left
+        out. A single snapshot file is read once for all of them. Records
+        already in storage are kept."""
+        loaded = FileStorage.__loaded
+        if loaded is None or names is not None and loaded.issuperset(names):
+            return
+        if names is None or self.shard_dir is None:
+            names = FileStorage.class_dict
+        names = {name for name in names if name not in loaded}
+        index = self.__class_index()
+        objects = FileStorage.__objects
+        raw = FileStorage.__raw
+        deferred = FileStorage.__deferred
+        changes = {key: deferred.pop(key) for key in list(deferred)
+                   if key.partition(".")[0] in names}
+        new_objects = {}
+        new_raw = {}
+        self.__read_files(self.__snapshot_paths(names), changes, new_objects,
+                          new_raw, classes=names)
+        for key, record in changes.items():
+            if key not in new_objects and key not in new_raw:
+                self.__load(key, record, new_objects, new_raw)
+        for records, target in ((new_objects, objects), (new_raw, raw)):
+            for key, obj in records.items():
+                if key in objects or key in raw:
+                    continue
+                target[key] = obj
+                index.setdefault(key.partition(".")[0], {})[key] = \
+                    obj if target is objects else None
+        for name in names:
+            self.__forget_class(name)
+        loaded = loaded | names
+        FileStorage.__loaded = \
+            None if loaded.issuperset(FileStorage.class_dict) else loaded
+        FileStorage.__complete_for = None
+
+    @staticmethod
+    def __forget_class(name):
+        """Drops the indexes, columns and shard map built for class `name`,
+        which are built again on next use."""
+        FileStorage.__attr_indexes.pop(name, None)
+        FileStorage.__columns.pop(name, None)
+        FileStorage.__spatial.pop(name, None)
+        FileStorage.__text.pop(name, None)
+        FileStorage.__shards.pop(name, None)
+
+    @contextmanager
+    def __reading(self):
+        """Holds the file lock in shared mode while the files are read, and
+        records the generation and the state of the files read."""
+        if self.__file_lock is None:
+            yield
+            return
+        with self.__file_lock.shared():
+            self.__generation = self.__file_lock.generation()
+            yield
+            self.__stats = self.__file_stats()
+
+    @contextmanager
+    def __writing(self):
+        """Holds the file lock exclusively while the files are written,
+        merging first what other processes wrote, and advancing the
+        generation afterwards if a file changed."""
+        if self.__file_lock is None:
+            yield
+            return
+        with self.__file_lock.exclusive():
+            with self.__exclusive():
+                self.__catch_up()
+            try:
+                yield
+            finally:
+                self.__writer.wait()
+                stats = self.__file_stats()
+                if self.wal:
+                    self.__log_offset = stats.get(self.log_path, (0, 0))[1]
+                if stats != self.__stats:
+                    self.__stats = stats
+                    self.__generation = self.__file_lock.advance()
+
+    def __lock_methods(self):
+        """Replaces the public methods of this instance holding no lock
+        with versions holding `rwlock`, so unlocked storages pay nothing."""
+        for names, hold in ((self.__shared_methods, self.rwlock.reading),
+                            (self.__query_methods, self.__querying),
+                            (self.__exclusive_methods, self.rwlock.writing)):
+            for name in names:
+                setattr(self, name, self.__locked(getattr(self, name), hold))
+
+    @staticmethod
+    def __locked(method, hold):
+        """Returns method wrapped to run inside the context hold()."""
+        @wraps(method)
+        def locked(*args, **kwargs):
+            with hold():
+                return (method(*args, **kwargs))
+        return (locked)
+
+    @contextmanager
+    def __querying(self):
+        """Holds `rwlock` in shared mode and its mutex, since queries
+        update the indexes they use."""
+        with self.rwlock.reading(), self.rwlock.mutex:
+            yield
+
+    def __exclusive(self):
+        """Returns a context holding `rwlock` exclusively, if any."""
+        if self.rwlock is None:
+            return (nullcontext())
+        return (self.rwlock.writing())
+
+    def __mutex(self):
+        """Returns a context holding the mutex of `rwlock`, if any."""
+        if self.rwlock is None:
+            return (nullcontext())
+        return (self.rwlock.mutex)
+
+    def __catch_up(self):
+        """Merges the records written by other processes since the
+        generation this one last read or wrote. The caller holds the file
+        lock."""
+        generation = self.__file_lock.generation()
+        if generation == self.__generation:
+            return
+        if self.shard_dir is None:
+            self.__load_classes()
+        stats = self.__file_stats()
+        log = stats.get(self.log_path)
+        before = self.__stats.get(self.log_path)
+        if self.wal and log is not None and before is not None and \
+                log[0] == before[0] and log[1] >= self.__log_offset and \
+                stats.get(self.file_path) == \
+                self.__stats.get(self.file_path):
+            changes = self.__read_log(self.__log_offset)
+        else:
+            changes = self.__read_changed(stats)
+        self.__merge(changes)
+        self.__stats = stats
+        self.__generation = generation
+
+    def __file_stats(self):
+        """Returns the (inode, size, mtime) of the snapshot files of the
+        loaded classes, and of the WAL, by path."""
+        paths = self.__snapshot_paths(FileStorage.__loaded)
+        if self.wal:
+            paths.append(self.log_path)
+        stats = {}
+        for path in paths:
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            stats[path] = (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+        return (stats)
+
+    def __read_changed(self, stats):
+        """Returns the {key: record or None} records of the snapshot files
+        whose state differs from the one last seen, with None for the keys
+        in storage they no longer hold, updated by the whole WAL."""
+        changes = {}
+        for path in set(stats) | set(self.__stats):
+            if path == self.log_path or \
+                    stats.get(path) == self.__stats.get(path):
+                continue
+            try:
+                with open(path, 'rb') as file:
+                    records = self.serializer.load(file.read(),
+                                                   FileStorage.__loaded)
+            except FileNotFoundError:
+                records = {}
+            except Exception:
+                continue
+            changes.update(records)
+            for key in self.__keys_in(path):
+                if key not in records:
+                    changes[key] = None
+        if self.wal:
+            changes.update(self.__read_log())
+        return (changes)
+
+    def __keys_in(self, path):
+        """Returns the keys in storage whose record belongs in the snapshot
+        file at path."""
+        index = self.__class_index()
+        if self.shard_dir is None:
+            return ([key for bucket in index.values() for key in bucket])
+        shard = os.path.basename(path)[:-len(self.__extension)]
+        return ([key for key in index.get(shard.partition(".")[0], {})
+                 if self.__shard_of(key) == shard])
+
+    def __merge(self, changes):
+        """Applies the {key: record or None if deleted} changes read from
+        the files to storage, keeping instances in place. Keys changed
+        here since the last flush are skipped: their state wins."""
+        objects = FileStorage.__objects
+        raw = FileStorage.__raw
+        encoded = FileStorage.__encoded
+        dirty = FileStorage.__dirty
+        index = self.__class_index()
+        names = set()
+        for key, record in changes.items():
+            if key in dirty:
+                continue
+            if record is not None and (type(record) is not dict or
+                                       record.get("__class__") not in
+                                       FileStorage.class_dict):
+                continue
+            name = key.partition(".")[0]
+            obj = objects.get(key)
+            self.__preserve(key)
+            if record is None:
+                if obj is None and key not in raw:
+                    continue
+                objects.pop(key, None)
+                raw.pop(key, None)
+                encoded.pop(key, None)
+                index.get(name, {}).pop(key, None)
+            elif obj is not None:
+                if obj.to_dict() == record:
+                    continue
+                set_state(obj, get_state(self.__instantiate(record)))
+                encoded[key] = self.serializer.encode(record)
+            else:
+                if raw.get(key) == record:
+                    continue
+                raw.pop(key, None)
+                self.__load(key, record, objects, raw)
+                index.setdefault(name, {})[key] = objects.get(key)
+                encoded[key] = self.serializer.encode(record)
+            names.add(name)
+        for name in names:
+            self.__forget_class(name)
+
+    def __load(self, key, record, objects, raw):
+        """Adds a record read by reload() to raw, or to objects as an
+        instance when the storage is not lazy. Deleted (None) and invalid
+        records are skipped."""
+        if type(record) is not dict or \
+                record.get("__class__") not in FileStorage.class_dict:
+            return
+        if self.lazy:
+            raw[key] = record
+        else:
+            objects[key] = self.__instantiate(record)
+
+    def __class_index(self):
+        """Returns the class name -> {key: obj} index, rebuilding it when
+        __objects was replaced or changed without going through storage."""
+        objects = FileStorage.__objects
+        if FileStorage.__raw_for is not objects:
+            FileStorage.__raw = {}
+            FileStorage.__raw_for = objects
+        index = FileStorage.__by_class
+        if FileStorage.__indexed_for is not objects or \
+                sum(map(len, index.values())) != \
+                len(objects) + len(FileStorage.__raw):
+            index = {}
+            for key in FileStorage.__raw:
+                index.setdefault(key.partition(".")[0], {})[key] = None
+            for key, obj in objects.items():
+                index.setdefault(key.partition(".")[0], {})[key] = obj
+            FileStorage.__by_class = index
+            FileStorage.__indexed_for = objects
+            FileStorage.__attr_indexes = {}
+            FileStorage.__stale = {}
+            FileStorage.__columns = {}
+            FileStorage.__column_stale = {}
+            FileStorage.__spatial = {}
+            FileStorage.__spatial_stale = {}
+            FileStorage.__text = {}
+            FileStorage.__text_stale = {}
+        return (index)
+
+    def __materialize(self, key):
+        """Turns the raw record of key into a stored instance."""
+        obj = self.__instantiate(FileStorage.__raw.pop(key))
+        FileStorage.__objects[key] = obj
+        bucket = FileStorage.__by_class.get(key.partition(".")[0], {})
+        if key in bucket:
+            bucket[key] = obj
+        return (obj)
+
+    def __materialize_class(self, name):
+        """Returns the {key: obj} bucket of class `name` with every raw
+        record in it turned into an instance."""
+        self.__load_classes((name,))
+        bucket = self.__class_index().get(name, {})
+        if FileStorage.__raw:
+            for key in [key for key, obj in bucket.items() if obj is None]:
+                self.__materialize(key)
+        return (bucket)
+
+    def __indexes_for(self, name, attrs=None):
+        """Returns the attribute -> index mapping of class `name`, applying
+        pending updates and building the indexes of attrs (by default every
+        attribute of index_dict) on first use."""
+        bucket = self.__class_index().get(name, {})
+        indexes = FileStorage.__attr_indexes.setdefault(name, {})
+        for key in FileStorage.__stale.pop(name, ()):
+            obj = bucket.get(key)
+            for index in indexes.values():
+                if obj is None:
+                    index.remove(key)
+                else:
+                    index.add(key, obj)
+        declared = FileStorage.index_dict.get(name, {})
+        for attr in declared if attrs is None else attrs:
+            if attr in declared and attr not in indexes:
+                index = indexes[attr] = declared[attr](attr)
+                for key, obj in bucket.items():
+                    index.add(key, obj)
+        return (indexes)
+
+    def __columns_for(self, name, numbers, groups=()):
+        """Returns the column table of class `name` with the numeric
+        columns `numbers` and grouping columns `groups`, building it on
+        first use and applying pending updates."""
+        bucket = self.__materialize_class(name)
+        table = FileStorage.__columns.get(name)
+        if table is None:
+            table = ColumnTable()
+            for key, obj in bucket.items():
+                table.add(key, obj)
+            FileStorage.__columns[name] = table
+            FileStorage.__column_stale.pop(name, None)
+        for key in FileStorage.__column_stale.pop(name, ()):
+            obj = bucket.get(key)
+            if obj is None:
+                table.remove(key)
+            else:
+                table.add(key, obj)
+        table.add_columns(bucket, numbers, groups)
+        return (table)
+
+    def __spatial_for(self, name):
+        """Returns the GridIndex of class `name`, building it on first use
+        and applying pending updates."""
+        if name not in FileStorage.spatial_dict:
+            raise ValueError(f"{name} has no location index")
+        bucket = self.__materialize_class(name)
+        grid = FileStorage.__spatial.get(name)
+        if grid is None:
+            grid = GridIndex(*FileStorage.spatial_dict[name])
+            for key, obj in bucket.items():
+                grid.add(key, obj)
+            FileStorage.__spatial[name] = grid
+            FileStorage.__spatial_stale.pop(name, None)
+        for key in FileStorage.__spatial_stale.pop(name, ()):
+            obj = bucket.get(key)
+            if obj is None:
+                grid.remove(key)
+            else:
+                grid.add(key, obj)
+        return (grid)
+
+    def __text_for(self, name):
+        """Returns the TextIndex of class `name`, read from its cache file
+        or built on first use, and applies pending updates. Only the
+        records found by a search need to be instances."""
+        if name not in FileStorage.text_dict:
+            raise ValueError(f"{name} has no text index")
+        self.__load_classes((name,))
+        bucket = self.__class_index().get(name, {})
+        text = FileStorage.__text.get(name)
+        if text is None:
+            text = self.__read_text_index(name)
+            built = text is None
+            if built:
+                bucket = self.__materialize_class(name)
+                text = TextIndex(FileStorage.text_dict[name])
+                for key, obj in bucket.items():
+                    text.add(key, obj)
+            FileStorage.__text[name] = text
+            FileStorage.__text_stale.pop(name, None)
+            if built:
+                self.__write_text_index(name)
+            if FileStorage.__text_writer is None:
+                atexit.register(FileStorage.__write_text_caches)
+            FileStorage.__text_writer = self
+        for key in FileStorage.__text_stale.pop(name, ()):
+            obj = bucket.get(key)
+            if obj is None:
+                text.remove(key)
+            else:
+                text.add(key, obj)
+            FileStorage.__text_changed.add(name)
+        return (text)
+
+    def __text_path(self, name):
+        """Returns the path of the text index cache of class `name`."""
+        if self.shard_dir is None:
+            return (f"{self.file_path}.{name}.idx")
+        return (os.path.join(self.shard_dir, f"{name}.idx"))
+
+    def __fingerprint(self, name):
+        """Returns the [path, inode, size, mtime] of every file holding
+        records of class `name`, once pending writes are on disk."""
+        self.sync()
+        paths = self.__snapshot_paths((name,))
+        if self.wal:
+            paths.append(self.log_path)
+        fingerprint = []
+        for path in paths:
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            fingerprint.append([path, stat.st_ino, stat.st_size,
+                                stat.st_mtime_ns])
+        return (fingerprint)
+
+    def __has_dirty(self, name):
+        """Returns True when records of class `name` changed since the
+        last flush."""
+        prefix = f"{name}."
+        return (any(key.startswith(prefix) for key in FileStorage.__dirty))
+
+    def __read_text_index(self, name):
+        """Returns the cached TextIndex of class `name`, or None when the
+        cache is missing, unreadable, or older than the stored records."""
+        if self.__has_dirty(name):
+            return (None)
+        try:
+            with open(self.__text_path(name), 'rb') as file:
+                fingerprint, text = TextIndex.load(file.read())
+        except (OSError, ValueError):
+            return (None)
+        if text.attrs != FileStorage.text_dict[name] or \
+                fingerprint != self.__fingerprint(name):
+            return (None)
+        return (text)
+
+    def __write_text_index(self, name):
+        """Caches the TextIndex of class `name`, unless it holds unsaved
+        changes or there is no file to match it with. Best effort: the
+        cache is only an optimization."""
+        FileStorage.__text_changed.discard(name)
+        fingerprint = self.__fingerprint(name)
+        if self.__has_dirty(name) or not fingerprint:
+            return
+        data = FileStorage.__text[name].dump(fingerprint)
+        try:
+            AtomicWriter(fsync=False).write(self.__text_path(name), data)
+        except OSError:
             pass
+
+    @staticmethod
+    def __write_text_caches():
+        """Caches the changed text indexes through the storage that last
+        built one. Registered to run at exit, once per process."""
+        FileStorage.__text_writer.__write_text_indexes()
+
+    def __write_text_indexes(self):
+        """Caches every text index changed since it was last cached."""
+        for name in FileStorage.__text_changed | set(FileStorage.__text_stale):
+            if name in FileStorage.__text:
+                self.__text_for(name)
+                self.__write_text_index(name)
+
+    @staticmethod
+    def __class_name(cls):
+        """Returns the name of cls, which is either a class or a name."""
+        return (cls if isinstance(cls, str) else cls.__name__)
+
+    def __remember(self, key):
+        """Saves the current state of `key` the first time it is changed
+        inside a transaction, and for the open snapshot() views."""
+        FileStorage.__version += 1
+        if FileStorage.__views:
+            self.__preserve(key)
+        undo = FileStorage.__undo
+        if undo is None or key in undo:
+            return
+        obj = FileStorage.__objects.get(key)
+        undo[key] = None if obj is None else (obj, get_state(obj))
+
+    @staticmethod
+    def __preserve(key):
+        """Hands the current state of `key`, about to change, to every open
+        snapshot() view."""
+        objects = FileStorage.__objects
+        for view in list(FileStorage.__views):
+            view.preserve(key, objects)
+
+    def __encode_dirty(self):
+        """Re-encodes the dirty objects into the encoded cache and returns
+        the (key, encoded bytes or None if destroyed) changes, or None when
+        __objects was replaced wholesale, or the serializer changed, and
+        everything needs a full rewrite."""
+        objects = FileStorage.__objects
+        encoded = FileStorage.__encoded
+        dirty = FileStorage.__dirty
+        FileStorage.__dirty = {}
+        if FileStorage.__encoded_for is not objects or \
+                FileStorage.__encoded_with != self.serializer.name:
+            encoded.clear()
+            FileStorage.__encoded_for = objects
+            FileStorage.__encoded_with = self.serializer.name
+            return (None)
+        changes = []
+        for key in dirty:
+            obj = objects.get(key)
+            if obj is None:
+                encoded.pop(key, None)
+                changes.append((key, None))
+            else:
+                encoded[key] = self.serializer.encode(obj.to_dict())
+                changes.append((key, encoded[key]))
+        return (changes)
+
+    def __write_snapshot(self):
+        """Writes every stored object to `file_path` from the encoded cache,
+        encoding whatever is missing from it."""
+        self.__class_index()
+        objects = FileStorage.__objects
+        raw = FileStorage.__raw
+        encoded = FileStorage.__encoded
+        if len(encoded) != len(objects) + len(raw):
+            for key in [key for key in encoded
+                        if key not in objects and key not in raw]:
+                del encoded[key]
+            for key, obj in objects.items():
+                if key not in encoded:
+                    encoded[key] = self.serializer.encode(obj.to_dict())
+            for key, record in raw.items():
+                if key not in encoded:
+                    encoded[key] = self.serializer.encode(record)
+        FileStorage.__complete_for = objects
+        self.__write_encoded()
+
+    def __flush_shards(self, everything=False):
+        """Rewrites the shard files holding dirty records, or every shard of
+        the loaded classes when `everything` is set or __objects was
+        replaced wholesale. Shards left empty are removed."""
+        if FileStorage.__loaded is not None:
+            self.__load_classes({key.partition(".")[0]
+                                 for key in FileStorage.__dirty})
+        objects = FileStorage.__objects
+        encoded = FileStorage.__encoded
+        dirty = FileStorage.__dirty
+        FileStorage.__dirty = {}
+        if FileStorage.__encoded_for is not objects or \
+                FileStorage.__encoded_with != self.serializer.name:
+            encoded.clear()
+            FileStorage.__encoded_for = objects
+            FileStorage.__encoded_with = self.serializer.name
+            everything = True
+        index = self.__class_index()
+        raw = FileStorage.__raw
+        if everything:
+            names = set(index)
+        else:
+            names = {key.partition(".")[0] for key in dirty}
+        os.makedirs(self.shard_dir, exist_ok=True)
+        for name in names:
+            shards = self.__class_shards(name)
+            changed = set(shards) if everything else set()
+            for key in dirty:
+                if key.partition(".")[0] != name:
+                    continue
+                encoded.pop(key, None)
+                shard = self.__shard_of(key)
+                changed.add(shard)
+                if key in objects or key in raw:
+                    shards.setdefault(shard, {})[key] = None
+                elif shard in shards:
+                    shards[shard].pop(key, None)
+            for shard in changed:
+                self.__write_shard(shard, shards.get(shard))
+                if not shards.get(shard):
+                    shards.pop(shard, None)
+        if everything:
+            self.__remove_stale_shards()
+
+    def __class_shards(self, name):
+        """Returns the shard name -> {key: None} mapping of class `name`,
+        built from the class index on first use."""
+        index = self.__class_index()
+        if FileStorage.__shards_for is not index:
+            FileStorage.__shards = {}
+            FileStorage.__shards_for = index
+        shards = FileStorage.__shards.get(name)
+        if shards is None:
+            shards = {}
+            for key in index.get(name, {}):
+                shards.setdefault(self.__shard_of(key), {})[key] = None
+            FileStorage.__shards[name] = shards
+        return (shards)
+
+    def __shard_of(self, key):
+        """Returns the name of the shard holding key."""
+        name, _, obj_id = key.partition(".")
+        if self.shard_prefix:
+            return (f"{name}.{obj_id[:self.shard_prefix]}")
+        return (name)
+
+    def __write_shard(self, shard, keys):
+        """Writes the records of keys to the file of shard, encoding those
+        missing from the encoded cache, or removes the file when keys is
+        empty."""
+        path = os.path.join(self.shard_dir, shard + self.__extension)
+        if not keys:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            return
+        objects = FileStorage.__objects
+        raw = FileStorage.__raw
+        encoded = FileStorage.__encoded
+        for key in keys:
+            if key not in encoded:
+                obj = objects.get(key)
+                encoded[key] = self.serializer.encode(
+                    raw[key] if obj is None else obj.to_dict())
+        self.__writer.write(path, self.serializer.dump(
+            (key, encoded[key]) for key in keys))
+
+    def __remove_stale_shards(self):
+        """Removes the shard files of loaded classes that hold no stored
+        record anymore."""
+        loaded = FileStorage.__loaded
+        shards = FileStorage.__shards
+        for path in self.__snapshot_paths(loaded):
+            shard = os.path.basename(path)[:-len(self.__extension)]
+            if shard not in shards.get(shard.partition(".")[0], {}):
+                os.remove(path)
+
+    def __write_encoded(self):
+        """Writes the encoded cache to `file_path` and empties the WAL."""
+        data = self.serializer.dump(FileStorage.__encoded.items())
+        self.__writer.write(self.file_path, data)
+        if self.wal:
+            self.__writer.wait()
+            open(self.log_path, 'wb').close()
+            self.__log_records = 0
+
+    def __collect(self):
+        """Takes the dirty records off the storage for the background
+        writer. Returns (fill, changes, rewrite): the {key: record or None}
+        changes, plus `fill` when the writer's encoded cache is not complete
+        yet, with `rewrite` set when it must be rebuilt from scratch.
+        Returns None when there is nothing to write.
+
+        A rewrite fills the cache with every record in storage. Otherwise
+        the files hold every record but the changes, so `fill` is
+        __read_disk, which the writer calls: the first save after a
+        reload costs the caller no more than the next ones.
+        """
+        objects = FileStorage.__objects
+        rewrite = FileStorage.__encoded_for is not objects or \
+            FileStorage.__encoded_with != self.serializer.name
+        dirty = FileStorage.__dirty
+        if not dirty and not rewrite:
+            return (None)
+        FileStorage.__dirty = {}
+        changes = {}
+        for key in dirty:
+            obj = objects.get(key)
+            changes[key] = None if obj is None else obj.to_dict()
+        fill = None
+        if rewrite:
+            self.__load_classes()
+            self.__class_index()
+            fill = dict(FileStorage.__raw)
+            for key, obj in objects.items():
+                fill[key] = obj.to_dict()
+        elif FileStorage.__complete_for is not objects:
+            fill = self.__read_disk
+        if fill is not None:
+            FileStorage.__encoded_for = objects
+            FileStorage.__encoded_with = self.serializer.name
+            FileStorage.__complete_for = objects
+        return (fill, changes, rewrite)
+
+    def __enqueue(self, batch):
+        """Merges a collected batch, and the last one the background writer
+        failed to write, into the pending one and wakes the writer,
+        starting it on first use."""
+        with self.__cond:
+            if self.__failed is not None:
+                batch = self.__merge_batches(self.__failed, batch)
+                self.__failed = None
+            if self.__pending is None:
+                self.__pending = list(batch)
+                self.__pending_since = time.monotonic()
+            else:
+                self.__pending = self.__merge_batches(self.__pending, batch)
+            if self.__thread is None:
+                self.__thread = threading.Thread(
+                    target=self.__write_behind, daemon=True)
+                self.__thread.start()
+                atexit.register(self.sync)
+            self.__cond.notify_all()
+
+    def __write_behind(self):
+        """Background writer loop: waits for a pending batch, lets more
+        saves coalesce into it for up to `max_staleness` seconds unless
+        sync() is waiting, then writes it."""
+        while True:
+            with self.__cond:
+                while self.__pending is None:
+                    self.__cond.wait()
+                deadline = self.__pending_since + self.max_staleness
+                while not self.__syncing:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self.__cond.wait(remaining)
+                batch = self.__pending
+                self.__pending = None
+                self.__busy = True
+            try:
+                with self.__lock:
+                    self.__write_batch(*batch)
+            except Exception as error:
+                self.__error = error
+                with self.__cond:
+                    if self.__pending is None:
+                        self.__failed = batch
+                    else:
+                        self.__pending = self.__merge_batches(
+                            batch, self.__pending)
+            finally:
+                with self.__cond:
+                    self.__busy = False
+                    self.__cond.notify_all()
+
+    def __write_batch(self, fill, changes, rewrite):
+        """Encodes a collected batch into the encoded cache and persists
+        it, as flush() would. fill is a {key: record} dictionary, or a
+        function returning one."""
+        encoded = FileStorage.__encoded
+        encode = self.serializer.encode
+        if fill is not None:
+            if callable(fill):
+                fill = fill()
+            if rewrite:
+                encoded.clear()
+            for key in [key for key in encoded if key not in fill]:
+                del encoded[key]
+            for key, record in fill.items():
+                if key not in encoded and key not in changes:
+                    encoded[key] = encode(record)
+        entries = []
+        for key, record in changes.items():
+            if record is None:
+                encoded.pop(key, None)
+            else:
+                encoded[key] = encode(record)
+            entries.append((key, encoded.get(key)))
+        if rewrite or (entries and not self.wal):
+            self.__write_encoded()
+        elif entries:
+            self.__append_log(entries)
+
+    def __read_disk(self):
+        """Returns the {key: record} dictionary of the valid records in the
+        files: the snapshot, updated by the WAL. Like reload(), reads no
+        record from a snapshot that cannot be read."""
+        self.__writer.wait()
+        try:
+            with open(self.file_path, 'rb') as file:
+                records = self.serializer.load(file.read())
+        except Exception:
+            records = {}
+        if self.wal:
+            try:
+                with open(self.log_path, 'rb') as log:
+                    records.update(self.serializer.read_log(log.read())[0])
+            except FileNotFoundError:
+                pass
+        return ({key: record for key, record in records.items()
+                 if type(record) is dict and
+                 record.get("__class__") in FileStorage.class_dict})
+
+    def __raise_error(self):
+        """Re-raises the last error of the background writer, once."""
+        error = self.__error
+        if error is not None:
+            self.__error = None
+            raise error
+
+    def __read_log(self, offset=0):
+        """Returns the {key: record or None if deleted} changes of the WAL
+        from byte `offset` on, the last entry of each key winning.
+
+        A torn last line (crash mid-append) is cut off so later appends
+        start on a clean record boundary.
+        """
+        if not offset:
+            self.__log_records = 0
+        self.__log_offset = 0
+        try:
+            log = open(self.log_path, 'r+b')
+        except FileNotFoundError:
+            return ({})
+        with log:
+            log.seek(offset)
+            entries, good_length = self.serializer.read_log(log.read())
+            self.__log_records += len(entries)
+            self.__log_offset = offset + good_length
+            log.truncate(self.__log_offset)
+        return (dict(entries))
+
+    def __instantiate(self, record):
+        """Builds a model instance from its dictionary representation."""
+        return self.__models[record["__class__"]](**record)
@@ -0,0 +1,526 @@
+#!/usr/bin/python3
+"""Secondary indexes on model attributes, maintained by FileStorage."""
+
+from array import array
+from bisect import bisect_left, bisect_right, insort
+import heapq
+import json
+import math
+import re
+import struct
+import sys
+import unicodedata
+
+EARTH_RADIUS_KM = 6371.0088
+
+
+def distance(lat1, lon1, lat2, lon2):
+    """Returns the great-circle distance in km between two points given in
+    degrees."""
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    a = math.sin((phi2 - phi1) / 2) ** 2 + math.cos(phi1) * \
+        math.cos(phi2) * math.sin(math.radians(lon2 - lon1) / 2) ** 2
+    return (2 * EARTH_RADIUS_KM * math.asin(math.sqrt(min(1.0, a))))
+
+
+class HashIndex:
+    """Maps the value of one attribute to the keys of the instances holding
+    it. Answers equality lookups in O(1)."""
+
+    def __init__(self, attr):
+        """Initializes an empty index on attribute `attr`."""
+        self.attr = attr
+        self.__keys = {}
+        self.__values = {}
+
+    def add(self, key, obj):
+        """Indexes obj under key, replacing any previous entry for key.
+        Unhashable values are not indexed."""
+        value = getattr(obj, self.attr, None)
+        if key in self.__values:
+            if self.__values[key] == value:
+                return
+            self.remove(key)
+        try:
+            keys = self.__keys.setdefault(value, {})
+        except TypeError:
+            return
+        keys[key] = None
+        self.__values[key] = value
+
+    def remove(self, key):
+        """Drops key from the index."""
+        if key not in self.__values:
+            return
+        value = self.__values.pop(key)
+        keys = self.__keys[value]
+        del keys[key]
+        if not keys:
+            del self.__keys[value]
+
+    def lookup(self, value):
+        """Returns the keys whose attribute equals value."""
+        try:
+            return (list(self.__keys.get(value, ())))
+        except TypeError:
+            return ([])
+
+    def nbytes(self):
+        """Returns the approximate memory used by the index structures."""
+        return (sys.getsizeof(self.__keys) + sys.getsizeof(self.__values) +
+                sum(map(sys.getsizeof, self.__keys.values())))
+
+
+class ListIndex:
+    """Maps every item of one list attribute, such as Place.amenity_ids, to
+    the keys of the instances whose list holds it. Answers membership
+    lookups in O(1)."""
+
+    def __init__(self, attr):
+        """Initializes an empty index on attribute `attr`."""
+        self.attr = attr
+        self.__keys = {}
+        self.__items = {}
+
+    def add(self, key, obj):
+        """Indexes obj under key, replacing any previous entry for key.
+        Values that are not lists or tuples, and unhashable items, are not
+        indexed."""
+        value = getattr(obj, self.attr, None)
+        items = ()
+        if isinstance(value, (list, tuple)):
+            items = tuple(dict.fromkeys(
+                item for item in value if self.__hashable(item)))
+        if self.__items.get(key) == items:
+            return
+        self.remove(key)
+        if not items:
+            return
+        for item in items:
+            self.__keys.setdefault(item, {})[key] = None
+        self.__items[key] = items
+
+    def remove(self, key):
+        """Drops key from the index."""
+        for item in self.__items.pop(key, ()):
+            keys = self.__keys[item]
+            del keys[key]
+            if not keys:
+                del self.__keys[item]
+
+    def lookup(self, item):
+        """Returns the keys whose list holds item."""
+        if not self.__hashable(item):
+            return ([])
+        return (list(self.__keys.get(item, ())))
+
+    def nbytes(self):
+        """Returns the approximate memory used by the index structures."""
+        return (sys.getsizeof(self.__keys) + sys.getsizeof(self.__items) +
+                sum(map(sys.getsizeof, self.__keys.values())) +
+                sum(map(sys.getsizeof, self.__items.values())))
+
+    @staticmethod
+    def __hashable(item):
+        """Returns True when item can be a dictionary key."""
+        try:
+            hash(item)
+        except TypeError:
+            return (False)
+        return (True)
+
+
+class SortedIndex:
+    """Keeps (value, key) pairs of one numeric attribute in sorted order.
+    Answers equality and range lookups in O(log n + k)."""
+
+    def __init__(self, attr):
+        """Initializes an empty index on attribute `attr`."""
+        self.attr = attr
+        self.__entries = []
+        self.__values = {}
+
+    def add(self, key, obj):
+        """Indexes obj under key, replacing any previous entry for key.
+        Non-numeric values, NaN and infinities are not indexed: NaN would
+        break the sort order."""
+        value = getattr(obj, self.attr, None)
+        if key in self.__values:
+            if self.__values[key] == value:
+                return
+            self.remove(key)
+        if isinstance(value, bool) or not isinstance(value, (int, float)) \
+                or isinstance(value, float) and not math.isfinite(value):
+            return
+        self.__values[key] = value
+        insort(self.__entries, (value, key))
+
+    def remove(self, key):
+        """Drops key from the index."""
+        if key not in self.__values:
+            return
+        entry = (self.__values.pop(key), key)
+        i = bisect_left(self.__entries, entry)
+        assert self.__entries[i] == entry, entry
+        del self.__entries[i]
+
+    def lookup(self, value):
+        """Returns the keys whose attribute equals value."""
+        return (self.range(value, value))
+
+    def range(self, low=None, high=None):
+        """Returns the keys whose attribute lies between low and high
+        (inclusive, None meaning unbounded), in ascending value order."""
+        entries = self.__entries
+        start = 0 if low is None else bisect_left(entries, (low,))
+        end = len(entries) if high is None else \
+            bisect_right(entries, (high, chr(0x10ffff)))
+        return ([key for _, key in entries[start:end]])
+
+    def nbytes(self):
+        """Returns the approximate memory used by the index structures."""
+        return (sys.getsizeof(self.__entries) + sys.getsizeof(self.__values) +
+                sum(map(sys.getsizeof, self.__entries)))
+
+
+class GridIndex:
+    """Buckets the (latitude, longitude) points of instances into a grid of
+    `cell`-degree cells. Answers bounding-box and nearest-neighbour queries
+    by visiting only the cells around the query point."""
+
+    def __init__(self, lat_attr, lon_attr, cell=0.05):
+        """Initializes an empty index on the two attributes."""
+        self.lat_attr = lat_attr
+        self.lon_attr = lon_attr
+        self.cell = cell
+        self.__rows = math.ceil(180 / cell) + 1
+        self.__cols = math.ceil(360 / cell)
+        self.__cells = {}
+        self.__points = {}
+
+    def __len__(self):
+        """Returns the number of indexed points."""
+        return (len(self.__points))
+
+    def add(self, key, obj):
+        """Indexes obj under key, replacing any previous entry for key.
+        Instances without valid coordinates are not indexed."""
+        lat = getattr(obj, self.lat_attr, None)
+        lon = getattr(obj, self.lon_attr, None)
+        point = self.__points.get(key)
+        if point is not None:
+            if point[:2] == (lat, lon):
+                return
+            self.remove(key)
+        if type(lat) not in (int, float) or type(lon) not in (int, float) \
+                or not -90 <= lat <= 90 or not -180 <= lon <= 180:
+            return
+        cell = self.__cell(lat, lon)
+        points = self.__cells.get(cell)
+        if points is None:
+            points = self.__cells[cell] = {}
+        points[key] = (lat, lon)
+        self.__points[key] = (lat, lon, cell)
+
+    def remove(self, key):
+        """Drops key from the index."""
+        point = self.__points.pop(key, None)
+        if point is None:
+            return
+        keys = self.__cells[point[2]]
+        del keys[key]
+        if not keys:
+            del self.__cells[point[2]]
+
+    def within(self, south, west, north, east):
+        """Returns the keys whose point lies in the box, bounds included.
+        A box with west > east crosses the antimeridian."""
+        if west > east:
+            return (self.within(south, west, north, 180) +
+                    self.within(south, -180, north, east))
+        first, left = self.__cell(max(south, -90), west)
+        last, right = self.__cell(min(north, 90), east)
+        if (last - first + 1) * (right - left + 1) <= len(self.__cells):
+            cells = (self.__cells.get((row, col), {})
+                     for row in range(first, last + 1)
+                     for col in range(left, right + 1))
+        else:
+            cells = (points for (row, col), points in self.__cells.items()
+                     if first <= row <= last and left <= col <= right)
+        return ([key for points in cells for key, (lat, lon) in
+                 points.items()
+                 if south <= lat <= north and west <= lon <= east])
+
+    def nearest(self, lat, lon, k=1):
+        """Returns the keys of the k points nearest to (lat, lon), nearest
+        first."""
+        if k <= 0:
+            return ([])
+        lon = (lon + 180) % 360 - 180
+        row, col = self.__cell(lat, lon)
+        best = []
+        radius = 0
+        while True:
+            # The rings up to radius take (2 * radius + 1) ** 2 lookups:
+            # scan every point instead once that is more than the points
+            if (2 * radius + 1) ** 2 > len(self.__points) or \
+                    2 * radius + 1 >= self.__cols:
+                return (self.__scan(lat, lon, k))
+            for cell in self.__ring(row, col, radius):
+                for key, point in self.__cells.get(cell, {}).items():
+                    entry = (-distance(lat, lon, *point), key)
+                    if len(best) < k:
+                        heapq.heappush(best, entry)
+                    elif entry > best[0]:
+                        heapq.heapreplace(best, entry)
+            if len(best) == k and -best[0][0] <= self.__bound(lat, radius):
+                return ([key for _, key in sorted(best, reverse=True)])
+            radius += 1
+
+    def nbytes(self):
+        """Returns the approximate memory used by the index structures."""
+        return (sys.getsizeof(self.__cells) + sys.getsizeof(self.__points) +
+                sum(map(sys.getsizeof, self.__cells.values())) +
+                sum(map(sys.getsizeof, self.__points.values())))
+
+    def __cell(self, lat, lon):
+        """Returns the (row, column) of the cell holding a point."""
+        return (int((lat + 90) // self.cell),
+                min(int((lon + 180) // self.cell), self.__cols - 1))
+
+    def __ring(self, row, col, radius):
+        """Yields the cells at Chebyshev distance radius of (row, col),
+        wrapping around in longitude."""
+        for i in range(max(row - radius, 0),
+                       min(row + radius, self.__rows - 1) + 1):
+            step = 1 if abs(i - row) == radius else 2 * radius or 1
+            for j in range(col - radius, col + radius + 1, step):
+                yield (i, j % self.__cols)
+
+    def __bound(self, lat, radius):
+        """Returns a lower bound of the distance in km from a point at lat
+        to any point outside the cells within radius of its cell."""
+        span = math.radians(radius * self.cell)
+        edge = min(90.0, abs(lat) + (radius + 1) * self.cell)
+        along = 2 * EARTH_RADIUS_KM * math.asin(
+            min(1.0, math.cos(math.radians(edge)) * math.sin(span / 2)))
+        return (min(EARTH_RADIUS_KM * span, along))
+
+    def __scan(self, lat, lon, k):
+        """Returns nearest() by measuring the distance to every point."""
+        return ([key for _, key in heapq.nsmallest(k, (
+            (distance(lat, lon, plat, plon), key)
+            for key, (plat, plon, _) in self.__points.items()))])
+
+
+class TextIndex:
+    """Inverted index of the words in some text attributes. Ranks the
+    instances matching a query with BM25.
+
+    Words are casefolded, stripped of accents and split on non-word
+    characters. Every indexed instance gets a document number, and each
+    word maps to a flat array of (document, count) pairs, so a million
+    reviews take a few hundred MB and dump() writes them as raw bytes.
+    Removed documents are skipped until they outnumber the live ones, then
+    the arrays are compacted.
+    """
+    k1 = 1.2
+    b = 0.75
+    magic = b"HBNBTXT\x01"
+    __word = re.compile(r"\w+")
+    __accents = re.compile("[\u0300-\u036f]")
+    __u32 = struct.Struct("<I")
+
+    def __init__(self, attrs):
+        """Initializes an empty index on the text attributes attrs."""
+        self.attrs = tuple(attrs)
+        self.__postings = {}
+        self.__docs = {}
+        self.__keys = []
+        self.__lengths = array("I")
+        self.__total = 0
+
+    def __len__(self):
+        """Returns the number of indexed instances."""
+        return (len(self.__docs))
+
+    @classmethod
+    def tokenize(cls, text):
+        """Returns the normalized words of text."""
+        text = text.casefold()
+        if not text.isascii():
+            text = cls.__accents.sub("", unicodedata.normalize("NFKD", text))
+        return (cls.__word.findall(text))
+
+    def add(self, key, obj):
+        """Indexes the words of obj under key, replacing any previous entry
+        for key."""
+        self.remove(key)
+        words = []
+        for attr in self.attrs:
+            value = getattr(obj, attr, None)
+            if isinstance(value, str):
+                words += self.tokenize(value)
+        if not words:
+            return
+        doc = len(self.__keys)
+        self.__docs[key] = doc
+        self.__keys.append(key)
+        self.__lengths.append(len(words))
+        self.__total += len(words)
+        counts = {}
+        for word in words:
+            counts[word] = counts.get(word, 0) + 1
+        postings = self.__postings
+        for word, count in counts.items():
+            pairs = postings.get(word)
+            if pairs is None:
+                pairs = postings[sys.intern(word)] = array("I")
+            pairs.append(doc)
+            pairs.append(count)
+
+    def remove(self, key):
+        """Drops key from the index."""
+        doc = self.__docs.pop(key, None)
+        if doc is None:
+            return
+        self.__total -= self.__lengths[doc]
+        self.__lengths[doc] = 0
+        self.__keys[doc] = None
+        removed = len(self.__keys) - len(self.__docs)
+        if removed > 1024 and removed > len(self.__docs):
+            self.__compact()
+
+    def search(self, text, limit=10):
+        """Returns the (key, score) pairs of the `limit` best matches of
+        the words of text, best first. limit=None returns every match."""
+        count = len(self.__docs)
+        if not count:
+            return ([])
+        lengths = self.__lengths
+        k1 = self.k1
+        norm = k1 * (1 - self.b)
+        scale = k1 * self.b * count / self.__total
+        matches = []
+        for word in set(self.tokenize(text)):
+            pairs = self.__postings.get(word)
+            if not pairs:
+                continue
+            # Removed documents have length 0 and do not count in idf
+            weights = [(doc, found * (k1 + 1) /
+                        (found + norm + scale * lengths[doc]))
+                       for doc, found in zip(pairs[::2], pairs[1::2])
+                       if lengths[doc]]
+            idf = math.log(1 + (count - len(weights) + 0.5) /
+                           (len(weights) + 0.5))
+            matches.append((idf, weights))
+        if len(matches) == 1:
+            idf, scores = matches[0]
+        else:
+            idf, scores = 1.0, {}
+            for word_idf, weights in matches:
+                for doc, weight in weights:
+                    scores[doc] = scores.get(doc, 0.0) + word_idf * weight
+            scores = scores.items()
+        if limit is None:
+            best = sorted(scores, key=lambda item: -item[1])
+        else:
+            best = heapq.nlargest(limit, scores, key=lambda item: item[1])
+        return ([(self.__keys[doc], idf * score) for doc, score in best])
+
+    def nbytes(self):
+        """Returns the approximate memory used by the index structures."""
+        return (sys.getsizeof(self.__postings) + sys.getsizeof(self.__docs) +
+                sys.getsizeof(self.__keys) + sys.getsizeof(self.__lengths) +
+                sum(map(sys.getsizeof, self.__postings.values())))
+
+    def dump(self, meta=None):
+        """Returns the index as bytes, with meta, any JSON value, stored
+        alongside: the magic, a JSON header of the keys, words and array
+        sizes, then the raw bytes of the length and posting arrays. Unlike
+        a pickle, loading it runs no code."""
+        words = list(self.__postings)
+        header = json.dumps({
+            "meta": meta, "attrs": self.attrs, "total": self.__total,
+            "byteorder": sys.byteorder, "itemsize": self.__lengths.itemsize,
+            "keys": self.__keys, "words": words,
+            "sizes": [len(self.__postings[word]) for word in words]},
+            separators=(",", ":")).encode()
+        return (b"".join([self.magic, self.__u32.pack(len(header)), header,
+                          self.__lengths.tobytes()] +
+                         [self.__postings[word].tobytes()
+                          for word in words]))
+
+    @classmethod
+    def load(cls, data):
+        """Returns (meta, index) from bytes written by dump(). Raises
+        ValueError when data is not a valid index."""
+        try:
+            if not data.startswith(cls.magic):
+                raise ValueError("not a text index")
+            start = len(cls.magic) + cls.__u32.size
+            end = start + cls.__u32.unpack_from(data, len(cls.magic))[0]
+            header = json.loads(data[start:end])
+            if header["itemsize"] != array("I").itemsize:
+                raise ValueError("text index written on another platform")
+            swap = header["byteorder"] != sys.byteorder
+            view = memoryview(data)
+
+            def read(count):
+                nonlocal end
+                items = array("I")
+                items.frombytes(view[end:end + 4 * count])
+                if len(items) != count:
+                    raise ValueError("truncated text index")
+                if swap:
+                    items.byteswap()
+                end += 4 * count
+                return (items)
+
+            index = cls(header["attrs"])
+            keys = header["keys"]
+            index.__keys = keys
+            index.__docs = dict(zip(keys, range(len(keys))))
+            index.__docs.pop(None, None)
+            index.__lengths = read(len(keys))
+            index.__total = int(header["total"])
+            for word, size in zip(header["words"], header["sizes"]):
+                pairs = read(size)
+                # Documents are numbered in the order they were added, so
+                # the last one of a posting array is its highest
+                if size % 2 or size and pairs[-2] >= len(keys):
+                    raise ValueError("corrupt text index")
+                index.__postings[word] = pairs
+            if end != len(data) or len(header["words"]) != \
+                    len(header["sizes"]):
+                raise ValueError("corrupt text index")
+        except (KeyError, TypeError, struct.error) as error:
+            raise ValueError("corrupt text index") from error
+        return (header["meta"], index)
+
+    def __compact(self):
+        """Renumbers the live documents and drops the removed ones from
+        every posting array."""
+        renumbered = array("I", bytes(4 * len(self.__keys)))
+        keys = []
+        lengths = array("I")
+        for doc, key in enumerate(self.__keys):
+            if key is not None:
+                renumbered[doc] = len(keys)
+                self.__docs[key] = len(keys)
+                keys.append(key)
+                lengths.append(self.__lengths[doc])
+        old_lengths = self.__lengths
+        postings = {}
+        for word, pairs in self.__postings.items():
+            kept = array("I")
+            for doc, found in zip(pairs[::2], pairs[1::2]):
+                if old_lengths[doc]:
+                    kept.append(renumbered[doc])
+                    kept.append(found)
+            if kept:
+                postings[word] = kept
+        self.__postings = postings
+        self.__keys = keys
+        self.__lengths = lengths
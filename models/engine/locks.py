@@ -0,0 +1,160 @@
+#!/usr/bin/python3
+"""Locks coordinating the processes that share storage files, and the
+threads that share one storage.
+
+The file locks rely on fcntl.flock, so they only exist on Unix; elsewhere
+they do nothing, and processes only detect each other's writes through the
+generation counter, without excluding each other.
+"""
+
+from contextlib import contextmanager
+import os
+import struct
+import threading
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+class FileLock:
+    """An advisory lock on the file at path, whose first 8 bytes hold a
+    generation counter. Writers advance the counter while holding the lock
+    exclusively, so readers can tell whether anything was written since
+    they last looked with one read and no lock.
+    """
+    __counter = struct.Struct("<Q")
+
+    def __init__(self, path):
+        """Initializes the lock on path; the file is created on first
+        use."""
+        self.path = path
+        self.__fd = None
+
+    @contextmanager
+    def shared(self):
+        """Holds the lock in shared mode: no writer runs meanwhile."""
+        with self.__locked(fcntl and fcntl.LOCK_SH):
+            yield self
+
+    @contextmanager
+    def exclusive(self):
+        """Holds the lock in exclusive mode: no other reader or writer
+        runs meanwhile."""
+        with self.__locked(fcntl and fcntl.LOCK_EX):
+            yield self
+
+    def generation(self):
+        """Returns the current value of the generation counter, 0 for a
+        new lock file."""
+        fd = self.__open()
+        os.lseek(fd, 0, os.SEEK_SET)
+        data = os.read(fd, self.__counter.size)
+        if len(data) < self.__counter.size:
+            return (0)
+        return (self.__counter.unpack(data)[0])
+
+    def advance(self):
+        """Increments the generation counter and returns its new value.
+        The caller holds the lock exclusively."""
+        generation = self.generation() + 1
+        fd = self.__open()
+        os.lseek(fd, 0, os.SEEK_SET)
+        os.write(fd, self.__counter.pack(generation))
+        return (generation)
+
+    def close(self):
+        """Closes the lock file, releasing any lock held on it."""
+        if self.__fd is not None:
+            os.close(self.__fd)
+            self.__fd = None
+
+    @contextmanager
+    def __locked(self, operation):
+        """Holds the flock `operation` on the lock file, if locks exist."""
+        fd = self.__open()
+        if fcntl is None:
+            yield
+            return
+        fcntl.flock(fd, operation)
+        try:
+            yield
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+
+    def __open(self):
+        """Returns the descriptor of the lock file, opening it on first
+        use."""
+        if self.__fd is None:
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            self.__fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        return (self.__fd)
+
+
+class RWLock:
+    """A reader-writer lock for the threads of one process: any number of
+    readers, or a single writer. Waiting writers go first, so a stream of
+    readers cannot starve them.
+
+    Both modes are reentrant and the writer may also read. A reader asking
+    to write raises RuntimeError, since two readers doing so would wait on
+    each other forever. `mutex` is a reentrant lock readers take to update
+    state they build lazily, excluding each other but not the readers that
+    only look things up.
+    """
+
+    def __init__(self):
+        """Initializes an unlocked lock."""
+        self.mutex = threading.RLock()
+        self.__cond = threading.Condition(threading.Lock())
+        self.__readers = {}
+        self.__writer = None
+        self.__depth = 0
+        self.__waiting = 0
+
+    @contextmanager
+    def reading(self):
+        """Holds the lock in shared mode."""
+        me = threading.get_ident()
+        with self.__cond:
+            if self.__writer != me and me not in self.__readers:
+                while self.__writer is not None or self.__waiting:
+                    self.__cond.wait()
+            self.__readers[me] = self.__readers.get(me, 0) + 1
+        try:
+            yield self
+        finally:
+            with self.__cond:
+                if self.__readers[me] > 1:
+                    self.__readers[me] -= 1
+                else:
+                    del self.__readers[me]
+                    if not self.__readers:
+                        self.__cond.notify_all()
+
+    @contextmanager
+    def writing(self):
+        """Holds the lock in exclusive mode."""
+        me = threading.get_ident()
+        with self.__cond:
+            if self.__writer != me:
+                if me in self.__readers:
+                    raise RuntimeError("a reader cannot take the write lock")
+                self.__waiting += 1
+                try:
+                    while self.__writer is not None or self.__readers:
+                        self.__cond.wait()
+                finally:
+                    self.__waiting -= 1
+                self.__writer = me
+            self.__depth += 1
+        try:
+            yield self
+        finally:
+            with self.__cond:
+                self.__depth -= 1
+                if not self.__depth:
+                    self.__writer = None
+                    self.__cond.notify_all()
@@ -0,0 +1,34 @@
+#!/usr/bin/python3
+"""Progress reporting for FileStorage.reload() on large files."""
+
+import sys
+from timeit import default_timer
+
+
+class ReloadProgress:
+    """reload() progress callback printing the share of the file read, the
+    throughput and the number of records on one updating line."""
+
+    def __init__(self, stream=None, interval=0.5):
+        """Starts the clock; prints to stream (stderr by default) at most
+        once every `interval` seconds."""
+        self.stream = stream or sys.stderr
+        self.interval = interval
+        self.__start = default_timer()
+        self.__last = None
+
+    def __call__(self, done, total, records):
+        """Prints the progress after `done` of `total` bytes and `records`
+        records were read."""
+        now = default_timer()
+        finished = done >= total
+        if not finished and self.__last is not None and \
+                now - self.__last < self.interval:
+            return
+        self.__last = now
+        elapsed = max(now - self.__start, 1e-9)
+        percent = 100 * done / total if total else 100
+        print(f"\rreload: {percent:5.1f}% of {total / 1e6:.1f} MB, "
+              f"{done / 1e6 / elapsed:.1f} MB/s, {records} records "
+              f"({records / elapsed:.0f}/s)", end="\n" if finished else "",
+              file=self.stream, flush=True)
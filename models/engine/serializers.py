@@ -0,0 +1,429 @@
+#!/usr/bin/python3
+"""Serializer backends used by FileStorage to encode records on disk.
+
+Every backend encodes one record (the to_dict() of an instance) to bytes,
+joins encoded records into a snapshot file, reads a snapshot file back one
+record at a time, and frames put/delete entries for the append-only log.
+"""
+
+import codecs
+import json
+import os
+import re
+import struct
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class JSONSerializer:
+    """Stdlib json backend. Snapshots are the classic file.json layout and
+    log entries are one JSON object per line."""
+    name = "json"
+
+    def encode(self, record):
+        """Returns the encoded bytes of one record."""
+        return (json.dumps(record).encode())
+
+    def decode(self, data):
+        """Returns the record encoded in data."""
+        return (json.loads(data))
+
+    def dump(self, items):
+        """Returns the snapshot bytes of the (key, encoded record) items."""
+        return (b"{" + b", ".join(json.dumps(key).encode() + b": " + data
+                                  for key, data in items) + b"}")
+
+    def load(self, data, classes=None):
+        """Returns the {key: record} dictionary of snapshot bytes, only with
+        the records of the class names in classes when given."""
+        records = self.decode(data) if data.strip() else {}
+        if classes is None:
+            return (records)
+        return ({key: record for key, record in records.items()
+                 if key.partition(".")[0] in classes})
+
+    def iter_load(self, file, chunk_size=1 << 20, classes=None):
+        """Yields the (key, record) pairs of a snapshot file object one at a
+        time, reading it in chunks of chunk_size bytes, only for the class
+        names in classes when given."""
+        stream = _JSONStream(file, chunk_size)
+        if stream.peek() == "":
+            return
+        stream.take("{")
+        for key, record in stream.members():
+            if classes is None or key.partition(".")[0] in classes:
+                yield (key, record)
+
+    def log_entry(self, key, data=None):
+        """Returns a log entry putting the encoded record data under key, or
+        deleting key when data is None."""
+        if data is None:
+            return (b'{"op": "delete", "key": ' + json.dumps(key).encode() +
+                    b'}\n')
+        return (b'{"op": "put", "key": ' + json.dumps(key).encode() +
+                b', "obj": ' + data + b'}\n')
+
+    def read_log(self, data):
+        """Returns the (key, record or None) entries of log bytes and the
+        length of the complete entries; a torn tail is left out."""
+        entries = []
+        good = 0
+        while True:
+            end = data.find(b"\n", good)
+            if end == -1:
+                break
+            try:
+                entry = self.decode(data[good:end])
+            except ValueError:
+                break
+            entries.append((entry["key"], entry.get("obj")))
+            good = end + 1
+        return (entries, good)
+
+
+class OrjsonSerializer(JSONSerializer):
+    """JSON backend using the optional orjson package: same files as
+    JSONSerializer, encoded and parsed in C. Opt-in only, as it does not
+    store every value stdlib json does: it writes NaN as null and reads
+    integers wider than 64 bits as floats. Records holding such integers
+    are encoded by stdlib json."""
+    name = "orjson"
+
+    def encode(self, record):
+        """Returns the encoded bytes of one record."""
+        try:
+            return (orjson.dumps(record))
+        except TypeError:
+            return (super().encode(record))
+
+    def decode(self, data):
+        """Returns the record encoded in data."""
+        return (orjson.loads(data))
+
+
+class BinarySerializer:
+    """Compact struct-based backend.
+
+    A snapshot is a magic header followed by (key, record) frames; a log is
+    a sequence of (op, key[, record]) frames. Frame lengths are
+    little-endian uint32 and records use a tagged encoding of the JSON
+    value types.
+    """
+    name = "binary"
+    magic = b"HBNB\x01"
+    __u8 = struct.Struct("<B")
+    __u32 = struct.Struct("<I")
+    __i8 = struct.Struct("<b")
+    __i32 = struct.Struct("<i")
+    __i64 = struct.Struct("<q")
+    __f64 = struct.Struct("<d")
+    __numbers = {"b": __i8, "i": __i32, "q": __i64, "d": __f64}
+    __constants = {"N": None, "T": True, "F": False}
+
+    def encode(self, record):
+        """Returns the encoded bytes of one record."""
+        out = bytearray()
+        self.__encode_value(record, out)
+        return (bytes(out))
+
+    def decode(self, data):
+        """Returns the record encoded in data."""
+        return (self.__decode_value(memoryview(data), 0)[0])
+
+    def dump(self, items):
+        """Returns the snapshot bytes of the (key, encoded record) items."""
+        out = bytearray(self.magic)
+        for key, data in items:
+            self.__frame(out, key.encode())
+            self.__frame(out, data)
+        return (bytes(out))
+
+    def load(self, data, classes=None):
+        """Returns the {key: record} dictionary of snapshot bytes, only with
+        the records of the class names in classes when given. The records
+        of other classes are skipped without being decoded."""
+        return ({key: self.decode(record)
+                 for key, record in self.iter_frames(data)
+                 if classes is None or key.partition(".")[0] in classes})
+
+    def iter_frames(self, data):
+        """Yields the (key, encoded record) frames of snapshot bytes."""
+        if not data:
+            return
+        if data[:len(self.magic)] != self.magic:
+            raise ValueError("not a binary snapshot")
+        view = memoryview(data)
+        offset = len(self.magic)
+        while offset < len(view):
+            key, offset = self.__read_frame(view, offset)
+            record, offset = self.__read_frame(view, offset)
+            yield (bytes(key).decode(), record)
+
+    def iter_load(self, file, chunk_size=None, classes=None):
+        """Yields the (key, record) pairs of a snapshot file object one at a
+        time, reading it frame by frame, only for the class names in classes
+        when given. The records of other classes are skipped unread."""
+        magic = file.read(len(self.magic))
+        if not magic:
+            return
+        if magic != self.magic:
+            raise ValueError("not a binary snapshot")
+        while True:
+            key = self.__read_file_frame(file)
+            if key is None:
+                return
+            key = key.decode()
+            skip = classes is not None and \
+                key.partition(".")[0] not in classes
+            record = self.__read_file_frame(file, skip)
+            if record is None:
+                raise ValueError("truncated frame")
+            if not skip:
+                yield (key, self.decode(record))
+
+    def log_entry(self, key, data=None):
+        """Returns a log entry putting the encoded record data under key, or
+        deleting key when data is None."""
+        out = bytearray(b"D" if data is None else b"P")
+        self.__frame(out, key.encode())
+        if data is not None:
+            self.__frame(out, data)
+        return (bytes(out))
+
+    def read_log(self, data):
+        """Returns the (key, record or None) entries of log bytes and the
+        length of the complete entries; a torn tail is left out."""
+        view = memoryview(data)
+        entries = []
+        good = 0
+        while good < len(view):
+            try:
+                op = bytes(view[good:good + 1])
+                key, offset = self.__read_frame(view, good + 1)
+                record = None
+                if op == b"P":
+                    record, offset = self.__read_frame(view, offset)
+                    record = self.decode(record)
+                elif op != b"D":
+                    break
+            except (ValueError, struct.error):
+                break
+            entries.append((bytes(key).decode(), record))
+            good = offset
+        return (entries, good)
+
+    def __frame(self, out, data):
+        """Appends data to out, prefixed by its length."""
+        out += self.__u32.pack(len(data))
+        out += data
+
+    def __read_frame(self, view, offset):
+        """Returns the frame starting at offset and the offset after it."""
+        size, = self.__u32.unpack_from(view, offset)
+        start = offset + 4
+        if start + size > len(view):
+            raise ValueError("truncated frame")
+        return (view[start:start + size], start + size)
+
+    def __read_file_frame(self, file, skip=False):
+        """Returns the next frame of file, or None at the end of file. A
+        skipped frame is seeked over and returned empty."""
+        header = file.read(4)
+        if not header:
+            return (None)
+        if len(header) < 4:
+            raise ValueError("truncated frame")
+        size, = self.__u32.unpack(header)
+        if skip:
+            file.seek(size, os.SEEK_CUR)
+            return (b"")
+        data = file.read(size)
+        if len(data) < size:
+            raise ValueError("truncated frame")
+        return (data)
+
+    def __encode_value(self, value, out):
+        """Appends the tagged encoding of value to out. Small strings,
+        containers and integers use the short form of their tag."""
+        if value is None:
+            out += b"N"
+        elif value is True:
+            out += b"T"
+        elif value is False:
+            out += b"F"
+        elif isinstance(value, int):
+            if -0x80 <= value < 0x80:
+                out += b"b" + self.__i8.pack(value)
+            elif -0x80000000 <= value < 0x80000000:
+                out += b"i" + self.__i32.pack(value)
+            elif -2 ** 63 <= value < 2 ** 63:
+                out += b"q" + self.__i64.pack(value)
+            else:
+                out += b"I"
+                self.__frame(out, str(value).encode())
+        elif isinstance(value, float):
+            out += b"d" + self.__f64.pack(value)
+        elif isinstance(value, str):
+            data = value.encode()
+            self.__sized(out, b"s", len(data))
+            out += data
+        elif isinstance(value, (list, tuple)):
+            self.__sized(out, b"l", len(value))
+            for item in value:
+                self.__encode_value(item, out)
+        elif isinstance(value, dict):
+            self.__sized(out, b"m", len(value))
+            for key, item in value.items():
+                self.__encode_value(str(key), out)
+                self.__encode_value(item, out)
+        else:
+            raise TypeError(f"Object of type {type(value).__name__} "
+                            "is not serializable")
+
+    def __sized(self, out, tag, size):
+        """Appends tag and size: lowercase tag and one byte when size fits,
+        uppercase tag and a uint32 otherwise."""
+        if size < 0x100:
+            out += tag + self.__u8.pack(size)
+        else:
+            out += tag.upper() + self.__u32.pack(size)
+
+    def __decode_value(self, view, offset):
+        """Returns the value encoded at offset and the offset after it."""
+        tag = chr(view[offset])
+        offset += 1
+        if tag in self.__constants:
+            return (self.__constants[tag], offset)
+        if tag in self.__numbers:
+            number = self.__numbers[tag]
+            return (number.unpack_from(view, offset)[0],
+                    offset + number.size)
+        if tag == "I":
+            data, offset = self.__read_frame(view, offset)
+            return (int(str(data, "utf-8")), offset)
+        if tag in "slm":
+            size = view[offset]
+            offset += 1
+        elif tag in "SLM":
+            size, = self.__u32.unpack_from(view, offset)
+            offset += 4
+        else:
+            raise ValueError(f"unknown tag {tag!r}")
+        if tag in "sS":
+            if offset + size > len(view):
+                raise ValueError("truncated string")
+            return (str(view[offset:offset + size], "utf-8"), offset + size)
+        if tag in "lL":
+            items = []
+            for _ in range(size):
+                item, offset = self.__decode_value(view, offset)
+                items.append(item)
+            return (items, offset)
+        items = {}
+        for _ in range(size):
+            key, offset = self.__decode_value(view, offset)
+            value, offset = self.__decode_value(view, offset)
+            items[key] = value
+        return (items, offset)
+
+
+class _JSONStream:
+    """Reads JSON text from a binary file one token or member at a time,
+    keeping only the unread part of the current chunk in memory."""
+    __space = re.compile(r"[ \t\n\r]*")
+    __member = re.compile(r'[ \t\n\r]*("[^"\\]*(?:\\.[^"\\]*)*")'
+                          r'[ \t\n\r]*:[ \t\n\r]*')
+    __separator = re.compile(r"[ \t\n\r]*([,}])")
+
+    def __init__(self, file, chunk_size):
+        """Initializes the stream over file."""
+        self.__file = file
+        self.__chunk_size = chunk_size
+        self.__decoder = codecs.getincrementaldecoder("utf-8")()
+        self.__scan = json.JSONDecoder().scan_once
+        self.__text = ""
+        self.__pos = 0
+        self.__eof = False
+
+    def peek(self):
+        """Skips whitespace and returns the next character, or an empty
+        string at the end of the file."""
+        while True:
+            self.__pos = self.__space.match(self.__text, self.__pos).end()
+            if self.__pos < len(self.__text):
+                return (self.__text[self.__pos])
+            if not self.__fill():
+                return ("")
+
+    def take(self, char):
+        """Consumes the next character, which must be char."""
+        if self.peek() != char:
+            raise ValueError(f"expected {char!r} in JSON snapshot")
+        self.__pos += 1
+
+    def members(self):
+        """Yields the (key, value) members of the object whose opening
+        brace was just taken, up to and including its closing brace.
+
+        A member is parsed from the buffered text along with the comma or
+        brace after it; when that fails the member may be cut by the chunk
+        boundary, so it is parsed again once the next chunk is read.
+        """
+        if self.peek() == "}":
+            self.__pos += 1
+            return
+        member = self.__member.match
+        separator = self.__separator.match
+        scan = self.__scan
+        while True:
+            text = self.__text
+            match = member(text, self.__pos)
+            sep = None
+            if match is not None:
+                try:
+                    value, end = scan(text, match.end())
+                    sep = separator(text, end)
+                except (ValueError, StopIteration):
+                    pass
+            if sep is None:
+                if self.__fill():
+                    continue
+                raise ValueError("malformed JSON snapshot")
+            self.__pos = sep.end()
+            key = match.group(1)
+            yield (json.loads(key) if "\\" in key else key[1:-1], value)
+            if sep.group(1) == "}":
+                return
+
+    def __fill(self):
+        """Appends the next chunk to the unread text; returns False at the
+        end of the file."""
+        if self.__eof:
+            return (False)
+        data = self.__file.read(self.__chunk_size)
+        self.__eof = not data
+        self.__text = self.__text[self.__pos:] + \
+            self.__decoder.decode(data, final=self.__eof)
+        self.__pos = 0
+        return (True)
+
+
+serializer_dict = {"json": JSONSerializer,
+                   "orjson": OrjsonSerializer,
+                   "binary": BinarySerializer}
+
+
+def get_serializer(name=None, path=None):
+    """Returns a serializer by name, or chosen from the extension of path:
+    `.bin` files are binary, anything else is stdlib JSON."""
+    if name is None:
+        extension = os.path.splitext(path or "")[1]
+        name = "binary" if extension == ".bin" else "json"
+    if name == "orjson" and orjson is None:
+        raise ValueError("the orjson serializer needs the orjson package")
+    if name not in serializer_dict:
+        raise ValueError(f"unknown serializer: {name}")
+    return (serializer_dict[name]())
@@ -0,0 +1,284 @@
+#!/usr/bin/python3
+"""Module defining SnapshotStorage, a read-only storage engine serving
+records straight from a memory-mapped snapshot file."""
+
+from contextlib import contextmanager
+import mmap
+import struct
+from models.engine.columns import ColumnTable
+from models.engine.file_storage import FileStorage
+from models.engine.indexes import GridIndex, HashIndex, TextIndex
+from models.engine.serializers import BinarySerializer
+
+
+class SnapshotStorage:
+    """Read-only storage over an indexed snapshot file.
+
+    The file holds binary-encoded records back to back, followed by an
+    index of (key, offset, size) entries and a footer pointing at it.
+    reload() maps the file read-only and only reads the index; records are
+    decoded when first asked for and kept in an identity map, so get()
+    never reads another record and every reader process shares the pages
+    of the file through the page cache.
+
+    Snapshots are written by FileStorage.export(). They are replaced by an
+    atomic rename, so a reader keeps a consistent view until its next
+    reload(). Every write operation raises PermissionError.
+    """
+    magic = b"HBNX\x01"
+    __footer = struct.Struct("<QI5s")
+    __entry = struct.Struct("<QI")
+    __u32 = struct.Struct("<I")
+    __serializer = BinarySerializer()
+
+    def __init__(self, *, file_path='file.snapshot'):
+        """Initializes the storage over the snapshot at file_path."""
+        self.file_path = file_path
+        self.__map = None
+        self.__index = {}
+        self.__by_class = {}
+        self.__objects = {}
+        self.__columns = {}
+        self.__spatial = {}
+        self.__text = {}
+        self.__relations = {}
+
+    @classmethod
+    def dump(cls, items):
+        """Returns the snapshot bytes of the (key, record) items."""
+        out = bytearray(cls.magic)
+        index = bytearray()
+        count = 0
+        for key, record in items:
+            data = cls.__serializer.encode(record)
+            key = key.encode()
+            index += cls.__u32.pack(len(key)) + key
+            index += cls.__entry.pack(len(out), len(data))
+            out += data
+            count += 1
+        offset = len(out)
+        out += index
+        out += cls.__footer.pack(offset, count, cls.magic)
+        return (bytes(out))
+
+    def all(self, cls=None):
+        """Returns a dictionary of every stored instance, or only of the
+        instances of cls (a class or class name) when given."""
+        if cls is None:
+            keys = self.__index
+        else:
+            keys = self.__by_class.get(self.__class_name(cls), ())
+        return ({key: self.__load(key) for key in keys})
+
+    def get(self, cls, id):
+        """Returns the instance of cls with the given id, or None."""
+        key = f"{self.__class_name(cls)}.{id}"
+        if key not in self.__index:
+            return (None)
+        return (self.__load(key))
+
+    def count(self, cls=None):
+        """Returns the number of stored instances, optionally of cls only.
+        No record is decoded."""
+        if cls is None:
+            return (len(self.__index))
+        return (len(self.__by_class.get(self.__class_name(cls), ())))
+
+    def find(self, cls, **filters):
+        """Returns a dictionary of the instances of cls whose attributes
+        equal every given filter."""
+        return ({key: obj for key, obj in self.all(cls).items()
+                 if all(getattr(obj, attr, None) == value
+                        for attr, value in filters.items())})
+
+    def related(self, cls, attr, value):
+        """Returns a dictionary of the instances of cls whose attr equals
+        value, as FileStorage.related(). The reverse index of (cls, attr)
+        is built on first use."""
+        name = self.__class_name(cls)
+        index = self.__relations.get((name, attr))
+        if index is None:
+            index_cls = FileStorage.index_dict.get(name, {}).get(attr)
+            if index_cls is None:
+                index_cls = HashIndex
+            index = self.__relations[name, attr] = index_cls(attr)
+            for key, obj in self.all(name).items():
+                index.add(key, obj)
+        return ({key: self.__load(key) for key in index.lookup(value)})
+
+    def aggregate(self, cls, attr, op="mean", by=None, **ranges):
+        """Returns the `op` (count, sum, mean, min or max) of the numeric
+        values of attr over the instances of cls, optionally per value of
+        `by` and within (low, high) ranges, as FileStorage.aggregate()."""
+        table = self.__columns_for(cls, (attr, *ranges),
+                                   () if by is None else (by,))
+        return (table.aggregate(attr, op, by, **ranges))
+
+    def select(self, cls, **ranges):
+        """Returns a dictionary of the instances of cls whose numeric
+        attributes lie within the (low, high) pairs given for them."""
+        table = self.__columns_for(cls, ranges)
+        return ({key: self.__load(key) for key in table.select(**ranges)})
+
+    def near(self, cls, lat, lon, k=1):
+        """Returns a dictionary of the k instances of cls nearest to the
+        point (lat, lon), nearest first."""
+        keys = self.__spatial_for(cls).nearest(lat, lon, k)
+        return ({key: self.__load(key) for key in keys})
+
+    def within(self, cls, south, west, north, east):
+        """Returns a dictionary of the instances of cls located in the
+        bounding box, as FileStorage.within()."""
+        keys = self.__spatial_for(cls).within(south, west, north, east)
+        return ({key: self.__load(key) for key in keys})
+
+    def search(self, cls, text, limit=10):
+        """Returns a dictionary of the `limit` instances of cls whose text
+        attributes best match the words of text, best first."""
+        name = self.__class_name(cls)
+        if name not in FileStorage.text_dict:
+            raise ValueError(f"{name} has no text index")
+        index = self.__text.get(name)
+        if index is None:
+            index = self.__text[name] = TextIndex(FileStorage.text_dict[name])
+            for key, obj in self.all(name).items():
+                index.add(key, obj)
+        return ({key: self.__load(key)
+                 for key, _ in index.search(text, limit)})
+
+    def new(self, obj):
+        """Refuses to add obj: the storage is read-only."""
+        raise PermissionError("storage is read-only")
+
+    def touch(self, obj, name=None):
+        """Refuses changes to stored instances, before they are made.
+        Called before every attribute assignment on a BaseModel."""
+        obj_id = getattr(obj, "id", None)
+        if obj_id is None:
+            return
+        if self.__objects.get(f"{obj.__class__.__name__}.{obj_id}") is obj:
+            raise PermissionError("storage is read-only")
+
+    def delete(self, obj=None):
+        """Refuses to remove obj: the storage is read-only."""
+        if obj is not None:
+            raise PermissionError("storage is read-only")
+
+    def dirty_count(self):
+        """Returns the number of unsaved changes, always 0."""
+        return (0)
+
+    def save(self):
+        """Refuses to save: the storage is read-only."""
+        raise PermissionError("storage is read-only")
+
+    def sync(self):
+        """Returns at once: there are never pending writes."""
+
+    def refresh(self):
+        """Does nothing: readers keep their view until reload()."""
+
+    def reload(self):
+        """Maps the snapshot file again and drops every decoded instance.
+        A missing or empty file is an empty snapshot."""
+        self.close()
+        self.__objects = {}
+        self.__index = {}
+        self.__by_class = {}
+        self.__columns = {}
+        self.__spatial = {}
+        self.__text = {}
+        self.__relations = {}
+        try:
+            with open(self.file_path, 'rb') as file:
+                self.__map = mmap.mmap(file.fileno(), 0,
+                                       access=mmap.ACCESS_READ)
+        except (FileNotFoundError, ValueError):
+            return
+        view = self.__map
+        footer = len(view) - self.__footer.size
+        if footer < len(self.magic) or \
+                view[:len(self.magic)] != self.magic:
+            raise ValueError(f"{self.file_path} is not an indexed snapshot")
+        offset, count, magic = self.__footer.unpack_from(view, footer)
+        if magic != self.magic:
+            raise ValueError(f"{self.file_path} is not an indexed snapshot")
+        for _ in range(count):
+            size, = self.__u32.unpack_from(view, offset)
+            offset += self.__u32.size
+            key = view[offset:offset + size].decode()
+            offset += size
+            self.__index[key] = self.__entry.unpack_from(view, offset)
+            offset += self.__entry.size
+            self.__by_class.setdefault(key.partition(".")[0], []).append(key)
+
+    def close(self):
+        """Unmaps the snapshot file."""
+        if self.__map is not None:
+            self.__map.close()
+            self.__map = None
+
+    def in_transaction(self):
+        """Returns False: transactions are never open."""
+        return (False)
+
+    def begin(self):
+        """Refuses to open a transaction: the storage is read-only."""
+        raise PermissionError("storage is read-only")
+
+    def commit(self):
+        """Does nothing: transactions are never open."""
+
+    def rollback(self):
+        """Does nothing: transactions are never open."""
+
+    @contextmanager
+    def batch(self):
+        """Refuses to open a transaction: the storage is read-only."""
+        self.begin()
+        yield self
+
+    transaction = batch
+
+    def __load(self, key):
+        """Returns the instance stored under key, decoding its record from
+        the mapped file on first access."""
+        obj = self.__objects.get(key)
+        if obj is None:
+            offset, size = self.__index[key]
+            record = self.__serializer.decode(
+                self.__map[offset:offset + size])
+            obj = FileStorage.class_dict[record["__class__"]](**record)
+            self.__objects[key] = obj
+        return (obj)
+
+    def __columns_for(self, cls, numbers, groups=()):
+        """Returns the column table of cls with the numeric columns
+        `numbers` and grouping columns `groups`, built on first use."""
+        name = self.__class_name(cls)
+        objects = self.all(name)
+        table = self.__columns.get(name)
+        if table is None:
+            table = self.__columns[name] = ColumnTable()
+            for key, obj in objects.items():
+                table.add(key, obj)
+        table.add_columns(objects, numbers, groups)
+        return (table)
+
+    def __spatial_for(self, cls):
+        """Returns the GridIndex of cls, built on first use."""
+        name = self.__class_name(cls)
+        if name not in FileStorage.spatial_dict:
+            raise ValueError(f"{name} has no location index")
+        grid = self.__spatial.get(name)
+        if grid is None:
+            grid = self.__spatial[name] = \
+                GridIndex(*FileStorage.spatial_dict[name])
+            for key, obj in self.all(name).items():
+                grid.add(key, obj)
+        return (grid)
+
+    @staticmethod
+    def __class_name(cls):
+        """Returns the name of cls, which is either a class or a name."""
+        return (cls if isinstance(cls, str) else cls.__name__)
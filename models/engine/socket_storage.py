@@ -0,0 +1,347 @@
+#!/usr/bin/python3
+"""Module defining SocketStorage, a storage engine forwarding every query
+to a storage server process over a Unix domain socket.
+
+Messages are BinarySerializer records framed by their length as a
+little-endian uint32. A request is {"op": <method>, "args": [...],
+"kwargs": {...}}; the reply is {"value": ...}, {"object": record or
+None}, {"objects": {key: record}}, {"pairs": [[key, value], ...]} for
+dictionaries whose keys are not strings, or {"error": <exception type>,
+"message": ...}.
+"""
+
+from contextlib import contextmanager
+import socket
+import struct
+import threading
+from models.engine.file_storage import FileStorage
+from models.engine.serializers import BinarySerializer
+
+_serializer = BinarySerializer()
+_length = struct.Struct("<I")
+_errors = {error.__name__: error for error in
+           (ValueError, TypeError, KeyError, PermissionError, OSError)}
+
+
+def send_message(file, message):
+    """Writes message, a dictionary, as one frame to the binary file."""
+    data = _serializer.encode(message)
+    file.write(_length.pack(len(data)) + data)
+    file.flush()
+
+
+def receive_message(file):
+    """Returns the message of the next frame of the binary file, or None
+    when the other end closed the connection."""
+    header = file.read(_length.size)
+    if not header:
+        return (None)
+    if len(header) < _length.size:
+        raise ConnectionError("truncated message")
+    size, = _length.unpack(header)
+    data = file.read(size)
+    if len(data) < size:
+        raise ConnectionError("truncated message")
+    return (_serializer.decode(data))
+
+
+class SocketStorage:
+    """Storage engine backed by a storage server (see storage_server.py).
+
+    The server owns the data; this client only keeps the instances it
+    loaded in an identity map, so get() returns the same instance until
+    reload(). Queries run on the server and see the changes saved by any
+    client. Changes are tracked like in DBStorage and sent to the server
+    in one message by save(), unless a transaction is open; rollback()
+    fetches the saved state of the instances it restores.
+
+    The connection is opened on first use, so creating the storage costs
+    nothing; a console command pays one connect and one round trip per
+    query instead of loading the whole dataset.
+    """
+
+    def __init__(self, *, socket_path='hbnb.sock'):
+        """Initializes the storage for the server listening on
+        socket_path."""
+        self.socket_path = socket_path
+        self.__sock = None
+        self.__file = None
+        self.__lock = threading.Lock()
+        self.__objects = {}
+        self.__dirty = {}
+        self.__touched = None
+
+    def all(self, cls=None):
+        """Returns a dictionary of every stored instance, or only of the
+        instances of cls (a class or class name) when given. Instances
+        added or deleted here and not saved yet are counted in or out."""
+        if cls is None:
+            result = self.__call("all")
+        else:
+            result = self.__call("all", self.__class_name(cls))
+        for key, obj in self.__unsaved(cls):
+            if obj is not None:
+                result.setdefault(key, obj)
+        return (result)
+
+    def get(self, cls, id):
+        """Returns the instance of cls with the given id, or None."""
+        key = f"{self.__class_name(cls)}.{id}"
+        if key in self.__objects:
+            return (self.__objects[key])
+        if key in self.__dirty:
+            return (None)
+        return (self.__call("get", self.__class_name(cls), id))
+
+    def count(self, cls=None):
+        """Returns the number of stored instances, optionally of cls only,
+        counting the unsaved changes made here as all() does."""
+        if any(True for _ in self.__unsaved(cls)):
+            return (len(self.all(cls)))
+        if cls is None:
+            return (self.__call("count"))
+        return (self.__call("count", self.__class_name(cls)))
+
+    def find(self, cls, **filters):
+        """Returns a dictionary of the instances of cls whose attributes
+        equal every given filter."""
+        return (self.__call("find", self.__class_name(cls), **filters))
+
+    def find_range(self, cls, attr, low=None, high=None):
+        """Returns a dictionary of the instances of cls whose numeric attr
+        lies between low and high, ordered by attr."""
+        return (self.__call("find_range", self.__class_name(cls), attr,
+                            low, high))
+
+    def related(self, cls, attr, value):
+        """Returns a dictionary of the instances of cls whose attr equals
+        value, as FileStorage.related()."""
+        return (self.__call("related", self.__class_name(cls), attr, value))
+
+    def aggregate(self, cls, attr, op="mean", by=None, **ranges):
+        """Returns the `op` of the numeric values of attr over the
+        instances of cls, as FileStorage.aggregate()."""
+        return (self.__call("aggregate", self.__class_name(cls), attr, op,
+                            by, **ranges))
+
+    def select(self, cls, **ranges):
+        """Returns a dictionary of the instances of cls whose numeric
+        attributes lie within the (low, high) pairs given for them."""
+        return (self.__call("select", self.__class_name(cls), **ranges))
+
+    def near(self, cls, lat, lon, k=1):
+        """Returns a dictionary of the k instances of cls nearest to the
+        point (lat, lon), nearest first."""
+        return (self.__call("near", self.__class_name(cls), lat, lon, k))
+
+    def within(self, cls, south, west, north, east):
+        """Returns a dictionary of the instances of cls located in the
+        bounding box, as FileStorage.within()."""
+        return (self.__call("within", self.__class_name(cls), south, west,
+                            north, east))
+
+    def search(self, cls, text, limit=10):
+        """Returns a dictionary of the `limit` instances of cls whose text
+        attributes best match the words of text, best first."""
+        return (self.__call("search", self.__class_name(cls), text, limit))
+
+    def new(self, obj):
+        """Adds obj to the storage."""
+        key = f"{obj.__class__.__name__}.{obj.id}"
+        self.__remember(key)
+        self.__objects[key] = obj
+        self.__dirty[key] = obj
+
+    def touch(self, obj, name=None):
+        """Flags a stored obj as modified. Called before every attribute
+        assignment on a BaseModel, with the attribute name."""
+        obj_id = getattr(obj, "id", None)
+        if obj_id is None:
+            return
+        key = f"{obj.__class__.__name__}.{obj_id}"
+        if self.__objects.get(key) is obj:
+            self.__remember(key)
+            self.__dirty[key] = obj
+
+    def delete(self, obj=None):
+        """Removes obj from the storage if it is stored."""
+        if obj is None:
+            return
+        key = f"{obj.__class__.__name__}.{obj.id}"
+        self.__remember(key)
+        self.__objects.pop(key, None)
+        self.__dirty[key] = None
+
+    def dirty_count(self):
+        """Returns the number of keys changed since the last save."""
+        return (len(self.__dirty))
+
+    def save(self):
+        """Sends every change to the server, which saves them, unless a
+        transaction is open."""
+        if not self.in_transaction():
+            self.flush()
+
+    def flush(self):
+        """Sends the pending changes to the server in one message."""
+        if not self.__dirty:
+            return
+        dirty = self.__dirty
+        self.__dirty = {}
+        try:
+            self.__call("save", {key: obj.to_dict() for key, obj
+                                 in dirty.items() if obj is not None},
+                        [key for key, obj in dirty.items() if obj is None])
+        except BaseException:
+            dirty.update(self.__dirty)
+            self.__dirty = dirty
+            raise
+
+    def sync(self):
+        """Returns at once: the server persists changes before replying."""
+
+    def refresh(self):
+        """Does nothing: every query runs on the server."""
+
+    def reload(self):
+        """Drops unsaved changes and every loaded instance, so they are
+        fetched again from the server on next access."""
+        self.__objects = {}
+        self.__dirty = {}
+        self.__touched = None
+
+    def close(self):
+        """Closes the connection to the server."""
+        with self.__lock:
+            if self.__sock is not None:
+                self.__file.close()
+                self.__sock.close()
+                self.__sock = None
+                self.__file = None
+
+    def in_transaction(self):
+        """Returns True between begin() and commit()/rollback()."""
+        return (self.__touched is not None)
+
+    def begin(self):
+        """Opens a transaction: saves are deferred until commit()."""
+        if self.__touched is None:
+            self.__touched = {}
+
+    def commit(self):
+        """Closes the transaction and sends its changes at once."""
+        self.__touched = None
+        self.flush()
+
+    def rollback(self):
+        """Closes the transaction, discards its changes and restores the
+        instances it changed to their saved state."""
+        touched = self.__touched
+        if touched is None:
+            return
+        self.__touched = None
+        self.__dirty = {}
+        for key, obj in touched.items():
+            self.__objects.pop(key, None)
+            name, _, obj_id = key.partition(".")
+            saved = self.__call("get", name, obj_id)
+            if saved is None or obj is None:
+                continue
+            obj.__dict__.clear()
+            obj.__dict__.update(saved.__dict__)
+            self.__objects[key] = obj
+
+    @contextmanager
+    def batch(self):
+        """Runs the with-block as one transaction: commits once on exit, or
+        rolls back if it raises. Nested batches join the outer one."""
+        if self.in_transaction():
+            yield self
+            return
+        self.begin()
+        try:
+            yield self
+        except BaseException:
+            self.rollback()
+            raise
+        self.commit()
+
+    transaction = batch
+
+    def __call(self, op, *args, **kwargs):
+        """Runs the method `op` on the server and returns its result, with
+        records turned into instances."""
+        request = {"op": op, "args": list(args), "kwargs": kwargs}
+        with self.__lock:
+            if self.__sock is None:
+                self.__connect()
+            try:
+                send_message(self.__file, request)
+                reply = receive_message(self.__file)
+            except OSError:
+                self.__sock.close()
+                self.__sock = None
+                raise
+        if reply is None:
+            self.close()
+            raise ConnectionError("the storage server closed the connection")
+        if "error" in reply:
+            raise _errors.get(reply["error"], RuntimeError)(reply["message"])
+        if "objects" in reply:
+            return (self.__load(reply["objects"]))
+        if "object" in reply:
+            record = reply["object"]
+            if record is None:
+                return (None)
+            loaded = self.__load({f"{record['__class__']}.{record['id']}":
+                                  record})
+            return (loaded.popitem()[1] if loaded else None)
+        if "pairs" in reply:
+            return ({key: value for key, value in reply["pairs"]})
+        return (reply["value"])
+
+    def __connect(self):
+        """Opens the connection to the server; the caller holds __lock."""
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.connect(self.socket_path)
+        except OSError:
+            sock.close()
+            raise
+        self.__sock = sock
+        self.__file = sock.makefile("rwb")
+
+    def __load(self, records):
+        """Returns a {key: instance} dictionary of records, reusing
+        instances already in the identity map."""
+        result = {}
+        for key, record in records.items():
+            obj = self.__objects.get(key)
+            if obj is None and key not in self.__dirty:
+                obj = self.__objects[key] = \
+                    FileStorage.class_dict[record["__class__"]](**record)
+            if obj is not None:
+                result[key] = obj
+        return (result)
+
+    def __unsaved(self, cls=None):
+        """Yields the (key, instance or None) changes not saved yet, only
+        those of cls when given."""
+        if cls is None:
+            yield from self.__dirty.items()
+            return
+        prefix = self.__class_name(cls) + "."
+        for key, obj in self.__dirty.items():
+            if key.startswith(prefix):
+                yield (key, obj)
+
+    def __remember(self, key):
+        """Records the instance stored under key the first time key is
+        changed inside the open transaction."""
+        if self.__touched is not None and key not in self.__touched:
+            self.__touched[key] = self.__objects.get(key)
+
+    @staticmethod
+    def __class_name(cls):
+        """Returns the name of cls, which is either a class or a name."""
+        return (cls if isinstance(cls, str) else cls.__name__)
@@ -0,0 +1,168 @@
+#!/usr/bin/python3
+"""Module defining StorageServer, a long-running process that owns a
+storage engine in memory and serves it to SocketStorage clients over a
+Unix domain socket (see socket_storage.py for the protocol).
+
+Usage: python3 -m models.engine.storage_server [socket_path]
+
+The served storage is models.storage, configured by the usual HBNB_*
+environment variables; the socket path defaults to HBNB_SOCKET_PATH, then
+to hbnb.sock. The server stops on SIGINT or SIGTERM after syncing the
+storage to disk.
+"""
+
+import os
+import signal
+import socket
+import socketserver
+import sys
+import threading
+import time
+from models.engine.file_storage import FileStorage
+from models.engine.socket_storage import (SocketStorage, receive_message,
+                                          send_message)
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    """Serves the requests of one client connection until it closes."""
+
+    def handle(self):
+        """Answers every message received on the connection."""
+        while True:
+            try:
+                request = receive_message(self.rfile)
+            except ConnectionError:
+                return
+            if request is None:
+                return
+            try:
+                reply = self.server.dispatch(request)
+            except Exception as error:
+                reply = {"error": type(error).__name__,
+                         "message": str(error)}
+            try:
+                send_message(self.wfile, reply)
+            except OSError:
+                return
+
+
+class StorageServer(socketserver.ThreadingUnixStreamServer):
+    """Serves storage to SocketStorage clients, one thread per connection.
+
+    Requests run one at a time under a lock, so the storage sees a single
+    caller, as in a console session. Query results travel as to_dict()
+    records. A "save" request carries every change of one client save:
+    the records to put, which replace the stored instances, and the keys
+    to delete; the server applies them and saves before replying.
+    """
+    daemon_threads = True
+    __objects = {"all", "find", "find_range", "related", "select", "near",
+                 "within", "search"}
+    __values = {"count", "aggregate"}
+
+    def __init__(self, socket_path, storage):
+        """Binds the server to socket_path to serve storage."""
+        super().__init__(socket_path, _Handler)
+        self.storage = storage
+        self.__lock = threading.Lock()
+
+    def dispatch(self, request):
+        """Returns the reply to the request message."""
+        op = request["op"]
+        args = request.get("args", [])
+        kwargs = request.get("kwargs", {})
+        with self.__lock:
+            if op == "save":
+                self.__save(*args)
+                return ({"value": None})
+            if op == "get":
+                obj = self.storage.get(*args)
+                return ({"object": obj.to_dict() if obj else None})
+            if op in self.__objects:
+                result = getattr(self.storage, op)(*args, **kwargs)
+                return ({"objects": {key: obj.to_dict() for key, obj
+                                     in result.items()}})
+            if op in self.__values:
+                result = getattr(self.storage, op)(*args, **kwargs)
+                if isinstance(result, dict):
+                    return ({"pairs": [[key, value] for key, value
+                                       in result.items()]})
+                return ({"value": result})
+        raise ValueError(f"unknown operation: {op}")
+
+    def sync(self):
+        """Waits for the running request, then syncs the storage to disk."""
+        with self.__lock:
+            self.storage.sync()
+
+    def server_close(self):
+        """Closes the socket and removes its file."""
+        super().server_close()
+        try:
+            os.unlink(self.server_address)
+        except OSError:
+            pass
+
+    def __save(self, put, delete):
+        """Stores the put records, deletes the keys of delete, and saves."""
+        storage = self.storage
+        with storage.batch():
+            for key, record in put.items():
+                name, _, obj_id = key.partition(".")
+                current = storage.get(name, obj_id)
+                if current is not None:
+                    storage.delete(current)
+                storage.new(FileStorage.class_dict[name](**record))
+            for key in delete:
+                name, _, obj_id = key.partition(".")
+                current = storage.get(name, obj_id)
+                if current is not None:
+                    storage.delete(current)
+
+
+def _remove_stale(socket_path, attempts=5):
+    """Removes the socket file left by a server that is no longer running;
+    exits if one still answers there.
+
+    A server binds its socket before it listens, so a connection refused
+    for a moment may come from one that is starting: the file is removed
+    only once every attempt was refused.
+    """
+    for attempt in range(attempts):
+        if attempt:
+            time.sleep(0.05)
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.connect(socket_path)
+        except FileNotFoundError:
+            return
+        except ConnectionRefusedError:
+            continue
+        else:
+            sys.exit(f"a storage server is already listening on "
+                     f"{socket_path}")
+        finally:
+            sock.close()
+    os.unlink(socket_path)
+
+
+def main():
+    """Serves models.storage until interrupted."""
+    import models
+    if isinstance(models.storage, SocketStorage):
+        sys.exit("the storage server cannot serve a socket storage")
+    socket_path = sys.argv[1] if len(sys.argv) > 1 else \
+        os.getenv("HBNB_SOCKET_PATH", "hbnb.sock")
+    _remove_stale(socket_path)
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    with StorageServer(socket_path, models.storage) as server:
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.sync()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+#!/usr/bin/python3
+"""Module defining StorageView, the point-in-time view returned by
+FileStorage.snapshot()."""
+
+from collections.abc import Mapping
+
+
+class StorageView(Mapping):
+    """A read-only mapping of key -> record (a new to_dict() dictionary)
+    of what storage held when the view was opened.
+
+    Opening a view copies nothing: it reads the live dictionaries of
+    storage, and storage hands it the state of a key before changing it
+    for the first time while the view is open, so records are only
+    encoded when read. Changes made in place on an attribute value, like
+    appending to a list, go unnoticed, as they do for saves.
+
+    generation counts the changes made to storage before the view was
+    opened. close() (or leaving a with-block) stops the view from
+    following storage; a view nobody refers to anymore is dropped too.
+    """
+
+    __hash__ = object.__hash__
+
+    def __init__(self, objects, raw, generation):
+        """Opens a view of the instances in objects and the records in raw,
+        the live dictionaries of storage."""
+        self.generation = generation
+        self.__objects = objects
+        self.__raw = raw
+        self.__saved = {}
+        self.closed = False
+
+    def preserve(self, key, objects):
+        """Keeps the current state of key, about to change in objects, the
+        first time it changes. Called by storage."""
+        if objects is self.__objects and key not in self.__saved:
+            self.__saved[key] = self.__current(key)
+
+    def close(self):
+        """Stops following storage; the view must not be read anymore."""
+        self.closed = True
+        self.__objects = {}
+        self.__raw = {}
+        self.__saved = {}
+
+    def __enter__(self):
+        """Returns the view."""
+        return (self)
+
+    def __exit__(self, *exc):
+        """Closes the view."""
+        self.close()
+
+    def __getitem__(self, key):
+        """Returns a new dictionary of the record of key when the view was
+        opened."""
+        record = self.__current(key)
+        saved = self.__saved
+        if key in saved:
+            record = saved[key]
+        if record is None:
+            raise KeyError(key)
+        return (dict(record))
+
+    def __iter__(self):
+        """Yields the keys stored when the view was opened."""
+        live = dict.fromkeys(list(self.__raw) + list(self.__objects))
+        saved = dict(self.__saved)
+        for key in live:
+            if key not in saved or saved[key] is not None:
+                yield key
+        for key, record in saved.items():
+            if record is not None and key not in live:
+                yield key
+
+    def __len__(self):
+        """Returns the number of records in the view."""
+        return (sum(1 for _ in self))
+
+    def __contains__(self, key):
+        """Returns True if key was stored when the view was opened."""
+        live = key in self.__raw or key in self.__objects
+        saved = self.__saved
+        if key in saved:
+            return (saved[key] is not None)
+        return (live)
+
+    def __current(self, key):
+        """Returns the live record of key, or None."""
+        obj = self.__objects.get(key)
+        if obj is None:
+            record = self.__raw.get(key)
+            if record is not None:
+                return (record)
+            obj = self.__objects.get(key)
+            if obj is None:
+                return (None)
+        return (obj.to_dict())
@@ -1,6 +1,7 @@
 #!/usr/bin/python3
 """Defines Places and inherits from the BaseModel class"""
 
+import models
 from models.base_model import BaseModel
 
 
@@ -17,3 +18,27 @@ class Place(BaseModel):
     latitude = 0.0
     longitude = 0.0
     amenity_ids = []
+
+    @property
+    def city(self):
+        """Returns the City of this Place, or None."""
+        return (models.storage.get("City", self.city_id))
+
+    @property
+    def user(self):
+        """Returns the User owning this Place, or None."""
+        return (models.storage.get("User", self.user_id))
+
+    @property
+    def reviews(self):
+        """Returns the list of the Review instances of this Place."""
+        return (list(models.storage.related("Review", "place_id",
+                                            self.id).values()))
+
+    @property
+    def amenities(self):
+        """Returns the list of the Amenity instances listed in
+        amenity_ids."""
+        found = (models.storage.get("Amenity", amenity_id)
+                 for amenity_id in self.amenity_ids)
+        return ([amenity for amenity in found if amenity is not None])
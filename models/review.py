@@ -1,6 +1,7 @@
 #!/usr/bin/python3
 """Defines Reviews and inherits from the BaseModel class"""
 
+import models
 from models.base_model import BaseModel
 
 
@@ -9,3 +10,13 @@ class Review(BaseModel):
     place_id = ""
     user_id = ""
     text = ""
+
+    @property
+    def place(self):
+        """Returns the Place of this Review, or None."""
+        return (models.storage.get("Place", self.place_id))
+
+    @property
+    def user(self):
+        """Returns the User who wrote this Review, or None."""
+        return (models.storage.get("User", self.user_id))
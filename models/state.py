@@ -1,9 +1,16 @@
 #!/usr/bin/python3
 """Defines States and inherits from the BaseModel class"""
 
+import models
 from models.base_model import BaseModel
 
 
 class State(BaseModel):
     """State class - subclass of the BaseModel"""
     name = ""
+
+    @property
+    def cities(self):
+        """Returns the list of the City instances of this State."""
+        return (list(models.storage.related("City", "state_id",
+                                            self.id).values()))
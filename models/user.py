@@ -1,6 +1,7 @@
 #!/usr/bin/python3
 """Defines Users and inherits from the BaseModel class"""
 
+import models
 from models.base_model import BaseModel
 
 
@@ -10,3 +11,15 @@ class User(BaseModel):
     password = ""
     first_name = ""
     last_name = ""
+
+    @property
+    def places(self):
+        """Returns the list of the Place instances this User owns."""
+        return (list(models.storage.related("Place", "user_id",
+                                            self.id).values()))
+
+    @property
+    def reviews(self):
+        """Returns the list of the Review instances this User wrote."""
+        return (list(models.storage.related("Review", "user_id",
+                                            self.id).values()))
@@ -11,12 +11,18 @@ Unittest classes:
     TestHBNBCommand_destroy_cmd
     TestHBNBCommand_update_cmd
     TestHBNBCommand_count_cmd
+    TestHBNBCommand_transaction_cmd
+    TestHBNBCommand_stats_cmd
+    TestHBNBCommand_location_cmd
+    TestHBNBCommand_search_cmd
 """
 import unittest
 from models.engine.file_storage import FileStorage
 from unittest.mock import patch
 from models import storage
 from console import HBNBCommand
+from models.place import Place
+from models.review import Review
 from io import StringIO
 import os
 import console
@@ -45,6 +51,11 @@ class TestHBNBCommand_prompt(unittest.TestCase):
     def test_prompt_string(self):
         self.assertEqual("(hbnb) ", HBNBCommand.prompt)
 
+    def test_commands_refresh_storage_first(self):
+        with patch.object(storage, "refresh") as refresh:
+            self.assertEqual("count State", self.typing.precmd("count State"))
+        refresh.assert_called_once_with()
+
 
 class TestHBNBCommand_help_messages(unittest.TestCase):
     """Unittests for HBNB command interpreter help messages."""
@@ -53,7 +64,8 @@ class TestHBNBCommand_help_messages(unittest.TestCase):
         expected_output = (
             "Documented commands (type help <topic>):\n"
             "========================================\n"
-            "EOF  all  count  create  destroy  help  quit  show  update")
+            "EOF  begin   count   destroy  near  rollback  show   update\n"
+            "all  commit  create  help     quit  search    stats  within")
         with patch("sys.stdout", new=StringIO()) as f:
             self.assertFalse(HBNBCommand().onecmd("help"))
             self.assertEqual(expected_output, f.getvalue().strip())
@@ -132,6 +144,18 @@ class TestHBNBCommand_exit_cmd(unittest.TestCase):
         with patch("sys.stdout", new=StringIO()):
             self.assertTrue(HBNBCommand().onecmd("EOF"))
 
+    def test_quit_rolls_back_open_transaction(self):
+        for command in ("quit", "EOF"):
+            with patch("sys.stdout", new=StringIO()) as f:
+                self.assertFalse(HBNBCommand().onecmd("begin"))
+                self.assertFalse(HBNBCommand().onecmd("create State"))
+                state_id = f.getvalue().strip()
+                self.assertTrue(HBNBCommand().onecmd(command))
+                self.assertIn("** uncommitted changes rolled back **",
+                              f.getvalue())
+            self.assertFalse(storage.in_transaction())
+            self.assertNotIn(f"State.{state_id}", storage.all())
+
 
 class TestHBNBCommand_create_cmd(unittest.TestCase):
     """Unittests to evaluate create command from the HBNB command
@@ -1105,6 +1129,16 @@ class TestHBNBCommand_update_cmd(unittest.TestCase):
         obj_dict = storage.all()[f"Place.{valid_id}"].__dict__
         self.assertEqual("attr_value", obj_dict["attr_name"])
 
+    def test_update_leaves_relationships_alone(self):
+        with patch("sys.stdout", new=StringIO()) as f:
+            HBNBCommand().onecmd("create Place")
+            valid_id = f.getvalue().strip()
+        cmd_str = f"update Place {valid_id} reviews 'attr_value'"
+        self.assertFalse(HBNBCommand().onecmd(cmd_str))
+        cmd_str = f'Place.update("{valid_id}", {{"reviews": 1}})'
+        self.assertFalse(HBNBCommand().onecmd(cmd_str))
+        self.assertEqual([], storage.get("Place", valid_id).reviews)
+
 
 class TestHBNBCommand_count_cmd(unittest.TestCase):
     """Unittests to evaluate count command of the HBNB command interpreter."""
@@ -1225,5 +1259,233 @@ class TestHBNBCommand_count_cmd(unittest.TestCase):
             self.assertEqual("2", f.getvalue().strip())
 
 
+class TestHBNBCommand_transaction_cmd(unittest.TestCase):
+    """Unittests to evaluate begin, commit and rollback commands of the HBNB
+    command interpreter."""
+
+    def setUp(self):
+        try:
+            os.rename("file.json", "temp")
+        except IOError:
+            pass
+        storage.reload()
+
+    def tearDown(self):
+        storage.rollback()
+        try:
+            os.remove("file.json")
+        except IOError:
+            pass
+        try:
+            os.rename("temp", "file.json")
+        except IOError:
+            pass
+
+    def test_commit_without_begin(self):
+        with patch("sys.stdout", new=StringIO()) as f:
+            self.assertFalse(HBNBCommand().onecmd("commit"))
+            self.assertEqual("** no transaction in progress **",
+                             f.getvalue().strip())
+
+    def test_rollback_without_begin(self):
+        with patch("sys.stdout", new=StringIO()) as f:
+            self.assertFalse(HBNBCommand().onecmd("rollback"))
+            self.assertEqual("** no transaction in progress **",
+                             f.getvalue().strip())
+
+    def test_begin_twice(self):
+        with patch("sys.stdout", new=StringIO()) as f:
+            self.assertFalse(HBNBCommand().onecmd("begin"))
+            self.assertFalse(HBNBCommand().onecmd("begin"))
+            self.assertEqual("** transaction already in progress **",
+                             f.getvalue().strip())
+
+    def test_create_is_saved_on_commit(self):
+        with patch("sys.stdout", new=StringIO()) as f:
+            self.assertFalse(HBNBCommand().onecmd("begin"))
+            self.assertFalse(HBNBCommand().onecmd("create State"))
+            state_id = f.getvalue().strip()
+        self.assertFalse(os.path.exists("file.json"))
+        with patch("sys.stdout", new=StringIO()) as f:
+            self.assertFalse(HBNBCommand().onecmd("commit"))
+        with open("file.json") as f:
+            self.assertIn(f"State.{state_id}", f.read())
+
+    def test_rollback_discards_changes(self):
+        with patch("sys.stdout", new=StringIO()) as f:
+            self.assertFalse(HBNBCommand().onecmd("create City"))
+            city_id = f.getvalue().strip()
+        with patch("sys.stdout", new=StringIO()) as f:
+            self.assertFalse(HBNBCommand().onecmd("begin"))
+            self.assertFalse(HBNBCommand().onecmd("create City"))
+            new_id = f.getvalue().strip()
+            self.assertFalse(HBNBCommand().onecmd(
+                f'City.update("{city_id}", "name", "Abuja")'))
+            self.assertFalse(HBNBCommand().onecmd("rollback"))
+        self.assertNotIn(f"City.{new_id}", storage.all())
+        self.assertNotIn("name", storage.all()[f"City.{city_id}"].__dict__)
+
+
+class TestHBNBCommand_stats_cmd(unittest.TestCase):
+    """Unittests to evaluate stats command of the HBNB command interpreter."""
+
+    def setUp(self):
+        try:
+            os.rename("file.json", "temp")
+        except IOError:
+            pass
+        FileStorage._FileStorage__objects = {}
+        for city_id, price in (("a", 100), ("a", 50), ("b", 30)):
+            place = Place()
+            place.city_id = city_id
+            place.price_by_night = price
+        storage.save()
+
+    def tearDown(self):
+        try:
+            os.remove("file.json")
+        except IOError:
+            pass
+        try:
+            os.rename("temp", "file.json")
+        except IOError:
+            pass
+
+    def test_stats_errors(self):
+        for line, expected in (
+                ("stats", "** class name missing **"),
+                ("stats MyModel price", "** class doesn't exist **"),
+                ("stats Place", "** attribute name missing **"),
+                ("stats Place price_by_night median",
+                 "** unknown operation **")):
+            with patch("sys.stdout", new=StringIO()) as f:
+                self.assertFalse(HBNBCommand().onecmd(line))
+                self.assertEqual(expected, f.getvalue().strip())
+
+    def test_stats_mean(self):
+        with patch("sys.stdout", new=StringIO()) as f:
+            self.assertFalse(HBNBCommand().onecmd(
+                "stats Place price_by_night"))
+            self.assertEqual("60.0", f.getvalue().strip())
+
+    def test_stats_grouped(self):
+        with patch("sys.stdout", new=StringIO()) as f:
+            self.assertFalse(HBNBCommand().onecmd(
+                "stats Place price_by_night sum city_id"))
+            self.assertEqual("{'a': 150.0, 'b': 30.0}", f.getvalue().strip())
+
+    def test_stats_parenthesis_fmt(self):
+        with patch("sys.stdout", new=StringIO()) as f:
+            self.assertFalse(HBNBCommand().onecmd(
+                "Place.stats(price_by_night, max)"))
+            self.assertEqual("100.0", f.getvalue().strip())
+
+
+class TestHBNBCommand_location_cmd(unittest.TestCase):
+    """Unittests to evaluate near and within commands of the HBNB command
+    interpreter."""
+
+    def setUp(self):
+        try:
+            os.rename("file.json", "temp")
+        except IOError:
+            pass
+        FileStorage._FileStorage__objects = {}
+        self.places = []
+        for lat, lon in ((6.45, 3.39), (9.07, 7.49)):
+            place = Place()
+            place.latitude = lat
+            place.longitude = lon
+            self.places.append(place)
+        storage.save()
+
+    def tearDown(self):
+        try:
+            os.remove("file.json")
+        except IOError:
+            pass
+        try:
+            os.rename("temp", "file.json")
+        except IOError:
+            pass
+
+    def test_location_errors(self):
+        for line, expected in (
+                ("near", "** class name missing **"),
+                ("near MyModel 1 2", "** class doesn't exist **"),
+                ("near Place 6.5", "** coordinates missing **"),
+                ("near Place north 3", "** invalid coordinates **"),
+                ("near City 6.5 3.3", "** City has no location index **"),
+                ("within Place 6 3 7", "** coordinates missing **"),
+                ("within Place 6 3 7 east", "** invalid coordinates **")):
+            with patch("sys.stdout", new=StringIO()) as f:
+                self.assertFalse(HBNBCommand().onecmd(line))
+                self.assertEqual(expected, f.getvalue().strip())
+
+    def test_near(self):
+        with patch("sys.stdout", new=StringIO()) as f:
+            self.assertFalse(HBNBCommand().onecmd("Place.near(6.5, 3.3, 1)"))
+            output = f.getvalue()
+        self.assertIn(self.places[0].id, output)
+        self.assertNotIn(self.places[1].id, output)
+
+    def test_within(self):
+        with patch("sys.stdout", new=StringIO()) as f:
+            self.assertFalse(HBNBCommand().onecmd("within Place 8 7 10 8"))
+            output = f.getvalue()
+        self.assertNotIn(self.places[0].id, output)
+        self.assertIn(self.places[1].id, output)
+
+
+class TestHBNBCommand_search_cmd(unittest.TestCase):
+    """Unittests to evaluate search command of the HBNB command
+    interpreter."""
+
+    def setUp(self):
+        try:
+            os.rename("file.json", "temp")
+        except IOError:
+            pass
+        FileStorage._FileStorage__objects = {}
+        self.reviews = []
+        for text in ("Great loft, loft view", "Loft was clean"):
+            review = Review()
+            review.text = text
+            self.reviews.append(review)
+        storage.save()
+
+    def tearDown(self):
+        for path in ("file.json", "file.json.Review.idx"):
+            try:
+                os.remove(path)
+            except IOError:
+                pass
+        try:
+            os.rename("temp", "file.json")
+        except IOError:
+            pass
+
+    def test_search_errors(self):
+        for line, expected in (
+                ("search", "** class name missing **"),
+                ("search MyModel loft", "** class doesn't exist **"),
+                ("search Review", "** search text missing **"),
+                ("search City lagos", "** City has no text index **"),
+                ("search Review castle", "** no instances found **")):
+            with patch("sys.stdout", new=StringIO()) as f:
+                self.assertFalse(HBNBCommand().onecmd(line))
+                self.assertEqual(expected, f.getvalue().strip())
+
+    def test_search(self):
+        with patch("sys.stdout", new=StringIO()) as f:
+            self.assertFalse(HBNBCommand().onecmd("search Review loft"))
+            self.assertEqual([review.id for review in self.reviews],
+                             f.getvalue().split())
+        with patch("sys.stdout", new=StringIO()) as f:
+            self.assertFalse(HBNBCommand().onecmd(
+                'Review.search("clean loft")'))
+            self.assertEqual(self.reviews[1].id, f.getvalue().split()[0])
+
+
 if __name__ == "__main__":
     unittest.main()
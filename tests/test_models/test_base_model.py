@@ -32,6 +32,22 @@ class TestBaseModelInstantiation(unittest.TestCase):
         self.assertEqual(obj_1.created_at, curr_datetime)
         self.assertEqual(obj_1.updated_at, curr_datetime)
 
+    def test_kwargs_instantiation_without_microseconds(self):
+        curr_datetime = datetime.today().replace(microsecond=0)
+        datetime_iso = curr_datetime.isoformat()
+        obj_1 = BaseModel(id="1234", created_at=datetime_iso,
+                          updated_at=datetime_iso)
+        self.assertEqual(obj_1.created_at, curr_datetime)
+        self.assertEqual(obj_1.updated_at, curr_datetime)
+
+    def test_kwargs_instantiation_with_distinct_timestamps(self):
+        obj_1 = BaseModel(id="1234", created_at="2017-09-28T21:03:54.052298",
+                          updated_at="2017-09-28T21:05:54.119427")
+        self.assertEqual(datetime(2017, 9, 28, 21, 3, 54, 52298),
+                         obj_1.created_at)
+        self.assertEqual(datetime(2017, 9, 28, 21, 5, 54, 119427),
+                         obj_1.updated_at)
+
     def test_instantiation_with_None_kwargs(self):
         with self.assertRaises(TypeError):
             BaseModel(id=None, created_at=None, updated_at=None)
@@ -0,0 +1,117 @@
+#!/usr/bin/python3
+"""Defines unittests for models/compact.py.
+
+Classes:
+    TestCompactModel
+    TestCompactState
+"""
+import gc
+import unittest
+from datetime import datetime
+from models.compact import compact, get_state, set_state
+from models.base_model import BaseModel
+from models.place import Place
+from models.review import Review
+
+
+def dicts(obj):
+    """Returns the dictionaries obj refers to, without creating any."""
+    return ([ref for ref in gc.get_referents(obj) if type(ref) is dict])
+
+
+RECORD = {"id": "1", "__class__": "Place",
+          "created_at": "2017-09-28T21:03:54.052298",
+          "updated_at": "2017-09-28T21:03:54.052298", "name": "Loft"}
+
+
+class TestCompactModel(unittest.TestCase):
+    """Unittests to evaluate the compact model variants."""
+
+    def test_variant_is_a_subclass_with_the_same_name(self):
+        variant = compact(Place)
+        self.assertTrue(issubclass(variant, Place))
+        self.assertEqual("Place", variant.__name__)
+        self.assertIs(variant, compact(Place))
+
+    def test_loaded_instance_has_no_dict(self):
+        obj = compact(Place)(**RECORD)
+        self.assertEqual({}, obj.__dict__)
+        self.assertEqual("Loft", obj.name)
+        self.assertEqual(datetime(2017, 9, 28, 21, 3, 54, 52298),
+                         obj.created_at)
+        self.assertIs(obj.created_at, obj.updated_at)
+
+    def test_unset_attributes_fall_back_to_defaults(self):
+        obj = compact(Place)(**RECORD)
+        self.assertEqual("", obj.city_id)
+        self.assertEqual(0, obj.max_guest)
+        self.assertEqual([], obj.amenity_ids)
+        with self.assertRaises(AttributeError):
+            obj.nope
+        self.assertFalse(hasattr(obj, "nope"))
+
+    def test_dynamic_attributes(self):
+        obj = compact(Place)(**RECORD)
+        obj.max_guest = 4
+        obj.pool = "yes"
+        self.assertEqual(4, obj.max_guest)
+        self.assertEqual([{"pool": "yes"}], dicts(obj))
+        self.assertEqual("yes", compact(Place)(**obj.to_dict()).pool)
+        del obj.pool
+        self.assertFalse(hasattr(obj, "pool"))
+
+    def test_no_dict_after_use(self):
+        obj = compact(Place)(**RECORD)
+        obj.to_dict()
+        str(obj)
+        obj.name = "Cabin"
+        self.assertEqual([], dicts(obj))
+
+    def test_to_dict_matches_regular_model(self):
+        record = dict(RECORD, extra=3)
+        self.assertEqual(Place(**record).to_dict(),
+                         compact(Place)(**record).to_dict())
+        self.assertEqual(record, compact(Place)(**record).to_dict())
+
+    def test_str(self):
+        obj = compact(Place)(**RECORD)
+        self.assertEqual(str(Place(**RECORD)), str(obj))
+
+    def test_new_instance(self):
+        obj = compact(BaseModel)()
+        self.assertEqual(str, type(obj.id))
+        self.assertEqual(datetime, type(obj.created_at))
+        self.assertEqual({}, obj.__dict__)
+
+    def test_foreign_keys_are_interned(self):
+        first = compact(Review)(**dict(RECORD, place_id="".join("ab")))
+        second = compact(Review)(**dict(RECORD, place_id="".join("ab")))
+        self.assertIs(first.place_id, second.place_id)
+
+
+class TestCompactState(unittest.TestCase):
+    """Unittests to evaluate get_state and set_state."""
+
+    def test_round_trip(self):
+        obj = compact(Place)(**RECORD)
+        obj.pool = "yes"
+        state = get_state(obj)
+        obj.name = "Cabin"
+        obj.max_guest = 2
+        del obj.pool
+        set_state(obj, state)
+        self.assertEqual("Loft", obj.name)
+        self.assertEqual(0, obj.max_guest)
+        self.assertEqual("yes", obj.pool)
+
+    def test_regular_model(self):
+        obj = Place(**RECORD)
+        state = get_state(obj)
+        self.assertEqual(obj.__dict__, state)
+        obj.name = "Cabin"
+        set_state(obj, state)
+        self.assertEqual("Loft", obj.name)
+
+
+if __name__ == "__main__":
+    unittest.main()
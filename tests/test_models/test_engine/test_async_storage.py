@@ -0,0 +1,187 @@
+#!/usr/bin/python3
+"""Defines unittests for models/engine/async_storage.py.
+
+Classes:
+    TestAsyncFileStorage
+"""
+import asyncio
+import json
+import os
+import tempfile
+import threading
+import unittest
+from unittest import mock
+from models.engine.async_storage import AsyncFileStorage
+from models.engine.file_storage import FileStorage
+from models.city import City
+from models.state import State
+
+
+class TestAsyncFileStorage(unittest.IsolatedAsyncioTestCase):
+    """Unittests to evaluate the AsyncFileStorage class."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "file.json")
+        self.storage = AsyncFileStorage(file_path=self.path,
+                                        max_staleness=60)
+        self.storage.storage.reload()
+
+    def tearDown(self):
+        self.storage.storage.sync()
+        self.tmp.cleanup()
+        FileStorage._FileStorage__objects = {}
+
+    def load(self):
+        with open(self.path) as f:
+            return (json.load(f))
+
+    def test_needs_write_behind(self):
+        with self.assertRaises(ValueError):
+            AsyncFileStorage(FileStorage(file_path=self.path))
+        with self.assertRaises(ValueError):
+            AsyncFileStorage(self.storage.storage, wal=True)
+
+    async def test_lookups(self):
+        state = State()
+        state.name = "Lagos"
+        city = City()
+        city.state_id = state.id
+        self.assertIs(state, await self.storage.get(State, state.id))
+        self.assertEqual({f"City.{city.id}"},
+                         set(await self.storage.all(City)))
+        self.assertEqual(2, await self.storage.count())
+        self.assertEqual({f"City.{city.id}"}, set(
+            await self.storage.find(City, state_id=state.id)))
+        await self.storage.delete(city)
+        self.assertIsNone(await self.storage.get(City, city.id))
+
+    async def test_save_writes_to_disk(self):
+        state = State()
+        await self.storage.save()
+        self.assertIn(f"State.{state.id}", self.load())
+
+    async def test_concurrent_saves_coalesce(self):
+        states = [State() for _ in range(100)]
+
+        async def rename(state):
+            state.name = "Lagos"
+            await self.storage.save()
+
+        await asyncio.gather(*(rename(state) for state in states))
+        self.assertLessEqual(self.storage.writes, 3)
+        self.assertEqual(100, len(self.load()))
+        self.assertEqual("Lagos", self.load()[f"State.{states[7].id}"][
+            "name"])
+
+    async def test_save_does_not_block_the_loop(self):
+        started = threading.Event()
+        release = threading.Event()
+        sync = self.storage.storage.sync
+
+        def slow_sync():
+            started.set()
+            release.wait(5)
+            sync()
+
+        State()
+        with mock.patch.object(self.storage.storage, "sync", slow_sync):
+            saving = asyncio.ensure_future(self.storage.save())
+            await asyncio.get_running_loop().run_in_executor(
+                None, started.wait, 5)
+            self.assertEqual(1, await self.storage.count())
+            self.assertFalse(saving.done())
+            release.set()
+            await saving
+        self.assertEqual(1, len(self.load()))
+
+    async def test_save_errors_reach_every_waiter(self):
+        city = City()
+        city.name = object()
+        results = await asyncio.gather(self.storage.save(),
+                                       self.storage.save(),
+                                       return_exceptions=True)
+        self.assertEqual([TypeError, TypeError],
+                         [type(result) for result in results])
+        city.name = "Lagos"
+        await self.storage.save()
+        self.assertEqual("Lagos", self.load()[f"City.{city.id}"]["name"])
+
+    async def test_reload(self):
+        state = State()
+        await self.storage.save()
+        FileStorage._FileStorage__objects = {}
+        reloading = asyncio.ensure_future(self.storage.reload())
+        await asyncio.sleep(0)
+        self.assertIsNotNone(await self.storage.get(State, state.id))
+        await reloading
+        self.assertEqual(1, await self.storage.count(State))
+
+    async def test_reload_decodes_in_the_executor(self):
+        states = [State() for _ in range(10)]
+        await self.storage.save()
+        await self.storage.reload()
+        self.assertEqual({}, FileStorage._FileStorage__raw)
+        self.assertEqual(10, await self.storage.count(State))
+        self.assertEqual(states[3].id,
+                         (await self.storage.get(State, states[3].id)).id)
+
+    async def test_selective_reload_loads_the_rest_in_the_executor(self):
+        State()
+        City()
+        await self.storage.save()
+        await self.storage.reload(classes=[State])
+        threads = []
+        read = FileStorage._FileStorage__read_files
+
+        def record(self, *args, **kwargs):
+            threads.append(threading.current_thread())
+            return (read(self, *args, **kwargs))
+
+        with mock.patch.object(FileStorage, "_FileStorage__read_files",
+                               record):
+            self.assertEqual(2, await self.storage.count())
+            self.assertEqual(1, len(await self.storage.all(City)))
+        self.assertEqual(1, len(threads))
+        self.assertIsNot(threading.current_thread(), threads[0])
+
+    async def test_first_call_decodes_in_the_executor(self):
+        for _ in range(10):
+            State()
+        await self.storage.save()
+        self.storage.storage.reload()
+        storage = AsyncFileStorage(self.storage.storage)
+        threads = []
+        decode = FileStorage.all
+
+        def all(self, cls=None):
+            threads.append(threading.current_thread())
+            return (decode(self, cls))
+
+        with mock.patch.object(FileStorage, "all", all):
+            self.assertEqual(10, await storage.count(State))
+        self.assertNotIn(threading.current_thread(), threads)
+        self.assertEqual({}, FileStorage._FileStorage__raw)
+
+    async def test_first_save_reads_the_files_off_the_loop(self):
+        State()
+        await self.storage.save()
+        await self.storage.reload()
+        threads = []
+        read_disk = FileStorage._FileStorage__read_disk
+
+        def record(self):
+            threads.append(threading.current_thread())
+            return (read_disk(self))
+
+        with mock.patch.object(FileStorage, "_FileStorage__read_disk",
+                               record):
+            State()
+            await self.storage.save()
+        self.assertEqual(1, len(threads))
+        self.assertIsNot(threading.current_thread(), threads[0])
+        self.assertEqual(2, len(self.load()))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,100 @@
+#!/usr/bin/python3
+"""Defines unittests for models/engine/atomic.py.
+
+Classes:
+    TestAtomicWriter
+    TestDoubleBufferedWriter
+"""
+import os
+import tempfile
+import unittest
+from unittest import mock
+from models.engine.atomic import AtomicWriter, DoubleBufferedWriter
+
+
+class TestAtomicWriter(unittest.TestCase):
+    """Unittests to evaluate the AtomicWriter class."""
+    writer_class = AtomicWriter
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "file.json")
+        self.writer = self.writer_class()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def read(self):
+        with open(self.path, "rb") as f:
+            return (f.read())
+
+    def test_write_replaces_content(self):
+        self.writer.write(self.path, b"first")
+        self.writer.write(self.path, b"second")
+        self.writer.wait()
+        self.assertEqual(b"second", self.read())
+        self.assertEqual(["file.json"], os.listdir(self.tmp.name))
+
+    def test_crash_before_rename_keeps_old_content(self):
+        self.writer.write(self.path, b"old")
+        self.writer.wait()
+        with mock.patch("os.replace", side_effect=OSError("crash")):
+            with self.assertRaises(OSError):
+                self.writer.write(self.path, b"new")
+                self.writer.wait()
+        self.assertEqual(b"old", self.read())
+        self.assertEqual(["file.json"], os.listdir(self.tmp.name))
+
+    def test_interleaved_writers_publish_whole_files(self):
+        first = self.writer._write_tmp(self.path, b'{"A": 1}')
+        second = self.writer._write_tmp(self.path, b'{"B": 2}')
+        self.assertNotEqual(first, second)
+        self.writer._commit(first, self.path)
+        self.assertEqual(b'{"A": 1}', self.read())
+        self.writer._commit(second, self.path)
+        self.assertEqual(b'{"B": 2}', self.read())
+
+    def test_failed_write_removes_its_temporary_file(self):
+        with mock.patch("os.fdopen", side_effect=OSError("disk full")):
+            with self.assertRaises(OSError):
+                self.writer.write(self.path, b"data")
+        self.assertEqual([], os.listdir(self.tmp.name))
+
+    def test_keeps_permissions(self):
+        self.writer.write(self.path, b"old")
+        self.writer.wait()
+        os.chmod(self.path, 0o640)
+        self.writer.write(self.path, b"new")
+        self.writer.wait()
+        self.assertEqual(0o640, os.stat(self.path).st_mode & 0o777)
+
+    def test_fsync_is_called(self):
+        with mock.patch("os.fsync") as fsync:
+            self.writer.write(self.path, b"data")
+            self.writer.wait()
+        self.assertTrue(fsync.called)
+
+    def test_no_fsync(self):
+        self.writer = self.writer_class(fsync=False)
+        with mock.patch("os.fsync") as fsync:
+            self.writer.write(self.path, b"data")
+            self.writer.wait()
+        self.assertFalse(fsync.called)
+        self.assertEqual(b"data", self.read())
+
+
+class TestDoubleBufferedWriter(TestAtomicWriter):
+    """Unittests to evaluate the DoubleBufferedWriter class."""
+    writer_class = DoubleBufferedWriter
+
+    def test_consecutive_writes(self):
+        self.writer.write(self.path, b"one")
+        self.writer.write(self.path, b"two")
+        self.writer.write(self.path, b"three")
+        self.writer.wait()
+        self.assertEqual(b"three", self.read())
+        self.assertEqual(["file.json"], os.listdir(self.tmp.name))
+
+
+if __name__ == "__main__":
+    unittest.main()
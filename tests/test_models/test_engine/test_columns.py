@@ -0,0 +1,106 @@
+#!/usr/bin/python3
+"""Defines unittests for models/engine/columns.py.
+
+Classes:
+    TestColumnTablePython
+    TestColumnTableNumpy
+"""
+import unittest
+from unittest import mock
+from models.engine import columns
+from models.engine.columns import ColumnTable
+
+
+class Row:
+    """Stand-in instance holding the given attributes."""
+
+    def __init__(self, **attrs):
+        self.__dict__.update(attrs)
+
+
+ROWS = {"P.1": Row(city="a", price=100, lat=6.5),
+        "P.2": Row(city="a", price=50, lat=7.5),
+        "P.3": Row(city="b", price=30, lat=6.0),
+        "P.4": Row(city="b", price="n/a", lat=9.0),
+        "P.5": Row(price=10, lat=None)}
+
+
+class ColumnTableTests:
+    """Checks run with and without NumPy."""
+
+    def setUp(self):
+        self.table = ColumnTable()
+        for key, obj in ROWS.items():
+            self.table.add(key, obj)
+        self.table.add_columns(ROWS, ("price", "lat"), ("city",))
+
+    def test_aggregates(self):
+        self.assertEqual(4, self.table.aggregate("price", "count"))
+        self.assertEqual(190, self.table.aggregate("price", "sum"))
+        self.assertEqual(47.5, self.table.aggregate("price"))
+        self.assertEqual(10, self.table.aggregate("price", "min"))
+        self.assertEqual(100, self.table.aggregate("price", "max"))
+
+    def test_group_by(self):
+        self.assertEqual({"a": 75.0, "b": 30.0, None: 10.0},
+                         self.table.aggregate("price", by="city"))
+        self.assertEqual({"a": 2, "b": 1, None: 1},
+                         self.table.aggregate("price", "count", by="city"))
+        self.assertEqual({"a": 50.0, "b": 30.0, None: 10.0},
+                         self.table.aggregate("price", "min", by="city"))
+
+    def test_ranges(self):
+        self.assertEqual(["P.1", "P.3"],
+                         sorted(self.table.select(lat=(6, 7))))
+        self.assertEqual(["P.1", "P.2"], sorted(self.table.select(
+            lat=(6.2, None), price=(None, 100))))
+        self.assertEqual(130, self.table.aggregate("price", "sum",
+                                                   lat=(None, 7)))
+        self.assertEqual({"a": 100.0}, self.table.aggregate(
+            "price", "max", by="city", lat=(6.2, 7)))
+
+    def test_empty_results(self):
+        self.assertEqual(0, self.table.aggregate("price", "count",
+                                                 lat=(100, None)))
+        self.assertIsNone(self.table.aggregate("price", lat=(100, None)))
+        self.assertEqual({}, self.table.aggregate("price", by="city",
+                                                  lat=(100, None)))
+        table = ColumnTable()
+        table.add_columns({}, ("price",), ("city",))
+        self.assertEqual(0, table.aggregate("price", "sum"))
+        self.assertEqual({}, table.aggregate("price", by="city"))
+        self.assertEqual([], table.select(price=(1, 2)))
+
+    def test_updates_and_removals(self):
+        self.table.add("P.1", Row(city="b", price=0, lat=0.0))
+        self.table.remove("P.2")
+        self.table.remove("P.2")
+        self.table.add("P.6", Row(city="c", price=5, lat=1.0))
+        self.assertEqual(5, len(self.table))
+        self.assertEqual({"b": 30.0, None: 10.0, "c": 5.0},
+                         self.table.aggregate("price", "sum", by="city"))
+        self.assertEqual(["P.1", "P.6"],
+                         sorted(self.table.select(lat=(None, 1))))
+
+    def test_unknown_operation(self):
+        with self.assertRaises(ValueError):
+            self.table.aggregate("price", "median")
+
+
+class TestColumnTablePython(ColumnTableTests, unittest.TestCase):
+    """Unittests to evaluate ColumnTable without NumPy."""
+
+    def setUp(self):
+        patcher = mock.patch.object(columns, "numpy", None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        super().setUp()
+
+
+@unittest.skipIf(columns.numpy is None, "numpy is not installed")
+class TestColumnTableNumpy(ColumnTableTests, unittest.TestCase):
+    """Unittests to evaluate ColumnTable vectorized with NumPy."""
+
+
+if __name__ == "__main__":
+    unittest.main()
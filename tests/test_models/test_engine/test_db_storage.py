@@ -0,0 +1,170 @@
+#!/usr/bin/python3
+"""Defines unittests for models/engine/db_storage.py.
+
+Classes:
+    TestDBStorage
+    TestDBStorageTransactions
+"""
+import os
+import sqlite3
+import tempfile
+import unittest
+from unittest.mock import patch
+from models.engine.db_storage import DBStorage
+from models.city import City
+from models.place import Place
+from models.state import State
+from models.user import User
+
+
+class DBStorageTestCase(unittest.TestCase):
+    """Runs every test against a fresh database set as models.storage."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "hbnb.db")
+        self.storage = DBStorage(db_path=self.path)
+        patcher = patch("models.storage", self.storage)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.storage.close()
+        self.tmp.cleanup()
+
+    def reopen(self):
+        self.storage.close()
+        self.storage = DBStorage(db_path=self.path)
+        return (self.storage)
+
+
+class TestDBStorage(DBStorageTestCase):
+    """Unittests to evaluate the DBStorage class."""
+
+    def test_wal_mode(self):
+        conn = sqlite3.connect(self.path)
+        mode = conn.execute("PRAGMA journal_mode").fetchone()[0]
+        conn.close()
+        self.assertEqual("wal", mode)
+
+    def test_save_and_get(self):
+        user = User()
+        user.email = "ada@mail.com"
+        user.save()
+        loaded = self.reopen().get(User, user.id)
+        self.assertIsInstance(loaded, User)
+        self.assertEqual(user.to_dict(), loaded.to_dict())
+        self.assertIs(loaded, self.storage.get("User", user.id))
+        self.assertIsNone(self.storage.get(User, "missing"))
+
+    def test_all_and_count(self):
+        places = [Place(), Place()]
+        City()
+        self.storage.save()
+        storage = self.reopen()
+        self.assertEqual({"Place." + place.id for place in places},
+                         set(storage.all(Place)))
+        self.assertEqual(2, storage.count(Place))
+        self.assertEqual(3, storage.count())
+        self.assertEqual(3, len(storage.all()))
+
+    def test_unsaved_changes_are_visible_to_queries(self):
+        city = City()
+        self.assertEqual(1, self.storage.count(City))
+        self.storage.delete(city)
+        self.assertEqual(0, self.storage.count("City"))
+        self.assertIsNone(self.storage.get(City, city.id))
+
+    def test_delete(self):
+        state = State()
+        state.save()
+        self.storage.delete(state)
+        self.storage.save()
+        self.assertIsNone(self.reopen().get(State, state.id))
+
+    def test_attribute_changes_are_saved(self):
+        state = State()
+        state.save()
+        state.name = "Lagos"
+        self.assertEqual(1, self.storage.dirty_count())
+        self.storage.save()
+        self.assertEqual("Lagos", self.reopen().get(State, state.id).name)
+
+    def test_find(self):
+        cities = [City(), City(), City()]
+        for city, state_id in zip(cities, ("s1", "s1", "s2")):
+            city.state_id = state_id
+        self.storage.save()
+        storage = self.reopen()
+        self.assertEqual({"City." + city.id for city in cities[:2]},
+                         set(storage.find(City, state_id="s1")))
+        self.assertEqual({}, storage.find(City, state_id=""))
+
+    def test_related(self):
+        places = [Place(), Place()]
+        places[0].amenity_ids = ["a", "b"]
+        places[1].amenity_ids = ["b"]
+        places[1].city_id = "c1"
+        self.storage.save()
+        storage = self.reopen()
+        self.assertEqual({"Place." + places[0].id},
+                         set(storage.related(Place, "amenity_ids", "a")))
+        self.assertEqual(2, len(storage.related(Place, "amenity_ids", "b")))
+        self.assertEqual({"Place." + places[1].id},
+                         set(storage.related(Place, "city_id", "c1")))
+
+    def test_aggregate_and_select(self):
+        places = [Place(), Place(), Place()]
+        for place, city_id, price in zip(places, "aab", (100, 50, 30)):
+            place.city_id = city_id
+            place.price_by_night = price
+        self.storage.save()
+        storage = self.reopen()
+        self.assertEqual({"a": 150.0, "b": 30.0}, storage.aggregate(
+            Place, "price_by_night", "sum", by="city_id"))
+        self.assertEqual({"Place." + places[0].id}, set(storage.select(
+            Place, price_by_night=(60, None))))
+
+    def test_find_rejects_bad_attribute_names(self):
+        with self.assertRaises(ValueError):
+            self.storage.find(City, **{"x') OR 1=1 --": 1})
+
+    def test_reload_discards_unsaved_changes(self):
+        User()
+        self.storage.reload()
+        self.assertEqual(0, self.storage.count(User))
+
+    def test_sync_after_save(self):
+        state = State()
+        state.save()
+        self.storage.sync()
+        self.assertIsNotNone(self.reopen().get(State, state.id))
+
+
+class TestDBStorageTransactions(DBStorageTestCase):
+    """Unittests to evaluate DBStorage transactions."""
+
+    def test_batch_commits_once(self):
+        with self.storage.batch():
+            place = Place()
+            place.save()
+            self.assertTrue(self.storage.in_transaction())
+        self.assertIsNotNone(self.reopen().get(Place, place.id))
+
+    def test_rollback_restores_instances(self):
+        kept = State()
+        kept.name = "Lagos"
+        kept.save()
+        with self.assertRaises(ValueError):
+            with self.storage.batch():
+                added = State()
+                kept.name = "Kano"
+                self.storage.delete(kept)
+                raise ValueError()
+        self.assertIsNone(self.storage.get(State, added.id))
+        self.assertIs(kept, self.storage.get(State, kept.id))
+        self.assertEqual("Lagos", kept.name)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -4,11 +4,43 @@
 Classes:
     TestFileStorageInstantiation
     TestFileStorageMethods
+    TestFileStorageWAL
+    TestFileStorageDirtyTracking
+    TestFileStorageBatch
+    TestFileStorageFind
+    TestFileStorageRelations
+    TestFileStorageLazyReload
+    TestFileStorageSerializers
+    TestFileStorageAtomicWrites
+    TestFileStorageWriteBehind
+    TestFileStorageStreamingReload
+    TestFileStorageSharded
+    TestFileStorageSelectiveReload
+    TestFileStorageCompactModels
+    TestFileStorageColumns
+    TestFileStorageSpatial
+    TestFileStorageSearch
+    TestFileStorageShared
+    TestFileStorageThreadSafe
+    TestFileStorageSnapshotViews
 """
 import os
+import json
+import pickle
+import subprocess
+import sys
+import time
+import tempfile
+import threading
 import models
 import unittest
+from unittest import mock
+from models.engine.atomic import AtomicWriter
+from models.engine.indexes import TextIndex
+from models.engine.serializers import BinarySerializer
 from models.engine.file_storage import FileStorage
+from models.engine.snapshot_storage import SnapshotStorage
+from models.engine.views import StorageView
 from models.base_model import BaseModel
 from models.amenity import Amenity
 from models.review import Review
@@ -69,7 +101,42 @@ class TestFileStorageMethods(unittest.TestCase):
 
     def test_all_with_invalid_argument(self):
         with self.assertRaises(TypeError):
-            models.storage.all(None)
+            models.storage.all(User, None)
+
+    def test_all_with_none_returns_every_instance(self):
+        self.assertIs(models.storage.all(), models.storage.all(None))
+
+    def test_all_with_class_returns_only_its_instances(self):
+        place = Place()
+        user = User()
+        self.assertEqual({"Place." + place.id: place},
+                         models.storage.all(Place))
+        self.assertEqual({"User." + user.id: user},
+                         models.storage.all("User"))
+        self.assertEqual({}, models.storage.all("PlaceX"))
+
+    def test_count(self):
+        Place()
+        Place()
+        City()
+        self.assertEqual(2, models.storage.count(Place))
+        self.assertEqual(1, models.storage.count("City"))
+        self.assertEqual(0, models.storage.count(Review))
+        self.assertEqual(3, models.storage.count())
+
+    def test_count_after_delete(self):
+        city = City()
+        models.storage.delete(city)
+        self.assertEqual(0, models.storage.count(City))
+
+    def test_class_index_follows_replaced_objects(self):
+        City()
+        FileStorage._FileStorage__objects = {}
+        self.assertEqual(0, models.storage.count(City))
+        models.storage.all()["City.1"] = City(
+            id="1", created_at="2017-09-28T21:03:54.052298",
+            updated_at="2017-09-28T21:03:54.052302")
+        self.assertEqual(1, models.storage.count(City))
 
     def test_new_adds_instances_to_storage(self):
         user = User()
@@ -146,5 +213,1578 @@ class TestFileStorageMethods(unittest.TestCase):
             models.storage.reload(None)
 
 
+class TestFileStorageWAL(unittest.TestCase):
+    """Unittests to evaluate the append-only log mode of FileStorage."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "file.json")
+        self.storage = FileStorage(file_path=self.path, wal=True)
+        self.storage.reload()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+        FileStorage._FileStorage__objects = {}
+
+    def read_log(self):
+        with open(self.storage.log_path) as f:
+            return [json.loads(line) for line in f]
+
+    def test_save_appends_only_changed_objects(self):
+        user = User()
+        self.storage.save()
+        state = State()
+        self.storage.save()
+        entries = self.read_log()
+        self.assertEqual(["User." + user.id, "State." + state.id],
+                         [entry["key"] for entry in entries])
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_delete_is_logged(self):
+        city = City()
+        self.storage.save()
+        self.storage.delete(city)
+        self.storage.save()
+        self.assertEqual("delete", self.read_log()[-1]["op"])
+        self.assertNotIn("City." + city.id, self.storage.all())
+
+    def test_saving_a_deleted_object_does_not_restore_it(self):
+        city = City()
+        self.storage.save()
+        self.storage.delete(city)
+        self.storage.save()
+        with mock.patch("models.storage", self.storage):
+            city.save()
+        self.assertEqual(0, self.storage.count(City))
+        self.storage.reload()
+        self.assertEqual(0, self.storage.count(City))
+
+    def test_reload_replays_snapshot_and_log(self):
+        place = Place()
+        review = Review()
+        self.storage.compact()
+        place.name = "Loft"
+        self.storage.new(place)
+        self.storage.delete(review)
+        self.storage.save()
+        self.storage.reload()
+        objs = self.storage.all()
+        self.assertEqual("Loft", objs["Place." + place.id].name)
+        self.assertIsInstance(objs["Place." + place.id], Place)
+        self.assertNotIn("Review." + review.id, objs)
+
+    def test_compaction_truncates_log(self):
+        self.storage.compact_every = 3
+        for _ in range(3):
+            Amenity()
+        self.storage.save()
+        self.assertEqual(0, os.path.getsize(self.storage.log_path))
+        with open(self.path) as f:
+            self.assertEqual(3, len(json.load(f)))
+
+    def test_compaction_after_reload_keeps_every_record(self):
+        self.storage.compact_every = 3
+        for _ in range(5):
+            State()
+        self.storage.save()
+        self.storage.reload()
+        for _ in range(3):
+            State()
+            self.storage.save()
+        self.assertEqual(0, os.path.getsize(self.storage.log_path))
+        with open(self.path) as f:
+            self.assertEqual(8, len(json.load(f)))
+
+    def test_reload_ignores_torn_log_tail(self):
+        user = User()
+        self.storage.save()
+        with open(self.storage.log_path, "a") as f:
+            f.write('{"op": "put", "key": "User.x", "ob')
+        self.storage.reload()
+        self.assertEqual(["User." + user.id], list(self.storage.all()))
+        self.assertEqual(1, len(self.read_log()))
+
+
+class TestFileStorageDirtyTracking(unittest.TestCase):
+    """Unittests to evaluate dirty tracking and incremental flushes."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "file.json")
+        self.storage = FileStorage(file_path=self.path)
+        self.storage.reload()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+        FileStorage._FileStorage__objects = {}
+
+    def test_new_objects_are_dirty(self):
+        User()
+        State()
+        self.assertEqual(2, self.storage.dirty_count())
+        self.storage.flush()
+        self.assertEqual(0, self.storage.dirty_count())
+
+    def test_attribute_assignment_marks_dirty(self):
+        city = City()
+        self.storage.flush()
+        city.name = "Lagos"
+        self.assertEqual("modified",
+                         FileStorage._FileStorage__dirty["City." + city.id])
+
+    def test_delete_marks_destroyed(self):
+        city = City()
+        self.storage.flush()
+        self.storage.delete(city)
+        self.assertEqual("destroyed",
+                         FileStorage._FileStorage__dirty["City." + city.id])
+
+    def test_delete_of_unflushed_object_is_clean(self):
+        self.storage.delete(Amenity())
+        self.assertEqual(0, self.storage.dirty_count())
+
+    def test_flush_only_reencodes_dirty_objects(self):
+        clean = User()
+        changed = User()
+        self.storage.flush()
+        clean.__dict__["first_name"] = "untracked"
+        changed.first_name = "tracked"
+        self.storage.flush()
+        with open(self.path) as f:
+            records = json.load(f)
+        self.assertNotIn("first_name", records["User." + clean.id])
+        self.assertEqual("tracked",
+                         records["User." + changed.id]["first_name"])
+
+    def test_flush_drops_destroyed_objects(self):
+        review = Review()
+        self.storage.flush()
+        self.storage.delete(review)
+        self.storage.flush()
+        with open(self.path) as f:
+            self.assertEqual({}, json.load(f))
+
+    def test_failed_flush_keeps_dirty_records(self):
+        for wal in (False, True):
+            storage = FileStorage(file_path=self.path, wal=wal)
+            storage.reload()
+            state = State()
+            city = City()
+            city.name = {1, 2}
+            with self.assertRaises(TypeError):
+                storage.flush()
+            self.assertEqual(2, storage.dirty_count())
+            city.name = "Lagos"
+            storage.flush()
+            storage.reload()
+            self.assertIsNotNone(storage.get(State, state.id))
+            self.assertEqual("Lagos", storage.get(City, city.id).name)
+
+
+class TestFileStorageBatch(unittest.TestCase):
+    """Unittests to evaluate transactional batches of FileStorage."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "file.json")
+        self.storage = FileStorage(file_path=self.path)
+        self.storage.reload()
+
+    def tearDown(self):
+        self.storage.rollback()
+        self.tmp.cleanup()
+        FileStorage._FileStorage__objects = {}
+
+    def test_batch_defers_saves_until_exit(self):
+        with self.storage.batch():
+            for _ in range(5):
+                place = Place()
+                self.storage.save()
+            self.assertFalse(os.path.exists(self.path))
+            self.assertTrue(self.storage.in_transaction())
+        self.assertFalse(self.storage.in_transaction())
+        with open(self.path) as f:
+            self.assertIn("Place." + place.id, json.load(f))
+
+    def test_batch_rolls_back_on_exception(self):
+        kept = State()
+        kept.name = "Lagos"
+        self.storage.flush()
+        with self.assertRaises(ValueError):
+            with self.storage.batch():
+                added = State()
+                kept.name = "Kano"
+                self.storage.delete(kept)
+                raise ValueError()
+        self.assertNotIn("State." + added.id, self.storage.all())
+        self.assertIs(kept, self.storage.all()["State." + kept.id])
+        self.assertEqual("Lagos", kept.name)
+        self.assertEqual(0, self.storage.dirty_count())
+
+    def test_flush_waits_for_the_commit(self):
+        for wal in (False, True):
+            self.storage = FileStorage(file_path=self.path, wal=wal)
+            self.storage.reload()
+            state = State()
+            state.name = "B"
+            self.storage.flush()
+            self.storage.begin()
+            state.name = "C"
+            self.storage.flush()
+            self.storage.compact()
+            self.storage.rollback()
+            self.assertEqual("B", state.name)
+            self.assertEqual(0, self.storage.dirty_count())
+            saved = FileStorage(file_path=self.path, wal=wal)
+            saved.reload()
+            self.assertEqual("B", saved.get(State, state.id).name)
+            for path in (self.path, self.path + ".log"):
+                if os.path.exists(path):
+                    os.remove(path)
+
+    def test_nested_batches_commit_once(self):
+        with self.storage.transaction():
+            with self.storage.batch():
+                User()
+            self.assertTrue(self.storage.in_transaction())
+            self.assertFalse(os.path.exists(self.path))
+        self.assertTrue(os.path.exists(self.path))
+
+
+class TestFileStorageFind(unittest.TestCase):
+    """Unittests to evaluate attribute index queries of FileStorage."""
+
+    def setUp(self):
+        models.storage.reload()
+        self.cities = [City(), City(), City()]
+        for city, state_id in zip(self.cities, ("s1", "s1", "s2")):
+            city.state_id = state_id
+
+    def tearDown(self):
+        FileStorage._FileStorage__objects = {}
+
+    def test_find_by_hash_index(self):
+        found = models.storage.find(City, state_id="s1")
+        self.assertEqual(["City." + city.id for city in self.cities[:2]],
+                         list(found))
+
+    def test_find_sees_updates_after_index_is_built(self):
+        models.storage.find(City, state_id="s1")
+        self.cities[0].state_id = "s2"
+        extra = City()
+        extra.state_id = "s1"
+        models.storage.delete(self.cities[1])
+        self.assertEqual(["City." + extra.id],
+                         list(models.storage.find(City, state_id="s1")))
+
+    def test_find_on_unindexed_attribute(self):
+        self.cities[2].name = "Ibadan"
+        found = models.storage.find("City", name="Ibadan", state_id="s2")
+        self.assertEqual(["City." + self.cities[2].id], list(found))
+
+    def test_find_without_filters_returns_class_instances(self):
+        self.assertEqual(models.storage.all(City), models.storage.find(City))
+
+    def test_find_range_by_sorted_index(self):
+        places = [Place() for _ in range(4)]
+        for place, price in zip(places, (120, 40, 80, 300)):
+            place.price_by_night = price
+        found = models.storage.find_range(Place, "price_by_night", 50, 200)
+        self.assertEqual(["Place." + places[2].id, "Place." + places[0].id],
+                         list(found))
+
+    def test_find_range_on_unindexed_attribute(self):
+        places = [Place() for _ in range(3)]
+        for place, rooms in zip(places, (3, 1, 2)):
+            place.number_rooms = rooms
+        found = models.storage.find_range(Place, "number_rooms", low=2)
+        self.assertEqual(["Place." + places[2].id, "Place." + places[0].id],
+                         list(found))
+
+    def test_indexes_are_rebuilt_after_reload(self):
+        models.storage.find(City, state_id="s1")
+        self.assertIn("City.state_id", models.storage.index_sizes())
+        models.storage.reload()
+        self.assertEqual({}, models.storage.find(City, state_id="s1"))
+
+    def test_index_sizes(self):
+        models.storage.find(Place)
+        sizes = models.storage.index_sizes()
+        self.assertIn("Place.price_by_night", sizes)
+        self.assertTrue(all(size > 0 for size in sizes.values()))
+
+
+class TestFileStorageRelations(unittest.TestCase):
+    """Unittests to evaluate relationship lookups through FileStorage."""
+
+    def setUp(self):
+        models.storage.reload()
+        self.state = State()
+        self.city = City()
+        self.city.state_id = self.state.id
+        self.user = User()
+        self.place = Place()
+        self.place.city_id = self.city.id
+        self.place.user_id = self.user.id
+        self.amenities = [Amenity(), Amenity()]
+        self.place.amenity_ids = [amenity.id for amenity in self.amenities]
+        self.reviews = [Review(), Review()]
+        for review in self.reviews:
+            review.place_id = self.place.id
+            review.user_id = self.user.id
+
+    def tearDown(self):
+        FileStorage._FileStorage__objects = {}
+        try:
+            os.remove("file.json")
+        except IOError:
+            pass
+
+    def test_one_to_many(self):
+        self.assertEqual([self.city], self.state.cities)
+        self.assertEqual([self.place], self.city.places)
+        self.assertEqual(self.reviews, self.place.reviews)
+        self.assertEqual([self.place], self.user.places)
+        self.assertEqual(self.reviews, self.user.reviews)
+
+    def test_many_to_one(self):
+        self.assertIs(self.state, self.city.state)
+        self.assertIs(self.city, self.place.city)
+        self.assertIs(self.user, self.place.user)
+        self.assertIs(self.place, self.reviews[0].place)
+        self.assertIs(self.user, self.reviews[1].user)
+        self.assertIsNone(Review().place)
+
+    def test_many_to_many(self):
+        self.assertEqual(self.amenities, self.place.amenities)
+        self.assertEqual([self.place], self.amenities[1].places)
+        models.storage.delete(self.amenities[0])
+        self.assertEqual(self.amenities[1:], self.place.amenities)
+
+    def test_relations_follow_changes(self):
+        self.assertEqual(self.reviews, self.place.reviews)
+        other = Place()
+        self.reviews[0].place_id = other.id
+        models.storage.delete(self.reviews[1])
+        review = Review()
+        review.place_id = self.place.id
+        self.assertEqual([review], self.place.reviews)
+        self.assertEqual([self.reviews[0]], other.reviews)
+        self.assertEqual([self.place], self.amenities[0].places)
+        self.place.amenity_ids = [self.amenities[1].id]
+        self.assertEqual([], self.amenities[0].places)
+
+    def test_relations_use_indexes(self):
+        self.assertEqual(self.reviews, self.place.reviews)
+        with mock.patch.object(FileStorage, "find") as find:
+            self.assertEqual(self.reviews, self.place.reviews)
+            self.assertEqual([self.place], self.amenities[0].places)
+        find.assert_not_called()
+        self.assertIn("Review.place_id", models.storage.index_sizes())
+        self.assertIn("Place.amenity_ids", models.storage.index_sizes())
+
+    def test_related_on_unindexed_attribute(self):
+        self.place.name = "Loft"
+        self.assertEqual({"Place." + self.place.id: self.place},
+                         models.storage.related(Place, "name", "Loft"))
+
+    def test_find_by_list_attribute(self):
+        found = models.storage.find(Place, amenity_ids=list(
+            self.place.amenity_ids))
+        self.assertEqual(["Place." + self.place.id], list(found))
+
+    def test_relations_after_reload(self):
+        self.place.save()
+        models.storage.reload()
+        place = models.storage.get(Place, self.place.id)
+        self.assertEqual({review.id for review in self.reviews},
+                         {review.id for review in place.reviews})
+        self.assertEqual(self.user.id, place.user.id)
+
+
+class TestFileStorageLazyReload(unittest.TestCase):
+    """Unittests to evaluate lazy deserialization on reload."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "file.json")
+        self.storage = FileStorage(file_path=self.path)
+        self.storage.reload()
+        self.user = User()
+        self.places = [Place(), Place()]
+        self.storage.save()
+        self.storage.reload()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+        FileStorage._FileStorage__objects = {}
+
+    def test_reload_does_not_instantiate(self):
+        self.assertEqual({}, FileStorage._FileStorage__objects)
+        self.assertEqual(3, self.storage.count())
+        self.assertEqual(2, self.storage.count(Place))
+
+    def test_get_instantiates_one_record(self):
+        user = self.storage.get(User, self.user.id)
+        self.assertIsInstance(user, User)
+        self.assertEqual(self.user.created_at, user.created_at)
+        self.assertEqual(1, len(FileStorage._FileStorage__objects))
+        self.assertIs(user, self.storage.get("User", self.user.id))
+        self.assertIsNone(self.storage.get(User, "missing"))
+
+    def test_all_with_class_instantiates_that_class(self):
+        places = self.storage.all(Place)
+        self.assertEqual(2, len(places))
+        self.assertTrue(all(type(obj) is Place for obj in places.values()))
+        self.assertNotIn("User." + self.user.id,
+                         FileStorage._FileStorage__objects)
+
+    def test_all_returns_instances(self):
+        objs = self.storage.all()
+        self.assertEqual(3, len(objs))
+        self.assertIsInstance(objs["User." + self.user.id], User)
+
+    def test_save_keeps_unloaded_records(self):
+        self.storage.get(Place, self.places[0].id).name = "Loft"
+        self.storage.save()
+        with open(self.path) as f:
+            records = json.load(f)
+        self.assertEqual(3, len(records))
+        self.assertEqual("Loft", records["Place." + self.places[0].id]["name"])
+
+    def test_eager_reload(self):
+        FileStorage(file_path=self.path, lazy=False).reload()
+        self.assertEqual(3, len(FileStorage._FileStorage__objects))
+
+
+class TestFileStorageSerializers(unittest.TestCase):
+    """Unittests to evaluate FileStorage with each serializer backend."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+        FileStorage._FileStorage__objects = {}
+
+    def round_trip(self, file_name, serializer=None, wal=False):
+        path = os.path.join(self.tmp.name, file_name)
+        storage = FileStorage(file_path=path, serializer=serializer, wal=wal)
+        storage.reload()
+        place = Place()
+        place.amenity_ids = ["a", "b"]
+        place.latitude = 6.45
+        user = User()
+        storage.save()
+        storage.delete(user)
+        storage.save()
+        storage.reload()
+        loaded = storage.get(Place, place.id)
+        self.assertEqual(place.to_dict(), loaded.to_dict())
+        self.assertIsNone(storage.get(User, user.id))
+        return (path)
+
+    def test_stdlib_json(self):
+        path = self.round_trip("file.json", "json")
+        with open(path) as f:
+            self.assertEqual(1, len(json.load(f)))
+
+    def test_binary_by_extension(self):
+        path = self.round_trip("file.bin")
+        with open(path, "rb") as f:
+            self.assertEqual(b"HBNB", f.read(4))
+
+    def test_binary_with_wal(self):
+        self.round_trip("file.bin", wal=True)
+
+    def test_switching_serializer_rewrites_everything(self):
+        path = os.path.join(self.tmp.name, "file.json")
+        FileStorage(file_path=path, serializer="binary").reload()
+        City()
+        FileStorage(file_path=path, serializer="binary").save()
+        City()
+        FileStorage(file_path=path, serializer="json").save()
+        with open(path) as f:
+            self.assertEqual(2, len(json.load(f)))
+
+
+class TestFileStorageAtomicWrites(unittest.TestCase):
+    """Unittests to evaluate crash-safe snapshot writes."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "file.json")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+        FileStorage._FileStorage__objects = {}
+
+    def test_failed_write_keeps_previous_file(self):
+        storage = FileStorage(file_path=self.path)
+        storage.reload()
+        city = City()
+        storage.save()
+        with open(self.path, "rb") as f:
+            before = f.read()
+        city.name = object()
+        with self.assertRaises(TypeError):
+            storage.save()
+        with open(self.path, "rb") as f:
+            self.assertEqual(before, f.read())
+
+    def test_no_temporary_files_left(self):
+        storage = FileStorage(file_path=self.path, fsync=False)
+        storage.reload()
+        City()
+        storage.save()
+        self.assertEqual(["file.json"], os.listdir(self.tmp.name))
+
+    def test_double_buffered_saves(self):
+        storage = FileStorage(file_path=self.path, double_buffer=True)
+        storage.reload()
+        cities = []
+        for _ in range(5):
+            cities.append(City())
+            storage.save()
+        storage.sync()
+        self.assertEqual(["file.json"], sorted(os.listdir(self.tmp.name)))
+        with open(self.path) as f:
+            self.assertEqual(5, len(json.load(f)))
+        storage.reload()
+        self.assertEqual(5, storage.count(City))
+
+
+class TestFileStorageWriteBehind(unittest.TestCase):
+    """Unittests to evaluate the background writer of FileStorage."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "file.json")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+        FileStorage._FileStorage__objects = {}
+
+    def storage(self, **options):
+        storage = FileStorage(file_path=self.path, write_behind=True,
+                              **options)
+        storage.reload()
+        return (storage)
+
+    def load(self):
+        with open(self.path) as f:
+            return (json.load(f))
+
+    def test_failed_write_is_retried(self):
+        storage = self.storage(max_staleness=0)
+        state = State()
+        city = City()
+        city.name = {1, 2}
+        storage.save()
+        with self.assertRaises(TypeError):
+            storage.sync()
+        city.name = "Lagos"
+        storage.save()
+        storage.sync()
+        self.assertIn(f"State.{state.id}", self.load())
+        self.assertEqual("Lagos", self.load()[f"City.{city.id}"]["name"])
+
+    def test_save_returns_before_writing(self):
+        storage = self.storage(max_staleness=60)
+        city = City()
+        storage.save()
+        self.assertFalse(os.path.exists(self.path))
+        storage.sync()
+        self.assertIn(f"City.{city.id}", self.load())
+
+    def test_saves_coalesce(self):
+        storage = self.storage(max_staleness=60)
+        with mock.patch.object(AtomicWriter, "write", autospec=True,
+                               side_effect=AtomicWriter.write) as write:
+            cities = [City() for _ in range(10)]
+            for city in cities:
+                city.name = "Lagos"
+                storage.save()
+            storage.delete(cities[0])
+            storage.save()
+            storage.sync()
+        self.assertEqual(1, write.call_count)
+        self.assertEqual(9, len(self.load()))
+        self.assertEqual("Lagos", self.load()[f"City.{cities[1].id}"]["name"])
+
+    def test_max_staleness(self):
+        storage = self.storage(max_staleness=0.01)
+        City()
+        storage.save()
+        for _ in range(200):
+            if os.path.exists(self.path):
+                break
+            time.sleep(0.01)
+        self.assertEqual(1, len(self.load()))
+
+    def test_incremental_saves_after_reload(self):
+        storage = self.storage(max_staleness=0)
+        first = State()
+        storage.save()
+        storage.sync()
+        storage.reload()
+        second = State()
+        storage.save()
+        storage.sync()
+        self.assertEqual({f"State.{first.id}", f"State.{second.id}"},
+                         set(self.load()))
+
+    def test_first_save_after_reload_encodes_only_changes(self):
+        for wal in (False, True):
+            storage = self.storage(max_staleness=0, wal=wal)
+            states = [State() for _ in range(20)]
+            City()
+            storage.save()
+            storage.reload(classes=[State])
+            storage.all(State)
+            to_dict = BaseModel.to_dict
+            with mock.patch.object(BaseModel, "to_dict", autospec=True,
+                                   side_effect=to_dict) as calls:
+                storage.get(State, states[3].id).name = "Lagos"
+                storage.save()
+                self.assertEqual(1, calls.call_count)
+                storage.sync()
+            records = self.load() if not wal else storage.all()
+            self.assertEqual(21, len(records))
+            storage.compact()
+            self.assertEqual(21, len(self.load()))
+            self.assertEqual("Lagos",
+                             self.load()[f"State.{states[3].id}"]["name"])
+            os.remove(self.path)
+
+    def test_with_wal(self):
+        storage = self.storage(max_staleness=0, wal=True)
+        user = User()
+        storage.save()
+        user.first_name = "Betty"
+        storage.save()
+        storage.sync()
+        storage.reload()
+        self.assertEqual("Betty", storage.get(User, user.id).first_name)
+
+    def test_commit_is_written_behind(self):
+        storage = self.storage(max_staleness=60)
+        with storage.batch():
+            place = Place()
+        self.assertFalse(os.path.exists(self.path))
+        storage.sync()
+        self.assertIn(f"Place.{place.id}", self.load())
+
+    def test_errors_are_raised_by_sync(self):
+        storage = self.storage(max_staleness=0)
+        city = City()
+        city.name = object()
+        storage.save()
+        with self.assertRaises(TypeError):
+            storage.sync()
+        storage.sync()
+
+
+class TestFileStorageStreamingReload(unittest.TestCase):
+    """Unittests to evaluate the record-by-record reload."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "file.json")
+        storage = FileStorage(file_path=self.path)
+        storage.reload()
+        self.states = [State() for _ in range(5000)]
+        storage.save()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+        FileStorage._FileStorage__objects = {}
+
+    def test_progress(self):
+        calls = []
+        storage = FileStorage(file_path=self.path, stream_threshold=0)
+        storage.reload(progress=lambda *args: calls.append(args))
+        size = os.path.getsize(self.path)
+        self.assertEqual((size, size, 5000), calls[-1])
+        self.assertLessEqual(calls[0][0], size)
+        self.assertEqual(4096, calls[0][2])
+
+    def test_eager_reload_builds_instances(self):
+        storage = FileStorage(file_path=self.path, lazy=False,
+                              stream_threshold=0)
+        storage.reload()
+        objects = FileStorage._FileStorage__objects
+        self.assertEqual(5000, len(objects))
+        self.assertIsInstance(objects[f"State.{self.states[0].id}"], State)
+        self.assertEqual(5000, storage.count(State))
+
+    def test_corrupt_file_loads_nothing(self):
+        with open(self.path, "r+b") as f:
+            f.seek(os.path.getsize(self.path) // 2)
+            f.write(b"#")
+        storage = FileStorage(file_path=self.path, stream_threshold=0)
+        storage.reload()
+        self.assertEqual(0, storage.count())
+
+    def test_wal_entries_override_snapshot(self):
+        storage = FileStorage(file_path=self.path, wal=True,
+                              stream_threshold=0)
+        storage.reload()
+        storage.delete(storage.get(State, self.states[0].id))
+        storage.get(State, self.states[1].id).name = "Lagos"
+        storage.save()
+        storage.reload()
+        self.assertIsNone(storage.get(State, self.states[0].id))
+        self.assertEqual("Lagos",
+                         storage.get(State, self.states[1].id).name)
+        self.assertEqual(4999, storage.count(State))
+
+    def test_small_files_are_read_whole(self):
+        storage = FileStorage(file_path=self.path)
+        with mock.patch.object(storage.serializer, "iter_load") as iter_load:
+            storage.reload()
+        iter_load.assert_not_called()
+        self.assertEqual(5000, storage.count(State))
+
+
+class TestFileStorageSharded(unittest.TestCase):
+    """Unittests to evaluate the one-file-per-class layout."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dir = os.path.join(self.tmp.name, "shards")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+        FileStorage._FileStorage__objects = {}
+
+    def storage(self, classes=None, **options):
+        storage = FileStorage(shard_dir=self.dir, **options)
+        storage.reload(classes=classes)
+        return (storage)
+
+    def load(self, name):
+        with open(os.path.join(self.dir, name)) as f:
+            return (json.load(f))
+
+    def test_one_file_per_class(self):
+        storage = self.storage()
+        state = State()
+        cities = [City(), City()]
+        storage.save()
+        self.assertEqual(["City.json", "State.json"],
+                         sorted(os.listdir(self.dir)))
+        self.assertEqual([f"State.{state.id}"], list(self.load("State.json")))
+        self.assertEqual(2, len(self.load("City.json")))
+        storage.reload()
+        self.assertEqual(2, storage.count(City))
+        self.assertEqual(cities[0].to_dict(),
+                         storage.get(City, cities[0].id).to_dict())
+
+    def test_only_dirty_shards_are_written(self):
+        storage = self.storage()
+        state = State()
+        [Review() for _ in range(3)]
+        storage.save()
+        with mock.patch.object(AtomicWriter, "write", autospec=True,
+                               side_effect=AtomicWriter.write) as write:
+            state.name = "Lagos"
+            storage.save()
+        self.assertEqual([os.path.join(self.dir, "State.json")],
+                         [call.args[1] for call in write.call_args_list])
+        self.assertEqual("Lagos", self.load("State.json")[
+            f"State.{state.id}"]["name"])
+
+    def test_empty_shard_is_removed(self):
+        storage = self.storage()
+        state = State()
+        City()
+        storage.save()
+        storage.delete(state)
+        storage.save()
+        self.assertEqual(["City.json"], os.listdir(self.dir))
+
+    def test_id_prefix_shards(self):
+        storage = self.storage(shard_prefix=1)
+        cities = [City() for _ in range(40)]
+        storage.save()
+        names = os.listdir(self.dir)
+        self.assertEqual({f"City.{city.id[0]}.json" for city in cities},
+                         set(names))
+        storage.reload()
+        self.assertEqual(40, storage.count(City))
+
+    def test_reload_selected_classes(self):
+        storage = self.storage()
+        state = State()
+        city = City()
+        storage.save()
+        storage.reload(classes=[State])
+        self.assertEqual([f"State.{state.id}"],
+                         list(FileStorage._FileStorage__raw))
+        self.assertIsNotNone(storage.get(State, state.id))
+        other = City()
+        storage.save()
+        self.assertEqual({f"City.{city.id}", f"City.{other.id}"},
+                         set(self.load("City.json")))
+
+    def test_compact_rewrites_every_shard(self):
+        storage = self.storage()
+        [Place() for _ in range(20)]
+        storage.save()
+        storage = self.storage(shard_prefix=1)
+        self.assertEqual(20, storage.count(Place))
+        storage.compact()
+        names = os.listdir(self.dir)
+        self.assertNotIn("Place.json", names)
+        self.assertEqual(20, sum(len(self.load(name)) for name in names))
+
+    def test_binary_shards(self):
+        storage = FileStorage(file_path="file.bin", shard_dir=self.dir)
+        storage.reload()
+        User()
+        storage.save()
+        self.assertEqual(["User.bin"], os.listdir(self.dir))
+
+    def test_invalid_options(self):
+        with self.assertRaises(ValueError):
+            FileStorage(shard_dir=self.dir, wal=True)
+        with self.assertRaises(ValueError):
+            FileStorage(shard_dir=self.dir, write_behind=True)
+
+
+class TestFileStorageSelectiveReload(unittest.TestCase):
+    """Unittests to evaluate reload(classes=...) on a single file."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+        FileStorage._FileStorage__objects = {}
+
+    def populate(self, file_name, **options):
+        path = os.path.join(self.tmp.name, file_name)
+        storage = FileStorage(file_path=path, **options)
+        storage.reload()
+        self.state = State()
+        self.cities = [City() for _ in range(3)]
+        storage.save()
+        return (FileStorage(file_path=path, **options))
+
+    def test_other_classes_load_on_access(self):
+        storage = self.populate("file.json")
+        storage.reload(classes=["State"])
+        self.assertEqual([f"State.{self.state.id}"],
+                         list(FileStorage._FileStorage__raw))
+        self.assertEqual(1, storage.count(State))
+        self.assertIsNotNone(storage.get(City, self.cities[0].id))
+        self.assertEqual(4, storage.count())
+
+    def test_save_keeps_other_classes(self):
+        storage = self.populate("file.json")
+        storage.reload(classes=[State])
+        storage.get(State, self.state.id).name = "Lagos"
+        storage.save()
+        storage.reload()
+        self.assertEqual(3, storage.count(City))
+        self.assertEqual("Lagos", storage.get(State, self.state.id).name)
+
+    def test_binary_skips_other_records(self):
+        storage = self.populate("file.bin")
+        with mock.patch.object(BinarySerializer, "decode", autospec=True,
+                               side_effect=BinarySerializer.decode) as decode:
+            storage.reload(classes=[State])
+        self.assertEqual(1, decode.call_count)
+        self.assertEqual(3, len(storage.all(City)))
+
+    def test_streaming_with_classes(self):
+        storage = self.populate("file.json", stream_threshold=0)
+        storage.reload(classes=[City])
+        self.assertEqual(3, len(FileStorage._FileStorage__raw))
+        self.assertEqual(4, len(storage.all()))
+
+    def test_wal_changes_of_other_classes(self):
+        storage = self.populate("file.json", wal=True)
+        storage.reload()
+        storage.get(City, self.cities[0].id).name = "Ibadan"
+        storage.delete(storage.get(City, self.cities[1].id))
+        storage.save()
+        storage.reload(classes=[State])
+        self.assertEqual(1, len(FileStorage._FileStorage__raw))
+        self.assertEqual("Ibadan",
+                         storage.get(City, self.cities[0].id).name)
+        self.assertIsNone(storage.get(City, self.cities[1].id))
+        self.assertEqual(2, storage.count(City))
+
+
+class TestFileStorageCompactModels(unittest.TestCase):
+    """Unittests to evaluate FileStorage(compact_models=True)."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "file.json")
+        storage = FileStorage(file_path=self.path)
+        storage.reload()
+        self.place = Place()
+        self.place.name = "Loft"
+        storage.save()
+        self.storage = FileStorage(file_path=self.path, compact_models=True)
+        self.storage.reload()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+        FileStorage._FileStorage__objects = {}
+
+    def test_loads_compact_instances(self):
+        obj = self.storage.get(Place, self.place.id)
+        self.assertIsInstance(obj, Place)
+        self.assertIsNot(Place, type(obj))
+        self.assertEqual({}, obj.__dict__)
+        self.assertEqual(self.place.to_dict(), obj.to_dict())
+
+    def test_find_uses_defaults(self):
+        self.assertEqual(1, len(self.storage.find(Place, city_id="")))
+        self.assertEqual(1, len(self.storage.find_range(Place, "max_guest",
+                                                        0, 0)))
+
+    def test_update_and_save(self):
+        obj = self.storage.get(Place, self.place.id)
+        obj.max_guest = 3
+        obj.pool = "yes"
+        self.storage.save()
+        self.storage.reload()
+        obj = self.storage.get(Place, self.place.id)
+        self.assertEqual(3, obj.max_guest)
+        self.assertEqual("yes", obj.pool)
+
+    def test_rollback(self):
+        obj = self.storage.get(Place, self.place.id)
+        with self.assertRaises(KeyError):
+            with self.storage.batch():
+                obj.name = "Cabin"
+                obj.pool = "yes"
+                raise KeyError()
+        self.assertEqual("Loft", obj.name)
+        self.assertFalse(hasattr(obj, "pool"))
+        self.assertEqual(0, self.storage.dirty_count())
+
+
+class TestFileStorageColumns(unittest.TestCase):
+    """Unittests to evaluate aggregate() and select()."""
+
+    def setUp(self):
+        FileStorage._FileStorage__objects = {}
+        self.storage = FileStorage()
+        self.places = []
+        for city_id, price, lat in (("a", 100, 6.5), ("a", 50, 7.5),
+                                    ("b", 30, 6.0)):
+            place = Place()
+            place.city_id = city_id
+            place.price_by_night = price
+            place.latitude = lat
+            self.places.append(place)
+
+    def tearDown(self):
+        FileStorage._FileStorage__objects = {}
+
+    def test_aggregate(self):
+        self.assertEqual(60.0, self.storage.aggregate(Place,
+                                                      "price_by_night"))
+        self.assertEqual({"a": 150.0, "b": 30.0}, self.storage.aggregate(
+            "Place", "price_by_night", "sum", by="city_id"))
+        self.assertEqual(130.0, self.storage.aggregate(
+            Place, "price_by_night", "sum", latitude=(None, 7)))
+
+    def test_select(self):
+        found = self.storage.select(Place, latitude=(6, 7),
+                                    price_by_night=(40, None))
+        self.assertEqual({f"Place.{self.places[0].id}": self.places[0]},
+                         found)
+
+    def test_columns_follow_changes(self):
+        self.storage.aggregate(Place, "price_by_night", by="city_id")
+        self.places[0].price_by_night = 10
+        self.places[1].city_id = "b"
+        self.storage.delete(self.places[2])
+        place = Place()
+        place.city_id = "c"
+        place.price_by_night = 7
+        self.assertEqual({"a": 10.0, "b": 50.0, "c": 7.0},
+                         self.storage.aggregate(Place, "price_by_night",
+                                                "sum", by="city_id"))
+
+    def test_columns_after_rollback(self):
+        self.storage.aggregate(Place, "price_by_night", "sum")
+        with self.assertRaises(KeyError):
+            with self.storage.batch():
+                self.places[0].price_by_night = 1
+                raise KeyError()
+        self.assertEqual(180.0, self.storage.aggregate(
+            Place, "price_by_night", "sum"))
+
+
+class TestFileStorageSpatial(unittest.TestCase):
+    """Unittests to evaluate near() and within()."""
+
+    def setUp(self):
+        FileStorage._FileStorage__objects = {}
+        self.storage = FileStorage()
+        self.places = []
+        for lat, lon in ((6.45, 3.39), (6.60, 3.35), (9.07, 7.49)):
+            place = Place()
+            place.latitude = lat
+            place.longitude = lon
+            self.places.append(place)
+
+    def tearDown(self):
+        FileStorage._FileStorage__objects = {}
+
+    def keys(self, places):
+        return ([f"Place.{place.id}" for place in places])
+
+    def test_near(self):
+        self.assertEqual(self.keys(self.places[1::-1]),
+                         list(self.storage.near(Place, 6.7, 3.3, 2)))
+        self.assertEqual(self.keys(self.places[2:]),
+                         list(self.storage.near("Place", 9, 7.5)))
+
+    def test_within(self):
+        self.assertEqual(set(self.keys(self.places[:2])),
+                         set(self.storage.within(Place, 6, 3, 7, 4)))
+
+    def test_index_follows_changes(self):
+        self.storage.near(Place, 0, 0)
+        self.places[2].latitude = 6.5
+        self.places[2].longitude = 3.4
+        self.storage.delete(self.places[0])
+        place = Place()
+        place.latitude = 6.55
+        place.longitude = 3.37
+        self.assertEqual(set(self.keys([self.places[1], self.places[2],
+                                        place])),
+                         set(self.storage.within(Place, 6, 3, 7, 4)))
+
+    def test_other_classes(self):
+        with self.assertRaises(ValueError):
+            self.storage.near(City, 0, 0)
+
+
+class TestFileStorageSearch(unittest.TestCase):
+    """Unittests to evaluate search() and its cache file."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "file.json")
+        self.storage = FileStorage(file_path=self.path)
+        self.storage.reload()
+        self.reviews = []
+        for text in ("Great loft, loft view", "Noisy street",
+                     "Loft was clean"):
+            review = Review()
+            review.text = text
+            self.reviews.append(review)
+        self.storage.save()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+        FileStorage._FileStorage__objects = {}
+
+    def keys(self, reviews):
+        return ([f"Review.{review.id}" for review in reviews])
+
+    def test_search(self):
+        self.assertEqual(self.keys([self.reviews[0], self.reviews[2]]),
+                         list(self.storage.search(Review, "loft")))
+        self.assertEqual(self.keys(self.reviews[1:2]),
+                         list(self.storage.search("Review", "street", 1)))
+        with self.assertRaises(ValueError):
+            self.storage.search(City, "lagos")
+
+    def test_index_follows_changes(self):
+        self.storage.search(Review, "loft")
+        self.reviews[1].text = "Quiet loft"
+        self.storage.delete(self.reviews[0])
+        review = Review()
+        review.text = "Tiny loft"
+        self.assertEqual(set(self.keys(self.reviews[1:] + [review])),
+                         set(self.storage.search(Review, "loft")))
+
+    def test_cache_is_reused(self):
+        self.storage.search(Review, "loft")
+        self.assertTrue(os.path.exists(f"{self.path}.Review.idx"))
+        self.storage.reload()
+        with mock.patch.object(TextIndex, "add") as add:
+            found = self.storage.search(Review, "street")
+        add.assert_not_called()
+        self.assertEqual(self.keys(self.reviews[1:2]), list(found))
+        self.assertEqual(2, len(FileStorage._FileStorage__raw))
+
+    def test_stale_cache_is_rebuilt(self):
+        self.storage.search(Review, "loft")
+        self.storage.reload()
+        self.storage.get(Review, self.reviews[1].id).text = "Sunny loft"
+        self.storage.save()
+        self.storage.reload()
+        self.assertEqual(3, len(self.storage.search(Review, "loft")))
+
+    def test_changes_are_cached_at_exit(self):
+        self.storage.search(Review, "loft")
+        self.reviews[1].text = "Sunny loft"
+        self.storage.save()
+        self.storage._FileStorage__write_text_indexes()
+        self.storage.reload()
+        with mock.patch.object(TextIndex, "add") as add:
+            self.assertEqual(3, len(self.storage.search(Review, "loft")))
+        add.assert_not_called()
+
+    def test_corrupt_cache_is_rebuilt(self):
+        with open(f"{self.path}.Review.idx", "wb") as f:
+            f.write(b"not an index")
+        self.assertEqual(2, len(self.storage.search(Review, "loft")))
+
+    def test_cache_runs_no_code(self):
+        marker = os.path.join(self.tmp.name, "ran")
+
+        class Payload:
+            def __reduce__(self):
+                return (os.mkdir, (marker,))
+
+        with open(f"{self.path}.Review.idx", "wb") as f:
+            f.write(pickle.dumps(Payload()))
+        self.assertEqual(2, len(self.storage.search(Review, "loft")))
+        self.assertFalse(os.path.exists(marker))
+
+    def test_exit_hook_is_registered_once(self):
+        FileStorage._FileStorage__text_writer = None
+        with mock.patch("atexit.register") as register:
+            for _ in range(3):
+                storage = FileStorage(file_path=self.path)
+                FileStorage._FileStorage__text = {}
+                storage.search(Review, "loft")
+        self.assertEqual(1, register.call_count)
+
+
+class TestFileStorageShared(unittest.TestCase):
+    """Unittests to evaluate FileStorage shared between processes."""
+    other = (
+        "import sys\n"
+        "import models\n"
+        "from models.engine.file_storage import FileStorage\n"
+        "models.storage = storage = FileStorage(\n"
+        "    file_path=sys.argv[1], wal=sys.argv[2] == '1', shared=True)\n"
+        "storage.reload()\n"
+        "from models.state import State\n")
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "file.json")
+        self.wal = False
+        self.storage = FileStorage(file_path=self.path, shared=True)
+        self.storage.reload()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+        FileStorage._FileStorage__objects = {}
+
+    def run_other(self, code, wait=True):
+        process = subprocess.Popen(
+            [sys.executable, "-c", self.other + code, self.path,
+             "1" if self.wal else "0"],
+            cwd=os.path.dirname(os.path.dirname(models.__file__)))
+        if wait:
+            self.assertEqual(0, process.wait())
+        return (process)
+
+    def test_saves_keep_records_of_other_processes(self):
+        mine = State()
+        self.storage.save()
+        self.run_other("State().save()\n")
+        State()
+        self.storage.save()
+        self.storage.reload()
+        self.assertEqual(3, self.storage.count(State))
+        self.assertIsNotNone(self.storage.get(State, mine.id))
+
+    def test_refresh_merges_changes_and_deletes(self):
+        kept, gone = State(), State()
+        self.storage.save()
+        self.run_other(
+            f"state = storage.get(State, '{kept.id}')\n"
+            "state.name = 'Lagos'\n"
+            f"storage.delete(storage.get(State, '{gone.id}'))\n"
+            "storage.save()\n")
+        self.assertEqual("", kept.name)
+        self.storage.refresh()
+        self.assertEqual("Lagos", kept.name)
+        self.assertIs(kept, self.storage.get(State, kept.id))
+        self.assertIsNone(self.storage.get(State, gone.id))
+        self.assertEqual([kept], list(
+            self.storage.find(State, name="Lagos").values()))
+
+    def test_local_changes_win(self):
+        state = State()
+        self.storage.save()
+        self.run_other(f"state = storage.get(State, '{state.id}')\n"
+                       "state.name = 'theirs'\n"
+                       "storage.save()\n")
+        state.name = "mine"
+        self.storage.save()
+        self.storage.reload()
+        self.assertEqual("mine", self.storage.get(State, state.id).name)
+
+    def test_refresh_reads_nothing_without_new_writes(self):
+        State()
+        self.storage.save()
+        with mock.patch.object(self.storage.serializer, "load") as load:
+            self.storage.refresh()
+            self.storage.save()
+        load.assert_not_called()
+
+    def test_wal_merges_only_new_log_entries(self):
+        self.wal = True
+        self.storage = FileStorage(file_path=self.path, wal=True,
+                                   shared=True)
+        self.storage.reload()
+        State()
+        self.storage.compact()
+        self.run_other("State().save()\n")
+        with mock.patch.object(self.storage.serializer, "load") as load:
+            self.storage.refresh()
+        load.assert_not_called()
+        self.assertEqual(2, self.storage.count(State))
+
+    def test_parallel_writers(self):
+        processes = [self.run_other("for _ in range(20):\n"
+                                    "    State().save()\n", wait=False)
+                     for _ in range(4)]
+        for _ in range(20):
+            State()
+            self.storage.save()
+        for process in processes:
+            self.assertEqual(0, process.wait())
+        self.storage.reload()
+        self.assertEqual(100, self.storage.count(State))
+
+    def test_rejects_write_behind(self):
+        with self.assertRaises(ValueError):
+            FileStorage(file_path=self.path, shared=True, write_behind=True)
+
+
+class TestFileStorageThreadSafe(unittest.TestCase):
+    """Unittests to evaluate FileStorage shared between threads."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "file.json")
+        self.storage = self.open()
+        patcher = mock.patch("models.storage", self.storage)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+        FileStorage._FileStorage__objects = {}
+
+    def open(self, **options):
+        storage = FileStorage(file_path=self.path, threadsafe=True,
+                              **options)
+        storage.reload()
+        return (storage)
+
+    def run_threads(self, target, count):
+        errors = []
+
+        def run(i):
+            try:
+                target(i)
+            except Exception as error:
+                errors.append(error)
+
+        threads = [threading.Thread(target=run, args=(i,))
+                   for i in range(count)]
+        for thread in threads:
+            thread.start()
+        return (threads, errors)
+
+    def stress(self, **options):
+        done = threading.Event()
+
+        def write(i):
+            for n in range(200):
+                State().name = f"{i}.{n}"
+                if n % 20 == 19:
+                    self.storage.save()
+
+        def read(i):
+            while not done.is_set():
+                for obj in self.storage.all().values():
+                    obj.to_dict()
+                self.storage.count(State)
+                self.storage.find(State, name="0.0")
+
+        readers, read_errors = self.run_threads(read, 4)
+        writers, write_errors = self.run_threads(write, 8)
+        for thread in writers:
+            thread.join()
+        done.set()
+        for thread in readers:
+            thread.join()
+        self.assertEqual([], read_errors + write_errors)
+        self.assertEqual(1600, self.storage.count(State))
+        names = {f"{i}.{n}" for i in range(8) for n in range(200)}
+        self.assertEqual(names, {state.name for state in self.open(
+            **options).all(State).values()})
+
+    def test_concurrent_writers_and_readers(self):
+        self.stress()
+
+    def test_concurrent_writers_and_readers_with_wal(self):
+        self.storage = self.open(wal=True, compact_every=300)
+        with mock.patch("models.storage", self.storage):
+            self.stress(wal=True)
+
+    def test_no_lost_updates(self):
+        place = Place()
+        place.number_rooms = 0
+        self.storage.save()
+
+        def increment(i):
+            for n in range(500):
+                with self.storage.rwlock.writing():
+                    place.number_rooms += 1
+                    if n % 50 == 0:
+                        place.save()
+
+        threads, errors = self.run_threads(increment, 8)
+        for thread in threads:
+            thread.join()
+        self.storage.save()
+        self.assertEqual([], errors)
+        self.assertEqual(4000, place.number_rooms)
+        self.assertEqual(4000, self.open().get(Place, place.id).number_rooms)
+
+    def test_save_between_flag_and_assignment(self):
+        state = State()
+        state.name = "old"
+        self.storage.save()
+        touch = self.storage.touch
+        savers = []
+
+        def touch_then_save(obj, name=None):
+            touch(obj, name)
+            saver, errors = self.run_threads(
+                lambda i: self.storage.save(), 1)
+            saver[0].join(0.1)
+            savers.append((saver[0], errors))
+
+        with mock.patch.object(self.storage, "touch", touch_then_save):
+            state.name = "new"
+        saver, errors = savers[0]
+        saver.join()
+        self.assertEqual([], errors)
+        self.storage.save()
+        self.assertEqual("new", self.open().get(State, state.id).name)
+
+    def test_all_returns_a_copy(self):
+        city = City()
+        objects = self.storage.all()
+        self.storage.delete(city)
+        self.assertIn(f"City.{city.id}", objects)
+        self.assertEqual({}, self.storage.all())
+
+    def test_writers_do_not_wait_for_the_disk(self):
+        State()
+        writing = threading.Event()
+        release = threading.Event()
+
+        def slow_write(writer, path, data):
+            writing.set()
+            release.wait(5)
+            original(writer, path, data)
+
+        original = AtomicWriter.write
+        with mock.patch.object(AtomicWriter, "write", slow_write):
+            saver, errors = self.run_threads(lambda i: self.storage.save(),
+                                             1)
+            self.assertTrue(writing.wait(5))
+            city = City()
+            city.name = "Lagos"
+            self.assertIs(city, self.storage.get(City, city.id))
+            release.set()
+            saver[0].join()
+        self.assertEqual([], errors)
+        self.storage.save()
+        self.assertEqual("Lagos", self.open().get(City, city.id).name)
+
+    def test_failed_flush_is_retried(self):
+        state = State()
+        city = City()
+        city.name = {1, 2}
+        with self.assertRaises(TypeError):
+            self.storage.save()
+        city.name = "Lagos"
+        self.storage.save()
+        with open(self.path) as f:
+            records = json.load(f)
+        self.assertIn(f"State.{state.id}", records)
+        self.assertEqual("Lagos", records[f"City.{city.id}"]["name"])
+
+    def test_transactions(self):
+        with self.storage.batch():
+            state = State()
+        with open(self.path) as f:
+            self.assertIn(f"State.{state.id}", json.load(f))
+        with self.assertRaises(KeyError):
+            with self.storage.batch():
+                state.name = "Lagos"
+                raise KeyError()
+        self.assertNotIn("name", state.__dict__)
+
+    def test_transactions_hold_off_other_threads(self):
+        began = threading.Event()
+        saving = threading.Event()
+
+        def save(i):
+            began.wait(5)
+            saving.set()
+            State().save()
+
+        self.storage.begin()
+        saver, errors = self.run_threads(save, 1)
+        began.set()
+        self.assertTrue(saving.wait(5))
+        saver[0].join(0.1)
+        self.assertTrue(saver[0].is_alive())
+        self.storage.rollback()
+        saver[0].join()
+        self.assertEqual([], errors)
+        self.assertFalse(self.storage.in_transaction())
+        self.assertEqual(1, self.storage.count(State))
+        self.assertEqual(1, self.open().count(State))
+
+    def test_transactions_belong_to_their_thread(self):
+        with self.storage.batch():
+            inside = []
+            thread = threading.Thread(target=lambda: inside.append(
+                self.storage.in_transaction()))
+            thread.start()
+            thread.join()
+            self.assertEqual([False], inside)
+            self.assertTrue(self.storage.in_transaction())
+
+
+class TestFileStorageSnapshotViews(unittest.TestCase):
+    """Unittests to evaluate FileStorage.snapshot() views."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "file.json")
+        self.storage = FileStorage(file_path=self.path)
+        self.storage.reload()
+        patcher = mock.patch("models.storage", self.storage)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.state = State()
+        self.state.name = "Lagos"
+        self.city = City()
+        self.key = f"State.{self.state.id}"
+
+    def tearDown(self):
+        self.tmp.cleanup()
+        FileStorage._FileStorage__objects = {}
+
+    def test_view_keeps_its_records(self):
+        with self.storage.snapshot() as view:
+            self.state.name = "Abuja"
+            self.storage.delete(self.city)
+            place = Place()
+            self.assertEqual("Lagos", view[self.key]["name"])
+            self.assertEqual({self.key, f"City.{self.city.id}"}, set(view))
+            self.assertEqual(2, len(view))
+            self.assertIn(f"City.{self.city.id}", view)
+            self.assertNotIn(f"Place.{place.id}", view)
+            self.assertEqual("Abuja", self.storage.get(State,
+                                                       self.state.id).name)
+        self.assertTrue(view.closed)
+
+    def test_records_are_copies(self):
+        view = self.storage.snapshot()
+        view[self.key]["name"] = "Abuja"
+        self.assertEqual("Lagos", view[self.key]["name"])
+        self.assertEqual("Lagos", self.state.name)
+        self.assertEqual(self.state.to_dict(), view[self.key])
+        view.close()
+
+    def test_lazy_records(self):
+        self.storage.save()
+        FileStorage._FileStorage__objects = {}
+        self.storage.reload()
+        with self.storage.snapshot() as view:
+            state = self.storage.get(State, self.state.id)
+            state.name = "Abuja"
+            self.storage.delete(state)
+            self.assertEqual("Lagos", view[self.key]["name"])
+            self.assertIn(self.key, view)
+
+    def test_rollback(self):
+        with self.assertRaises(KeyError):
+            with self.storage.batch():
+                self.state.name = "Abuja"
+                view = self.storage.snapshot()
+                raise KeyError()
+        self.assertEqual("Abuja", view[self.key]["name"])
+        self.assertEqual("Lagos", self.state.name)
+        view.close()
+
+    def test_generation(self):
+        first = self.storage.snapshot()
+        self.state.name = "Abuja"
+        second = self.storage.snapshot()
+        self.assertLess(first.generation, second.generation)
+        self.assertEqual(second.generation,
+                         self.storage.snapshot().generation)
+        self.assertIsInstance(first, StorageView)
+
+    def test_closed_views_are_dropped(self):
+        views = FileStorage._FileStorage__views
+        view = self.storage.snapshot()
+        self.storage.snapshot()
+        self.assertEqual(1, len(views))
+        view.close()
+        self.state.name = "Abuja"
+        self.assertEqual([], list(view))
+
+    def test_export_runs_beside_writers(self):
+        storage = FileStorage(file_path=self.path, threadsafe=True)
+        getitem = StorageView.__getitem__
+        writers = []
+
+        def write():
+            with storage.rwlock.writing():
+                self.state.name = "Abuja"
+                storage.delete(self.city)
+                storage.new(Place())
+
+        def slow_getitem(view, key):
+            if not writers:
+                writers.append(threading.Thread(target=write))
+                writers[0].start()
+                writers[0].join(5)
+            return (getitem(view, key))
+
+        export = os.path.join(self.tmp.name, "file.snapshot")
+        with mock.patch("models.storage", storage), \
+                mock.patch.object(StorageView, "__getitem__", slow_getitem):
+            storage.export(export)
+        self.assertFalse(writers[0].is_alive())
+        self.assertEqual("Abuja", self.state.name)
+        snapshot = SnapshotStorage(file_path=export)
+        snapshot.reload()
+        self.assertEqual("Lagos", snapshot.get(State, self.state.id).name)
+        self.assertEqual(1, snapshot.count(City))
+        self.assertEqual(0, snapshot.count(Place))
+
+
 if __name__ == "__main__":
     unittest.main()
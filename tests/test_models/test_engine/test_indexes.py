@@ -0,0 +1,279 @@
+#!/usr/bin/python3
+"""Defines unittests for models/engine/indexes.py.
+
+Classes:
+    TestHashIndex
+    TestListIndex
+    TestSortedIndex
+    TestGridIndex
+    TestTextIndex
+"""
+import math
+import random
+import unittest
+from types import SimpleNamespace
+from models.engine.indexes import GridIndex, HashIndex, ListIndex, \
+    SortedIndex, TextIndex, distance
+
+
+class TestHashIndex(unittest.TestCase):
+    """Unittests to evaluate the HashIndex class."""
+
+    def setUp(self):
+        self.index = HashIndex("state_id")
+
+    def test_lookup(self):
+        self.index.add("City.1", SimpleNamespace(state_id="a"))
+        self.index.add("City.2", SimpleNamespace(state_id="a"))
+        self.index.add("City.3", SimpleNamespace(state_id="b"))
+        self.assertEqual(["City.1", "City.2"], self.index.lookup("a"))
+        self.assertEqual([], self.index.lookup("c"))
+
+    def test_add_replaces_previous_value(self):
+        self.index.add("City.1", SimpleNamespace(state_id="a"))
+        self.index.add("City.1", SimpleNamespace(state_id="b"))
+        self.assertEqual([], self.index.lookup("a"))
+        self.assertEqual(["City.1"], self.index.lookup("b"))
+
+    def test_remove(self):
+        self.index.add("City.1", SimpleNamespace(state_id="a"))
+        self.index.remove("City.1")
+        self.index.remove("City.2")
+        self.assertEqual([], self.index.lookup("a"))
+
+    def test_unhashable_values_are_skipped(self):
+        self.index.add("City.1", SimpleNamespace(state_id=["a"]))
+        self.assertEqual([], self.index.lookup(["a"]))
+
+    def test_nbytes(self):
+        empty = self.index.nbytes()
+        self.index.add("City.1", SimpleNamespace(state_id="a"))
+        self.assertLess(empty, self.index.nbytes())
+
+
+class TestListIndex(unittest.TestCase):
+    """Unittests to evaluate the ListIndex class."""
+
+    def setUp(self):
+        self.index = ListIndex("amenity_ids")
+
+    def test_lookup(self):
+        self.index.add("Place.1", SimpleNamespace(amenity_ids=["a", "b"]))
+        self.index.add("Place.2", SimpleNamespace(amenity_ids=("b", "b")))
+        self.assertEqual(["Place.1"], self.index.lookup("a"))
+        self.assertEqual(["Place.1", "Place.2"], self.index.lookup("b"))
+        self.assertEqual([], self.index.lookup("c"))
+
+    def test_add_replaces_previous_items(self):
+        self.index.add("Place.1", SimpleNamespace(amenity_ids=["a", "b"]))
+        self.index.add("Place.1", SimpleNamespace(amenity_ids=["b", "c"]))
+        self.assertEqual([], self.index.lookup("a"))
+        self.assertEqual(["Place.1"], self.index.lookup("c"))
+        self.index.add("Place.1", SimpleNamespace(amenity_ids=[]))
+        self.assertEqual([], self.index.lookup("b"))
+
+    def test_list_changed_in_place_is_reindexed(self):
+        ids = ["a"]
+        self.index.add("Place.1", SimpleNamespace(amenity_ids=ids))
+        ids.append("b")
+        self.index.add("Place.1", SimpleNamespace(amenity_ids=ids))
+        self.assertEqual(["Place.1"], self.index.lookup("b"))
+
+    def test_remove(self):
+        self.index.add("Place.1", SimpleNamespace(amenity_ids=["a"]))
+        self.index.remove("Place.1")
+        self.index.remove("Place.2")
+        self.assertEqual([], self.index.lookup("a"))
+
+    def test_other_values_are_skipped(self):
+        self.index.add("Place.1", SimpleNamespace(amenity_ids="ab"))
+        self.index.add("Place.2", SimpleNamespace(amenity_ids=[["a"], "b"]))
+        self.assertEqual([], self.index.lookup("a"))
+        self.assertEqual([], self.index.lookup(["a"]))
+        self.assertEqual(["Place.2"], self.index.lookup("b"))
+
+    def test_nbytes(self):
+        empty = self.index.nbytes()
+        self.index.add("Place.1", SimpleNamespace(amenity_ids=["a"]))
+        self.assertLess(empty, self.index.nbytes())
+
+
+class TestSortedIndex(unittest.TestCase):
+    """Unittests to evaluate the SortedIndex class."""
+
+    def setUp(self):
+        self.index = SortedIndex("price_by_night")
+        for key, price in (("Place.1", 80), ("Place.2", 20),
+                           ("Place.3", 50.5), ("Place.4", 50.5)):
+            self.index.add(key, SimpleNamespace(price_by_night=price))
+
+    def test_range(self):
+        self.assertEqual(["Place.3", "Place.4", "Place.1"],
+                         self.index.range(50, 100))
+        self.assertEqual(["Place.2"], self.index.range(high=20))
+        self.assertEqual(["Place.1"], self.index.range(low=51))
+
+    def test_lookup(self):
+        self.assertEqual(["Place.3", "Place.4"], self.index.lookup(50.5))
+
+    def test_update_and_remove(self):
+        self.index.add("Place.1", SimpleNamespace(price_by_night=10))
+        self.index.remove("Place.3")
+        self.assertEqual(["Place.1", "Place.2", "Place.4"],
+                         self.index.range())
+
+    def test_non_numeric_values_are_skipped(self):
+        self.index.add("Place.5", SimpleNamespace(price_by_night="cheap"))
+        self.index.add("Place.6", SimpleNamespace(price_by_night=True))
+        self.assertEqual(4, len(self.index.range()))
+
+    def test_non_finite_values_are_skipped(self):
+        for value in (math.nan, math.inf):
+            self.index.add("Place.5", SimpleNamespace(price_by_night=value))
+        self.index.remove("Place.3")
+        self.index.remove("Place.1")
+        self.assertEqual(["Place.2", "Place.4"], self.index.range(0, 100))
+
+
+class TestGridIndex(unittest.TestCase):
+    """Unittests to evaluate the GridIndex class."""
+
+    def setUp(self):
+        self.index = GridIndex("latitude", "longitude", cell=1)
+        rand = random.Random(7)
+        self.points = {}
+        for i in range(2000):
+            if i % 2:
+                point = (rand.uniform(-90, 90), rand.uniform(-180, 180))
+            else:
+                point = (rand.gauss(6.5, 2), rand.gauss(3.3, 2))
+            self.points[f"Place.{i}"] = point
+            self.index.add(f"Place.{i}", SimpleNamespace(
+                latitude=point[0], longitude=point[1]))
+
+    def brute_nearest(self, lat, lon, k):
+        return ([key for _, key in sorted(
+            (distance(lat, lon, *point), key)
+            for key, point in self.points.items())[:k]])
+
+    def brute_within(self, south, west, north, east):
+        return (sorted(key for key, (lat, lon) in self.points.items()
+                       if south <= lat <= north and
+                       (west <= lon <= east if west <= east
+                        else lon >= west or lon <= east)))
+
+    def test_nearest(self):
+        for lat, lon in ((6.5, 3.3), (89.5, 179.9), (-88, -179.9),
+                         (0, 180), (45, -170)):
+            for k in (1, 7, 60):
+                self.assertEqual(self.brute_nearest(lat, lon, k),
+                                 self.index.nearest(lat, lon, k))
+
+    def test_within(self):
+        for box in ((5, 2, 8, 4), (-10, 170, 10, -170), (80, -180, 90, 180),
+                    (1, 1, 0, 2)):
+            self.assertEqual(self.brute_within(*box),
+                             sorted(self.index.within(*box)))
+
+    def test_updates_and_removals(self):
+        self.index.add("Place.0", SimpleNamespace(latitude=-45.0,
+                                                  longitude=-45.0))
+        self.index.remove("Place.2")
+        self.index.remove("Place.2")
+        self.assertEqual(["Place.0"], self.index.nearest(-45, -45))
+        self.assertEqual(1999, len(self.index))
+
+    def test_invalid_points_are_not_indexed(self):
+        for i, (lat, lon) in enumerate(((None, 1), ("6", 3), (True, 3),
+                                        (91, 0), (0, -181))):
+            self.index.add(f"Bad.{i}", SimpleNamespace(latitude=lat,
+                                                       longitude=lon))
+        self.assertEqual(2000, len(self.index))
+
+    def test_empty_and_small(self):
+        index = GridIndex("latitude", "longitude")
+        self.assertEqual([], index.nearest(0, 0, 3))
+        index.add("Place.1", SimpleNamespace(latitude=1, longitude=1))
+        self.assertEqual(["Place.1"], index.nearest(-60, 120, 3))
+        self.assertEqual([], index.nearest(0, 0, 0))
+
+    def test_distance(self):
+        self.assertAlmostEqual(111.2, distance(0, 0, 1, 0), 1)
+        self.assertAlmostEqual(0, distance(0, 180, 0, -180))
+
+
+class TestTextIndex(unittest.TestCase):
+    """Unittests to evaluate the TextIndex class."""
+
+    def setUp(self):
+        self.index = TextIndex(("name", "description"))
+        for key, name, description in (
+                ("Place.1", "Sunny loft", "A loft with a view of the sea"),
+                ("Place.2", "Café Crème", "Quiet room above the café"),
+                ("Place.3", "Sea house", "Sea, sand and sun by the sea"),
+                ("Place.4", None, 42)):
+            self.index.add(key, SimpleNamespace(name=name,
+                                                description=description))
+
+    def keys(self, text, limit=10):
+        return ([key for key, _ in self.index.search(text, limit)])
+
+    def test_tokenize(self):
+        self.assertEqual(["cafe", "creme", "naive", "2x"],
+                         TextIndex.tokenize("Café CRÈME, naïve-2x"))
+
+    def test_ranking(self):
+        self.assertEqual(["Place.3", "Place.1"], self.keys("sea"))
+        self.assertEqual(["Place.1", "Place.3"], self.keys("LOFT sea"))
+        self.assertEqual(["Place.2"], self.keys("cafe"))
+        self.assertEqual(["Place.3"], self.keys("sea", 1))
+        self.assertEqual([], self.keys("castle"))
+        self.assertEqual(3, len(self.index))
+
+    def test_updates_and_removals(self):
+        self.index.add("Place.3", SimpleNamespace(name="Castle",
+                                                  description=""))
+        self.index.remove("Place.1")
+        self.index.remove("Place.1")
+        self.assertEqual([], self.keys("sea"))
+        self.assertEqual(["Place.3"], self.keys("castle"))
+        self.assertEqual(2, len(self.index))
+
+    def test_removed_documents_are_compacted(self):
+        index = TextIndex(("text",))
+        for i in range(3000):
+            index.add(f"Review.{i}", SimpleNamespace(
+                text=f"stay {i} " + ("good" if i % 2 else "bad")))
+        for i in range(2500):
+            index.remove(f"Review.{i}")
+        self.assertEqual(500, len(index))
+        self.assertEqual(250, len(index.search("good", None)))
+        self.assertEqual([("Review.2999", index.search("2999")[0][1])],
+                         index.search("2999"))
+        self.assertEqual([], index.search("17"))
+        index.add("Review.17", SimpleNamespace(text="stay 17"))
+        self.assertEqual(["Review.17"],
+                         [key for key, _ in index.search("17")])
+
+    def test_empty(self):
+        self.assertEqual([], TextIndex(("text",)).search("sea"))
+
+    def test_dump_and_load(self):
+        self.index.remove("Place.2")
+        meta, index = TextIndex.load(self.index.dump({"files": [1]}))
+        self.assertEqual({"files": [1]}, meta)
+        self.assertEqual(self.index.attrs, index.attrs)
+        self.assertEqual(2, len(index))
+        for text in ("sea", "LOFT sea", "cafe"):
+            self.assertEqual(self.index.search(text), index.search(text))
+
+    def test_load_rejects_other_data(self):
+        data = self.index.dump()
+        for bad in (b"", b"not an index", data[:-2], data + b"\0\0\0\0",
+                    data[:len(TextIndex.magic) + 6]):
+            with self.assertRaises(ValueError):
+                TextIndex.load(bad)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,155 @@
+#!/usr/bin/python3
+"""Defines unittests for models/engine/locks.py.
+
+Classes:
+    TestFileLock
+    TestRWLock
+"""
+import os
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch
+from models.engine import locks
+from models.engine.locks import FileLock, RWLock
+
+
+class TestFileLock(unittest.TestCase):
+    """Unittests to evaluate the FileLock class."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "sub", "file.json.lock")
+        self.lock = FileLock(self.path)
+
+    def tearDown(self):
+        self.lock.close()
+        self.tmp.cleanup()
+
+    def try_lock(self, operation):
+        fd = os.open(self.path, os.O_RDWR)
+        try:
+            locks.fcntl.flock(fd, operation | locks.fcntl.LOCK_NB)
+        except BlockingIOError:
+            return (False)
+        finally:
+            os.close(fd)
+        return (True)
+
+    def test_generation(self):
+        self.assertEqual(0, self.lock.generation())
+        with self.lock.exclusive():
+            self.assertEqual(1, self.lock.advance())
+            self.assertEqual(2, self.lock.advance())
+        other = FileLock(self.path)
+        self.assertEqual(2, other.generation())
+        other.close()
+
+    @unittest.skipIf(locks.fcntl is None, "fcntl is not available")
+    def test_exclusive_excludes_other_holders(self):
+        with self.lock.exclusive():
+            self.assertFalse(self.try_lock(locks.fcntl.LOCK_SH))
+        self.assertTrue(self.try_lock(locks.fcntl.LOCK_EX))
+
+    @unittest.skipIf(locks.fcntl is None, "fcntl is not available")
+    def test_shared_admits_readers_only(self):
+        with self.lock.shared():
+            self.assertTrue(self.try_lock(locks.fcntl.LOCK_SH))
+            self.assertFalse(self.try_lock(locks.fcntl.LOCK_EX))
+
+    @unittest.skipIf(locks.fcntl is None, "fcntl is not available")
+    def test_released_on_error(self):
+        with self.assertRaises(KeyError):
+            with self.lock.exclusive():
+                raise KeyError()
+        self.assertTrue(self.try_lock(locks.fcntl.LOCK_EX))
+
+    def test_without_fcntl(self):
+        with patch.object(locks, "fcntl", None):
+            with self.lock.exclusive():
+                self.assertEqual(1, self.lock.advance())
+            with self.lock.shared():
+                self.assertEqual(1, self.lock.generation())
+
+
+class TestRWLock(unittest.TestCase):
+    """Unittests to evaluate the RWLock class."""
+
+    def setUp(self):
+        self.lock = RWLock()
+
+    def run_thread(self, target):
+        thread = threading.Thread(target=target, daemon=True)
+        thread.start()
+        return (thread)
+
+    def read(self, events):
+        with self.lock.reading():
+            events.append("read")
+
+    def test_readers_share(self):
+        inside = threading.Barrier(3, timeout=5)
+
+        def read():
+            with self.lock.reading():
+                inside.wait()
+
+        threads = [self.run_thread(read) for _ in range(2)]
+        with self.lock.reading():
+            inside.wait()
+        for thread in threads:
+            thread.join(5)
+
+    def test_writer_excludes_readers(self):
+        events = []
+        with self.lock.writing():
+            thread = self.run_thread(lambda: self.read(events))
+            thread.join(0.05)
+            self.assertTrue(thread.is_alive())
+            events.append("written")
+        thread.join(5)
+        self.assertEqual(["written", "read"], events)
+
+    def test_waiting_writer_goes_first(self):
+        events = []
+        waiting = threading.Event()
+
+        def write():
+            waiting.set()
+            with self.lock.writing():
+                events.append("written")
+
+        with self.lock.reading():
+            writer = self.run_thread(write)
+            waiting.wait(5)
+            writer.join(0.05)
+            reader = self.run_thread(lambda: self.read(events))
+            reader.join(0.05)
+            self.assertEqual([], events)
+        writer.join(5)
+        reader.join(5)
+        self.assertEqual(["written", "read"], events)
+
+    def test_reentrant(self):
+        with self.lock.writing():
+            with self.lock.writing(), self.lock.reading():
+                pass
+            with self.lock.reading():
+                pass
+        with self.lock.reading():
+            with self.lock.reading():
+                pass
+        with self.lock.writing():
+            pass
+
+    def test_reader_cannot_write(self):
+        with self.lock.reading():
+            with self.assertRaises(RuntimeError):
+                with self.lock.writing():
+                    pass
+        with self.lock.writing():
+            pass
+
+
+if __name__ == "__main__":
+    unittest.main()
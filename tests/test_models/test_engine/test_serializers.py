@@ -0,0 +1,179 @@
+#!/usr/bin/python3
+"""Defines unittests for models/engine/serializers.py.
+
+Classes:
+    TestSerializers
+    TestGetSerializer
+"""
+import io
+import json
+import unittest
+from models.engine import serializers
+from models.engine.serializers import BinarySerializer, JSONSerializer, \
+    OrjsonSerializer, get_serializer
+
+RECORDS = {
+    "Place.1": {"id": "1", "__class__": "Place", "name": "Loft ✓",
+                "created_at": "2017-09-28T21:03:54.052298",
+                "price_by_night": 120, "latitude": 6.52, "max_guest": -3,
+                "amenity_ids": ["a", "b"], "empty": None,
+                "flags": {"pets": True, "wifi": False}},
+    "User.2": {"id": "2", "__class__": "User", "email": ""}}
+
+
+class SerializerTests:
+    """Round-trip checks run against every backend."""
+
+    def test_record_round_trip(self):
+        for record in RECORDS.values():
+            self.assertEqual(record, self.serializer.decode(
+                self.serializer.encode(record)))
+
+    def test_snapshot_round_trip(self):
+        data = self.serializer.dump(
+            (key, self.serializer.encode(record))
+            for key, record in RECORDS.items())
+        self.assertEqual(RECORDS, self.serializer.load(data))
+
+    def test_empty_snapshot(self):
+        self.assertEqual({}, self.serializer.load(b""))
+        self.assertEqual({}, self.serializer.load(self.serializer.dump([])))
+
+    def test_streaming_load(self):
+        data = self.serializer.dump(
+            (key, self.serializer.encode(record))
+            for key, record in RECORDS.items())
+        for chunk_size in (1, 3, 1 << 20):
+            self.assertEqual(list(RECORDS.items()), list(
+                self.serializer.iter_load(io.BytesIO(data), chunk_size)))
+
+    def test_load_selected_classes(self):
+        data = self.serializer.dump(
+            (key, self.serializer.encode(record))
+            for key, record in RECORDS.items())
+        expected = {"User.2": RECORDS["User.2"]}
+        self.assertEqual(expected, self.serializer.load(data, {"User"}))
+        self.assertEqual(list(expected.items()), list(
+            self.serializer.iter_load(io.BytesIO(data), 4, {"User"})))
+
+    def test_streaming_empty_snapshot(self):
+        self.assertEqual([], list(self.serializer.iter_load(io.BytesIO())))
+        data = self.serializer.dump([])
+        self.assertEqual([], list(self.serializer.iter_load(
+            io.BytesIO(data))))
+
+    def test_streaming_truncated_snapshot(self):
+        data = self.serializer.dump(
+            (key, self.serializer.encode(record))
+            for key, record in RECORDS.items())
+        stream = self.serializer.iter_load(io.BytesIO(data[:-4]), 5)
+        with self.assertRaises(ValueError):
+            list(stream)
+
+    def test_log_round_trip(self):
+        record = RECORDS["User.2"]
+        data = self.serializer.log_entry(
+            "User.2", self.serializer.encode(record))
+        data += self.serializer.log_entry("Place.1")
+        entries, good = self.serializer.read_log(data)
+        self.assertEqual([("User.2", record), ("Place.1", None)], entries)
+        self.assertEqual(len(data), good)
+
+    def test_log_with_torn_tail(self):
+        data = self.serializer.log_entry("Place.1")
+        torn = self.serializer.log_entry(
+            "User.2", self.serializer.encode(RECORDS["User.2"]))
+        entries, good = self.serializer.read_log(data + torn[:-3])
+        self.assertEqual([("Place.1", None)], entries)
+        self.assertEqual(len(data), good)
+
+
+class TestJSONSerializer(SerializerTests, unittest.TestCase):
+    """Unittests to evaluate the JSONSerializer class."""
+
+    def setUp(self):
+        self.serializer = JSONSerializer()
+
+    def test_snapshot_is_file_json_layout(self):
+        data = self.serializer.dump([("User.2", b'{"id": "2"}')])
+        self.assertEqual(b'{"User.2": {"id": "2"}}', data)
+
+    def test_streaming_hand_written_file(self):
+        data = b' {\n  "A.1" : {"n": 1e3},\n"B.2":{"s": "\\u00e9}"} }\n'
+        self.assertEqual([("A.1", {"n": 1000.0}), ("B.2", {"s": "\u00e9}"})],
+                         list(self.serializer.iter_load(io.BytesIO(data), 2)))
+
+    def test_streaming_rejects_other_layouts(self):
+        for data in (b'[1, 2]', b'{"A.1": 1 "B.2": 2}', b'{1: 2}'):
+            with self.assertRaises(ValueError):
+                list(self.serializer.iter_load(io.BytesIO(data)))
+
+
+@unittest.skipIf(serializers.orjson is None, "orjson is not installed")
+class TestOrjsonSerializer(SerializerTests, unittest.TestCase):
+    """Unittests to evaluate the OrjsonSerializer class."""
+
+    def setUp(self):
+        self.serializer = OrjsonSerializer()
+
+    def test_files_are_readable_by_stdlib_json(self):
+        data = self.serializer.dump(
+            (key, self.serializer.encode(record))
+            for key, record in RECORDS.items())
+        self.assertEqual(RECORDS, JSONSerializer().load(data))
+
+    def test_wide_integers_fall_back_to_stdlib_json(self):
+        record = {"max_guest": 10 ** 23}
+        self.assertEqual(record, json.loads(self.serializer.encode(record)))
+
+
+class TestBinarySerializer(SerializerTests, unittest.TestCase):
+    """Unittests to evaluate the BinarySerializer class."""
+
+    def setUp(self):
+        self.serializer = BinarySerializer()
+
+    def test_integer_sizes(self):
+        record = {"values": [0, -128, 300, -70000, 2 ** 40, 2 ** 70]}
+        self.assertEqual(record, self.serializer.decode(
+            self.serializer.encode(record)))
+
+    def test_long_strings_and_lists(self):
+        record = {"text": "x" * 1000, "ids": list(range(300))}
+        self.assertEqual(record, self.serializer.decode(
+            self.serializer.encode(record)))
+
+    def test_rejects_foreign_files(self):
+        with self.assertRaises(ValueError):
+            self.serializer.load(b'{"User.2": {}}')
+
+    def test_rejects_unserializable_values(self):
+        with self.assertRaises(TypeError):
+            self.serializer.encode({"when": object()})
+
+    def test_is_smaller_than_json(self):
+        record = RECORDS["Place.1"]
+        self.assertLess(len(self.serializer.encode(record)),
+                        len(JSONSerializer().encode(record)))
+
+
+class TestGetSerializer(unittest.TestCase):
+    """Unittests to evaluate the get_serializer function."""
+
+    def test_by_name(self):
+        self.assertIsInstance(get_serializer("json"), JSONSerializer)
+        self.assertIsInstance(get_serializer("binary"), BinarySerializer)
+
+    def test_by_extension(self):
+        self.assertIsInstance(get_serializer(path="db.bin"),
+                              BinarySerializer)
+        self.assertIs(JSONSerializer, type(get_serializer(
+            path="file.json")))
+
+    def test_unknown_name(self):
+        with self.assertRaises(ValueError):
+            get_serializer("yaml")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,164 @@
+#!/usr/bin/python3
+"""Defines unittests for models/engine/snapshot_storage.py.
+
+Classes:
+    TestSnapshotStorage
+    TestSnapshotStorageReadOnly
+"""
+import os
+import tempfile
+import unittest
+from io import StringIO
+from unittest.mock import patch
+from console import HBNBCommand
+from models.engine.file_storage import FileStorage
+from models.engine.serializers import BinarySerializer
+from models.engine.snapshot_storage import SnapshotStorage
+from models.city import City
+from models.place import Place
+from models.state import State
+
+
+class SnapshotStorageTestCase(unittest.TestCase):
+    """Exports a few objects from a FileStorage into a fresh snapshot."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "file.snapshot")
+        self.source = FileStorage(
+            file_path=os.path.join(self.tmp.name, "file.json"))
+        self.source.reload()
+        self.state = State()
+        self.state.name = "Lagos"
+        self.cities = [City() for _ in range(3)]
+        for city in self.cities:
+            city.state_id = self.state.id
+        self.source.export(self.path)
+        self.storage = SnapshotStorage(file_path=self.path)
+        self.storage.reload()
+
+    def tearDown(self):
+        self.storage.close()
+        self.tmp.cleanup()
+        FileStorage._FileStorage__objects = {}
+
+
+class TestSnapshotStorage(SnapshotStorageTestCase):
+    """Unittests to evaluate the SnapshotStorage class."""
+
+    def test_get(self):
+        loaded = self.storage.get(State, self.state.id)
+        self.assertIsInstance(loaded, State)
+        self.assertEqual(self.state.to_dict(), loaded.to_dict())
+        self.assertIs(loaded, self.storage.get("State", self.state.id))
+        self.assertIsNone(self.storage.get(State, "missing"))
+
+    def test_get_decodes_one_record(self):
+        with patch.object(BinarySerializer, "decode", autospec=True,
+                          side_effect=BinarySerializer.decode) as decode:
+            self.storage.get(City, self.cities[1].id)
+            self.storage.get(City, self.cities[1].id)
+        self.assertEqual(1, decode.call_count)
+
+    def test_count_decodes_nothing(self):
+        with patch.object(BinarySerializer, "decode") as decode:
+            self.assertEqual(4, self.storage.count())
+            self.assertEqual(3, self.storage.count(City))
+            self.assertEqual(0, self.storage.count(Place))
+        decode.assert_not_called()
+
+    def test_all(self):
+        self.assertEqual({f"City.{city.id}" for city in self.cities},
+                         set(self.storage.all(City)))
+        self.assertEqual(4, len(self.storage.all()))
+        self.assertEqual({}, self.storage.all("Review"))
+
+    def test_find(self):
+        found = self.storage.find(City, state_id=self.state.id)
+        self.assertEqual(3, len(found))
+        self.assertEqual({}, self.storage.find(City, state_id="other"))
+
+    def test_related(self):
+        found = self.storage.related(City, "state_id", self.state.id)
+        self.assertEqual({f"City.{city.id}" for city in self.cities},
+                         set(found))
+        self.assertIs(found[f"City.{self.cities[0].id}"],
+                      self.storage.get(City, self.cities[0].id))
+        self.assertEqual({}, self.storage.related(City, "name", "Ikeja"))
+
+    def test_aggregate_and_select(self):
+        for city, population in zip(self.cities, (10, 20, 30)):
+            city.population = population
+        self.source.export(self.path)
+        self.storage.reload()
+        self.assertEqual(60.0, self.storage.aggregate(City, "population",
+                                                      "sum"))
+        self.assertEqual({30: 1}, self.storage.aggregate(
+            City, "population", "count", by="population",
+            population=(25, None)))
+        self.assertEqual({f"City.{self.cities[0].id}"}, set(
+            self.storage.select(City, population=(None, 10))))
+
+    def test_reload_sees_new_export(self):
+        City()
+        self.source.export(self.path)
+        self.assertEqual(3, self.storage.count(City))
+        self.storage.reload()
+        self.assertEqual(4, self.storage.count(City))
+
+    def test_missing_file_is_empty(self):
+        storage = SnapshotStorage(
+            file_path=os.path.join(self.tmp.name, "missing.snapshot"))
+        storage.reload()
+        self.assertEqual(0, storage.count())
+        self.assertEqual({}, storage.all())
+
+    def test_rejects_other_files(self):
+        with open(self.path, "wb") as f:
+            f.write(b'{"State.1": {}}')
+        with self.assertRaises(ValueError):
+            self.storage.reload()
+
+
+class TestSnapshotStorageReadOnly(SnapshotStorageTestCase):
+    """Unittests to evaluate that SnapshotStorage refuses writes."""
+
+    def setUp(self):
+        super().setUp()
+        patcher = patch("models.storage", self.storage)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_new_and_save(self):
+        with self.assertRaises(PermissionError):
+            City()
+        with self.assertRaises(PermissionError):
+            self.storage.save()
+
+    def test_changing_a_stored_instance(self):
+        state = self.storage.get(State, self.state.id)
+        with self.assertRaises(PermissionError):
+            state.name = "Abuja"
+        self.assertEqual("Lagos", state.name)
+
+    def test_delete_and_transactions(self):
+        with self.assertRaises(PermissionError):
+            self.storage.delete(self.storage.get(State, self.state.id))
+        with self.assertRaises(PermissionError):
+            with self.storage.batch():
+                pass
+        self.assertFalse(self.storage.in_transaction())
+
+    def test_console(self):
+        with patch("console.storage", self.storage):
+            with patch("sys.stdout", new=StringIO()) as f:
+                HBNBCommand().onecmd(f"destroy State {self.state.id}")
+                self.assertEqual("** storage is read-only **",
+                                 f.getvalue().strip())
+            with patch("sys.stdout", new=StringIO()) as f:
+                HBNBCommand().onecmd(f"State.show({self.state.id})")
+                self.assertIn("'name': 'Lagos'", f.getvalue())
+
+
+if __name__ == "__main__":
+    unittest.main()
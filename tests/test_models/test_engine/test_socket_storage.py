@@ -0,0 +1,327 @@
+#!/usr/bin/python3
+"""Defines unittests for models/engine/socket_storage.py and
+models/engine/storage_server.py.
+
+Classes:
+    TestSocketStorage
+    TestSocketStorageTransactions
+    TestStorageServerProcess
+"""
+import io
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from unittest.mock import patch
+from models.engine.file_storage import FileStorage
+from models.engine.socket_storage import (SocketStorage, receive_message,
+                                          send_message)
+from models.engine.storage_server import StorageServer, _remove_stale
+from models.city import City
+from models.place import Place
+from models.state import State
+from models.user import User
+
+
+class SocketStorageTestCase(unittest.TestCase):
+    """Runs every test against a server thread serving a fresh FileStorage,
+    with a client set as models.storage."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.file_path = os.path.join(self.tmp.name, "file.json")
+        self.socket_path = os.path.join(self.tmp.name, "hbnb.sock")
+        self.served = FileStorage(file_path=self.file_path)
+        self.served.reload()
+        self.server = StorageServer(self.socket_path, self.served)
+        thread = threading.Thread(target=self.server.serve_forever,
+                                  args=(0.05,))
+        thread.start()
+        self.clients = []
+        self.storage = self.connect()
+        patcher = patch("models.storage", self.storage)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        for client in self.clients:
+            client.close()
+        self.server.shutdown()
+        self.server.server_close()
+        FileStorage._FileStorage__objects = {}
+        self.tmp.cleanup()
+
+    def connect(self):
+        client = SocketStorage(socket_path=self.socket_path)
+        self.clients.append(client)
+        return (client)
+
+
+class TestSocketStorage(SocketStorageTestCase):
+    """Unittests to evaluate the SocketStorage class."""
+
+    def test_messages_round_trip(self):
+        stream = io.BytesIO()
+        send_message(stream, {"op": "get", "args": ["User", "1"]})
+        send_message(stream, {"value": None})
+        stream.seek(0)
+        self.assertEqual({"op": "get", "args": ["User", "1"]},
+                         receive_message(stream))
+        self.assertEqual({"value": None}, receive_message(stream))
+        self.assertIsNone(receive_message(stream))
+
+    def test_truncated_message(self):
+        stream = io.BytesIO()
+        send_message(stream, {"value": "abc"})
+        with self.assertRaises(ConnectionError):
+            receive_message(io.BytesIO(stream.getvalue()[:-1]))
+
+    def test_save_and_get(self):
+        user = User()
+        user.email = "ada@mail.com"
+        self.assertEqual(1, self.storage.dirty_count())
+        user.save()
+        self.assertEqual(0, self.storage.dirty_count())
+        other = self.connect()
+        loaded = other.get(User, user.id)
+        self.assertIsInstance(loaded, User)
+        self.assertEqual(user.to_dict(), loaded.to_dict())
+        self.assertIs(loaded, other.get("User", user.id))
+        self.assertIsNone(other.get(User, "missing"))
+
+    def test_server_saves_to_disk(self):
+        state = State()
+        state.save()
+        with open(self.file_path) as f:
+            self.assertIn("State." + state.id, json.load(f))
+
+    def test_all_and_count(self):
+        places = [Place(), Place()]
+        City()
+        self.storage.save()
+        other = self.connect()
+        self.assertEqual({"Place." + place.id for place in places},
+                         set(other.all(Place)))
+        self.assertEqual(2, other.count(Place))
+        self.assertEqual(3, other.count())
+        self.assertEqual(3, len(other.all()))
+        self.assertIs(places[0], self.storage.all(Place)[
+            "Place." + places[0].id])
+
+    def test_delete(self):
+        state = State()
+        state.save()
+        self.storage.delete(state)
+        self.storage.save()
+        self.assertIsNone(self.connect().get(State, state.id))
+        self.assertEqual(0, self.storage.count(State))
+
+    def test_attribute_changes_are_saved(self):
+        state = State()
+        state.save()
+        state.name = "Lagos"
+        state.save()
+        self.assertEqual("Lagos",
+                         self.connect().get(State, state.id).name)
+        self.assertEqual("Lagos", self.served.get(State, state.id).name)
+
+    def test_queries(self):
+        places = [Place(), Place(), Place()]
+        for place, city_id, price in zip(places, "aab", (100, 50, 30)):
+            place.city_id = city_id
+            place.price_by_night = price
+        places[0].amenity_ids = ["x"]
+        self.storage.save()
+        other = self.connect()
+        self.assertEqual({"Place." + places[2].id},
+                         set(other.find(Place, city_id="b")))
+        self.assertEqual({"Place." + places[0].id},
+                         set(other.related(Place, "amenity_ids", "x")))
+        self.assertEqual({"a": 150.0, "b": 30.0}, other.aggregate(
+            Place, "price_by_night", "sum", by="city_id"))
+        self.assertEqual(180.0, other.aggregate(Place, "price_by_night",
+                                                "sum"))
+        self.assertEqual({"Place." + places[0].id}, set(other.select(
+            Place, price_by_night=(60, None))))
+        self.assertEqual(["Place." + places[2].id, "Place." + places[1].id],
+                         list(other.find_range(Place, "price_by_night",
+                                               high=60)))
+
+    def test_grouped_keys_keep_their_type(self):
+        for rooms in (1, 1, 2):
+            Place().number_rooms = rooms
+        self.storage.save()
+        self.assertEqual({1: 2, 2: 1}, self.storage.aggregate(
+            Place, "number_rooms", "count", by="number_rooms"))
+
+    def test_errors_are_raised_on_the_client(self):
+        with self.assertRaises(ValueError):
+            self.storage.aggregate(Place, "price_by_night", "median")
+        self.assertEqual(0, self.storage.count())
+
+    def test_unknown_operation(self):
+        with self.assertRaises(ValueError):
+            self.server.dispatch({"op": "reload"})
+
+    def test_failed_save_keeps_changes(self):
+        state = State()
+        with patch.object(self.served, "save", side_effect=OSError):
+            with self.assertRaises(OSError):
+                self.storage.save()
+        self.assertEqual(1, self.storage.dirty_count())
+        self.storage.save()
+        self.assertIsNotNone(self.connect().get(State, state.id))
+
+    def test_reload_discards_unsaved_changes(self):
+        User()
+        self.storage.reload()
+        self.assertEqual(0, self.storage.dirty_count())
+        self.assertEqual(0, self.storage.count(User))
+
+    def test_no_server(self):
+        storage = SocketStorage(
+            socket_path=os.path.join(self.tmp.name, "missing.sock"))
+        with self.assertRaises(OSError):
+            storage.count()
+
+
+class TestSocketStorageTransactions(SocketStorageTestCase):
+    """Unittests to evaluate SocketStorage transactions."""
+
+    def test_batch_commits_once(self):
+        with patch.object(self.served, "save",
+                          wraps=self.served.save) as save:
+            with self.storage.batch():
+                place = Place()
+                place.save()
+                City().save()
+                self.assertTrue(self.storage.in_transaction())
+                self.assertIsNone(self.connect().get(Place, place.id))
+        self.assertEqual(1, save.call_count)
+        self.assertIsNotNone(self.connect().get(Place, place.id))
+
+    def test_rollback_restores_instances(self):
+        kept = State()
+        kept.name = "Lagos"
+        kept.save()
+        with self.assertRaises(ValueError):
+            with self.storage.batch():
+                added = State()
+                kept.name = "Kano"
+                self.storage.delete(kept)
+                raise ValueError()
+        self.assertEqual(0, self.storage.dirty_count())
+        self.assertIsNone(self.storage.get(State, added.id))
+        self.assertIs(kept, self.storage.get(State, kept.id))
+        self.assertEqual("Lagos", kept.name)
+
+    def test_queries_see_unsaved_changes(self):
+        kept = State()
+        gone = State()
+        self.storage.save()
+        with self.storage.batch():
+            added = State()
+            City()
+            self.storage.delete(gone)
+            self.assertIsNone(self.storage.get(State, gone.id))
+            self.assertEqual({f"State.{kept.id}", f"State.{added.id}"},
+                             set(self.storage.all(State)))
+            self.assertEqual(2, self.storage.count(State))
+            self.assertEqual(3, self.storage.count())
+            self.assertEqual(2, self.connect().count())
+        self.assertEqual(3, self.connect().count())
+
+    def test_get_of_a_record_deleted_here(self):
+        state = State()
+        state.save()
+        self.storage.delete(state)
+        self.assertIsNone(self.storage.get(State, state.id))
+        self.assertEqual({}, self.storage.find(State))
+
+
+class TestStorageServerProcess(unittest.TestCase):
+    """Unittests to evaluate the storage server run as a process."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.file_path = os.path.join(self.tmp.name, "file.json")
+        self.socket_path = os.path.join(self.tmp.name, "hbnb.sock")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def start(self):
+        env = dict(os.environ, HBNB_FILE_PATH=self.file_path)
+        env.pop("HBNB_TYPE_STORAGE", None)
+        process = subprocess.Popen(
+            [sys.executable, "-m", "models.engine.storage_server",
+             self.socket_path], env=env, stderr=subprocess.PIPE)
+        self.addCleanup(process.stderr.close)
+        deadline = time.monotonic() + 10
+        while True:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                sock.connect(self.socket_path)
+            except OSError:
+                pass
+            else:
+                return (process)
+            finally:
+                sock.close()
+            self.assertIsNone(process.poll())
+            self.assertLess(time.monotonic(), deadline)
+            time.sleep(0.01)
+
+    def test_serves_until_terminated(self):
+        process = self.start()
+        client = SocketStorage(socket_path=self.socket_path)
+        with patch("models.storage", client):
+            state = State()
+            state.name = "Lagos"
+            state.save()
+        self.assertEqual(1, client.count(State))
+        client.close()
+        process.send_signal(signal.SIGTERM)
+        self.assertEqual(0, process.wait(10))
+        self.assertFalse(os.path.exists(self.socket_path))
+        with open(self.file_path) as f:
+            self.assertEqual("Lagos", json.load(f)["State." + state.id][
+                "name"])
+
+    def test_stale_socket_is_removed(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.bind(self.socket_path)
+        sock.close()
+        _remove_stale(self.socket_path)
+        self.assertFalse(os.path.exists(self.socket_path))
+        _remove_stale(self.socket_path)
+
+    def test_starting_server_socket_is_kept(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.addCleanup(sock.close)
+        sock.bind(self.socket_path)
+        timer = threading.Timer(0.05, sock.listen)
+        timer.start()
+        self.addCleanup(timer.join)
+        with self.assertRaises(SystemExit):
+            _remove_stale(self.socket_path)
+        self.assertTrue(os.path.exists(self.socket_path))
+
+    def test_refuses_a_second_server(self):
+        process = self.start()
+        try:
+            second = self.start()
+            self.assertNotEqual(0, second.wait(10))
+        finally:
+            process.send_signal(signal.SIGTERM)
+            process.wait(10)
+
+
+if __name__ == "__main__":
+    unittest.main()